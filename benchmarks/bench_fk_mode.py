@@ -0,0 +1,78 @@
+"""
+Benchmark bulk loads with enforced and deferred foreign keys.
+
+Creates the users tables from init_tables/def_tables.csv in an in-memory
+database, once with LINKS_TO columns as enforced foreign keys and once
+unconstrained (the deferred mode), then ingests USERS, ORDERS and
+ORDER_ITEMS. The deferred run includes ``integrity.validate_links`` over
+every link afterwards. Run from the repository root.
+"""
+import os
+import sys
+import time
+import duckdb
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(ROOT)
+sys.path.append(os.path.join(ROOT, "launcher"))
+import ingest
+import integrity
+import schema_model
+
+USERS = 500_000
+ORDERS = 2_000_000
+ORDER_ITEMS = 4_000_000
+
+def make_connection(fk_mode):
+    con = duckdb.connect()
+    con.execute("ATTACH ':memory:' AS users")
+    con.execute("USE users")
+    model = schema_model.load_schema(os.path.join("init_tables", "def_tables.csv"))
+    for key in model.creation_order:
+        if key.startswith("users."):
+            con.execute(schema_model.table_ddl(model.tables[key], with_fks=fk_mode == "enforced"))
+    con.execute("USE memory")
+    return con
+
+def make_sources(con):
+    con.execute(f"""CREATE TEMP TABLE src_users AS
+        SELECT i AS ID, 'user' || i AS username, 'user' || i || '@example.com' AS email FROM range(1, {USERS} + 1) t(i)""")
+    con.execute(f"""CREATE TEMP TABLE src_orders AS
+        SELECT i AS ID, DATE '2024-01-01' + CAST(i % 365 AS INTEGER) AS order_date,
+               CAST(i % 1000 AS DECIMAL(10,2)) AS total_amount, 1 + i % {USERS} AS USERS_ID
+        FROM range(1, {ORDERS} + 1) t(i)""")
+    con.execute(f"""CREATE TEMP TABLE src_items AS
+        SELECT i AS ID, CAST(1 + i % 5 AS INTEGER) AS quantity, CAST(i % 100 AS DECIMAL(10,2)) AS price,
+               1 + i % {ORDERS} AS ORDERS_ID, 1 + i % {USERS} AS USERS_ID
+        FROM range(1, {ORDER_ITEMS} + 1) t(i)""")
+
+def arrow_table(con, name):
+    # A lazy reader over the same connection would deadlock the insert, so the rows are fetched first
+    relation = con.table(name)
+    if hasattr(relation, "to_arrow_table"):
+        return relation.to_arrow_table()
+    return relation.fetch_arrow_table()
+
+def load(fk_mode):
+    con = make_connection(fk_mode)
+    make_sources(con)
+    sources = [(table, arrow_table(con, source)) for table, source in
+               [("users.USERS", "src_users"), ("users.ORDERS", "src_orders"), ("users.ORDER_ITEMS", "src_items")]]
+    start = time.perf_counter()
+    for table, data in sources:
+        ingest.ingest(con, table, data)
+    loaded = time.perf_counter() - start
+    violations = integrity.validate_links(con) if fk_mode == "deferred" else []
+    total = time.perf_counter() - start
+    con.close()
+    assert not violations
+    print(f"{fk_mode:<9} load {loaded:6.2f} s, validation {total - loaded:5.2f} s, total {total:6.2f} s")
+    return total
+
+def run():
+    enforced = load("enforced")
+    deferred = load("deferred")
+    print(f"deferred mode takes {deferred / enforced:.0%} of the enforced load time")
+
+if __name__ == "__main__":
+    run()
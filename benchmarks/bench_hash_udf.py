@@ -0,0 +1,73 @@
+"""
+Benchmark hashing a column with the database salt.
+
+Compares the per-row path, calling ``db_hash.hash_with_db_salt`` for every
+value in Python, with the ``db_salt_hash`` function from
+``db_hash.register_hash_udf`` (native macro, and the Python Arrow UDF used
+as a fallback) run inside DuckDB on an in-memory table of synthetic e-mail
+addresses. Run from the repository root so ``db_salt.json`` is found.
+"""
+import os
+import sys
+import time
+import duckdb
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(ROOT)
+sys.path.append(os.path.join(ROOT, "launcher"))
+import db_hash
+
+ROWS = 1_000_000
+PER_ROW_ROWS = 200_000
+
+def make_table(con, rows):
+    con.execute(f"""
+        CREATE OR REPLACE TABLE USERS AS
+        SELECT i AS ID, 'user' || i || '@example.com' AS email FROM range({rows}) t(i)
+    """)
+
+def per_row(con):
+    emails = con.execute("SELECT email FROM USERS ORDER BY ID").fetchall()
+    return [db_hash.hash_with_db_salt(email) for (email,) in emails]
+
+def vectorised(con, name="db_salt_hash"):
+    con.execute(f"CREATE OR REPLACE TABLE HASHED AS SELECT ID, {name}(email, ?) AS email FROM USERS",
+                [db_hash.load_salt()])
+
+def run():
+    con = duckdb.connect()
+    db_hash.register_hash_udf(con)
+    # Register the fallback as if this DuckDB build had no native hash function
+    native_hash_sql = db_hash._native_hash_sql
+    db_hash._native_hash_sql = lambda con, config: None
+    try:
+        db_hash.register_hash_udf(con, "db_salt_hash_fallback")
+    finally:
+        db_hash._native_hash_sql = native_hash_sql
+
+    # All paths must agree before timing them
+    make_table(con, 1000)
+    expected = per_row(con)
+    for name in ("db_salt_hash", "db_salt_hash_fallback"):
+        vectorised(con, name)
+        assert expected == [row[0] for row in con.execute("SELECT email FROM HASHED ORDER BY ID").fetchall()]
+
+    make_table(con, PER_ROW_ROWS)
+    start = time.perf_counter()
+    per_row(con)
+    row_rate = PER_ROW_ROWS / (time.perf_counter() - start)
+
+    make_table(con, ROWS)
+    start = time.perf_counter()
+    vectorised(con)
+    native_rate = ROWS / (time.perf_counter() - start)
+    start = time.perf_counter()
+    vectorised(con, "db_salt_hash_fallback")
+    udf_rate = ROWS / (time.perf_counter() - start)
+
+    print(f"per-row hash_with_db_salt: {row_rate:,.0f} rows/s ({PER_ROW_ROWS:,} rows)")
+    print(f"native macro in DuckDB:    {native_rate:,.0f} rows/s ({ROWS:,} rows, {native_rate / row_rate:.1f}x)")
+    print(f"fallback Arrow UDF:        {udf_rate:,.0f} rows/s ({ROWS:,} rows, {udf_rate / row_rate:.1f}x)")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,105 @@
+"""
+Benchmark block-reserved ID allocation with concurrent writers.
+
+Measures ``IdAllocator.allocate`` for single IDs at several block sizes, then
+has worker threads, each on its own cursor, ingest batches into
+``users.USERS`` at the same time: once taking IDs from a shared allocator and
+once numbering rows after ``max(ID)`` inside each insert, which races when
+two batches overlap. It first checks that rows ingested with their own IDs
+beyond the high-water mark or inside a free block are not handed out again.
+Runs on in-memory databases; start it from the repository root.
+"""
+import os
+import sys
+import time
+import threading
+import duckdb
+import pyarrow as pa
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(ROOT)
+sys.path.append(os.path.join(ROOT, "launcher"))
+import id_alloc
+import ingest
+import schema_model
+
+TABLE = "users.USERS"
+SINGLE_IDS = 100_000
+BLOCK_SIZES = [100, 1_000, 10_000]
+THREADS = 8
+BATCHES_PER_THREAD = 50
+BATCH_ROWS = 1_000
+
+def make_connection():
+    con = duckdb.connect()
+    con.execute("ATTACH ':memory:' AS users")
+    con.execute("USE users")
+    con.execute(schema_model.table_ddl(ingest.table_definition(TABLE)))
+    con.execute("USE memory")
+    return con
+
+def single_ids(block_size):
+    con = make_connection()
+    with id_alloc.IdAllocator(con, block_size) as allocator:
+        start = time.perf_counter()
+        for _ in range(SINGLE_IDS):
+            allocator.allocate(TABLE)
+        rate = SINGLE_IDS / (time.perf_counter() - start)
+    con.close()
+    print(f"allocate(1), block {block_size:>6}: {rate:>12,.0f} IDs/s")
+
+def concurrent_ingest(use_allocator):
+    con = make_connection()
+    allocator = id_alloc.IdAllocator(con) if use_allocator else None
+    batch = pa.table({"username": ["u"] * BATCH_ROWS, "email": ["u@example.com"] * BATCH_ROWS})
+    failures = []
+
+    def work():
+        cursor = con.cursor()
+        for _ in range(BATCHES_PER_THREAD):
+            try:
+                ingest.ingest(cursor, TABLE, batch, allocator=allocator)
+            except RuntimeError:
+                failures.append(1)
+        cursor.close()
+
+    threads = [threading.Thread(target=work) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    if allocator:
+        allocator.close()
+    rows = con.execute("SELECT COUNT(*) FROM users.USERS").fetchone()[0]
+    con.close()
+    label = "shared allocator" if use_allocator else "max(ID) per insert"
+    print(f"{THREADS} threads, {label:<18}: {rows / seconds:>12,.0f} rows/s, "
+          f"{len(failures)} of {THREADS * BATCHES_PER_THREAD} batches failed on duplicate IDs")
+
+def own_ids_check():
+    con = make_connection()
+    rows = lambda n: {"username": ["u"] * n, "email": ["u@example.com"] * n}
+    with id_alloc.IdAllocator(con, 10) as allocator:
+        ingest.ingest(con, TABLE, pa.table(rows(5)), allocator=allocator)
+    # Past the high-water mark and inside the block handed back on close
+    ingest.ingest(con, TABLE, pa.table({"ID": [50, 7], **rows(2)}))
+    for _ in range(3):
+        ingest.ingest(con, TABLE, pa.table(rows(1)))
+    with id_alloc.IdAllocator(con, 10) as allocator:
+        ingest.ingest(con, TABLE, pa.table(rows(12)), allocator=allocator)
+    ids, unique = con.execute("SELECT COUNT(*), COUNT(DISTINCT ID) FROM users.USERS").fetchone()
+    con.close()
+    assert ids == unique == 22, f"own IDs were handed out again: {ids} rows, {unique} IDs"
+    print("own IDs after allocation: not reused")
+
+def run():
+    own_ids_check()
+    for block_size in BLOCK_SIZES:
+        single_ids(block_size)
+    concurrent_ingest(True)
+    concurrent_ingest(False)
+
+if __name__ == "__main__":
+    run()
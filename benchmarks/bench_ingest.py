@@ -0,0 +1,78 @@
+"""
+Benchmark bulk ingest against row-wise inserts.
+
+Loads synthetic rows into ``users.USERS`` from init_tables/def_tables.csv,
+created in an in-memory database, first with ``executemany`` (one parameter
+row per user, the way loaders insert today) and then with ``ingest.ingest``
+from a pandas DataFrame, a pyarrow Table, a RecordBatchReader and a Parquet
+file. Run from the repository root.
+"""
+import os
+import sys
+import time
+import tempfile
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(ROOT)
+sys.path.append(os.path.join(ROOT, "launcher"))
+import ingest
+import schema_model
+
+ROWS = 1_000_000
+ROW_WISE_ROWS = 20_000
+TABLE = "users.USERS"
+
+def make_connection():
+    con = duckdb.connect()
+    con.execute("ATTACH ':memory:' AS users")
+    table = ingest.table_definition(TABLE)
+    con.execute("USE users")
+    con.execute(schema_model.table_ddl(table))
+    con.execute("USE memory")
+    return con
+
+def make_rows(rows):
+    return pa.table({
+        "username": [f"user{i}" for i in range(rows)],
+        "email": [f"user{i}@example.com" for i in range(rows)],
+    })
+
+def row_wise(con, data):
+    rows = [(i + 1, name, email) for i, (name, email) in
+            enumerate(zip(data["username"].to_pylist(), data["email"].to_pylist()))]
+    con.executemany("INSERT INTO users.USERS (ID, username, email) VALUES (?, ?, ?)", rows)
+
+def timed(label, rows, load):
+    con = make_connection()
+    start = time.perf_counter()
+    load(con)
+    rate = rows / (time.perf_counter() - start)
+    assert con.execute("SELECT COUNT(*), COUNT(DISTINCT ID) FROM users.USERS").fetchone() == (rows, rows)
+    con.close()
+    print(f"{label:<24} {rate:>12,.0f} rows/s ({rows:,} rows)")
+    return rate
+
+def run():
+    data = make_rows(ROWS)
+    frame = data.to_pandas()
+    with tempfile.TemporaryDirectory() as folder:
+        parquet_path = os.path.join(folder, "users.parquet")
+        pq.write_table(data, parquet_path)
+
+        small = data.slice(0, ROW_WISE_ROWS)
+        base = timed("row-wise executemany", ROW_WISE_ROWS, lambda con: row_wise(con, small))
+        for label, load in [
+            ("ingest pandas", lambda con: ingest.ingest(con, TABLE, frame)),
+            ("ingest Arrow table", lambda con: ingest.ingest(con, TABLE, data)),
+            ("ingest RecordBatchReader", lambda con: ingest.ingest(con, TABLE, pa.RecordBatchReader.from_batches(
+                data.schema, data.to_batches(max_chunksize=100_000)))),
+            ("ingest Parquet path", lambda con: ingest.ingest(con, TABLE, parquet_path)),
+        ]:
+            rate = timed(label, ROWS, load)
+            print(f"{'':<24} {rate / base:>11.1f}x row-wise")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,95 @@
+"""
+Benchmark a monthly partitioned table against a single table.
+
+Creates an ORDERS table with three years of order dates twice in file-backed
+databases in a temporary folder: once as a plain table and once partitioned
+by month with ``PARTITION_BY``. Both are loaded with ``ingest.ingest``. The
+benchmark then times a last-month query on each. Finally it removes
+everything older than a year: from the plain table with DELETE, and from
+the partitioned one by archiving its expired partitions to Parquet with
+``partitioning.apply_retention``. Run from the repository root.
+"""
+import os
+import sys
+import time
+import datetime
+import tempfile
+import duckdb
+import pyarrow as pa
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(ROOT)
+sys.path.append(os.path.join(ROOT, "launcher"))
+import ingest
+import partitioning
+import schema_model
+
+ROWS = 5_000_000
+DAYS = 3 * 365
+QUERIES = 20
+TODAY = datetime.date(2026, 12, 31)
+
+DEF_TABLES = """DBNAME,TABLENAME,VARNAME,TYPE,LINKS_TO,PARTITION_BY
+single,ORDERS,order_date,DATE,,
+single,ORDERS,total_amount,"DECIMAL(10,2)",,
+parted,ORDERS,order_date,DATE,,order_date:month:12
+parted,ORDERS,total_amount,"DECIMAL(10,2)",,
+"""
+
+def make_rows(rows):
+    first = TODAY - datetime.timedelta(days=DAYS - 1)
+    return pa.table({
+        "order_date": [first + datetime.timedelta(days=i % DAYS) for i in range(rows)],
+        "total_amount": [(i % 10_000) / 100 for i in range(rows)],
+    })
+
+def timed_queries(label, con, sql):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        total = con.execute(sql).fetchone()[0]
+    per_query = (time.perf_counter() - start) / QUERIES * 1000
+    print(f"{label:<36} {per_query:>8.2f} ms per query (total {total:,.2f})")
+    return per_query
+
+def run():
+    data = make_rows(ROWS)
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, "def_tables.csv"), "w") as file:
+            file.write(DEF_TABLES)
+        con = duckdb.connect(os.path.join(folder, "driver.duckdb"))
+        for name in ("single", "parted"):
+            con.execute(f"ATTACH '{os.path.join(folder, name + '.duckdb')}' AS {name}")
+        con.execute(schema_model.table_ddl(ingest.table_definition("single.ORDERS", folder)))
+        # As on startup, the current period's partition and the view over it
+        parted = ingest.table_definition("parted.ORDERS", folder)
+        partitioning.ensure_partitions(con, parted, "parted", [partitioning.period_label(TODAY, "month")], False)
+
+        for table_key in ("single.ORDERS", "parted.ORDERS"):
+            start = time.perf_counter()
+            ingest.ingest(con, table_key, data, def_tables_path=folder)
+            print(f"Ingest into {table_key:<24} {ROWS / (time.perf_counter() - start):>12,.0f} rows/s ({ROWS:,} rows)")
+        con.execute("CHECKPOINT")
+
+        recent = f"WHERE order_date >= DATE '{TODAY.replace(day=1)}'"
+        single = timed_queries("last month, single table", con, f"SELECT sum(total_amount) FROM single.ORDERS {recent}")
+        parted = timed_queries("last month, partitioned view", con, f"SELECT sum(total_amount) FROM parted.ORDERS {recent}")
+        print(f"Partition pruning speedup: {single / parted:.1f}x\n")
+
+        cutoff = partitioning.retention_cutoff("month", 12, TODAY)
+        start = time.perf_counter()
+        con.execute(f"DELETE FROM single.ORDERS WHERE order_date < DATE '{cutoff}'")
+        con.execute("CHECKPOINT")
+        deleted = time.perf_counter() - start
+        start = time.perf_counter()
+        archived = partitioning.apply_retention(con, folder, today=TODAY)
+        con.execute("CHECKPOINT")
+        moved = time.perf_counter() - start
+        print(f"Expire rows before {cutoff}: DELETE {deleted:.2f} s, archive {len(archived)} partitions {moved:.2f} s")
+
+        for table_key in ("single.ORDERS", "parted.ORDERS"):
+            rows = con.execute(f"SELECT COUNT(*) FROM {table_key}").fetchone()[0]
+            print(f"{table_key:<16} {rows:>10,} rows readable")
+        con.close()
+
+if __name__ == "__main__":
+    run()
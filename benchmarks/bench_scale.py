@@ -0,0 +1,197 @@
+"""
+Benchmark start_db at scale on synthetic init tables.
+
+For every scenario a fresh directory gets a generated ``db_list.csv``,
+``def_tables.csv`` (tables linked in LINKS_TO chains) and ``views.csv``, and
+``start_db`` is run twice in fresh interpreters from the repository root:
+a cold start that creates every database, table and view, then a warm start
+against the same files. The wall-clock time of each run is recorded with
+the phase timings from its startup profile (attach, table init, view setup
+and so on), and all results are written to a JSON file tagged with the
+current commit so runs can be compared across commits.
+
+Run ``python benchmarks/bench_scale.py`` for the default scenarios, or
+pass ``--dbs``, ``--tables`` and ``--views`` for a single scenario.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# (databases, tables, views), the driver database counts as one database
+SCENARIOS = [
+    (1, 10, 0),
+    (10, 100, 10),
+    (50, 1000, 100),
+    (200, 5000, 1000),
+]
+COLS_PER_TABLE = 4
+# Tables in a database are linked in chains of this length
+CHAIN_LENGTH = 5
+
+META_COLUMNS = ["START_TIME", "PREV_START_TIME", "DB_VERSION", "PYTHON_VERSION", "DUCKDB_VERSION", "SALT_CHECK"]
+
+START = """
+import sys, json
+sys.path.append("launcher")
+import start_db
+con = start_db.start_db(def_tables_path={path!r}, profile_json={profile!r})
+con.close()
+"""
+
+def generate_init_tables(folder, n_dbs, n_tables, n_views):
+    """
+    Write synthetic init CSV files and return the created table names.
+
+    Parameters
+    ----------
+    folder : str
+        Directory for the CSV files; the databases are created in its
+        ``DBDAT`` sub-folder.
+    n_dbs : int
+        Number of databases including the driver database.
+    n_tables : int
+        Number of tables besides META, spread over the non-driver databases
+        (or the driver database when it is the only one).
+    n_views : int
+        Number of views, each counting the rows of one table.
+
+    Returns
+    -------
+    list of str
+        Qualified names of the generated tables.
+    """
+    os.makedirs(folder, exist_ok=True)
+    dbdat = os.path.join(folder, "DBDAT")
+    db_names = [f"db{i}" for i in range(1, n_dbs)]
+
+    with open(os.path.join(folder, "db_list.csv"), "w", newline="") as file:
+        writer = csv.writer(file, delimiter="|")
+        writer.writerow(["PATH", "DB_NAME", "PURPOSE"])
+        writer.writerow([os.path.join(dbdat, "main.duckdb"), "meta", "main"])
+        for name in db_names:
+            writer.writerow([os.path.join(dbdat, f"{name}.duckdb"), name, "primary"])
+
+    table_dbs = db_names or ["main"]
+    tables = []
+    with open(os.path.join(folder, "def_tables.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["DBNAME", "TABLENAME", "VARNAME", "TYPE", "LINKS_TO"])
+        for col in META_COLUMNS:
+            writer.writerow(["main", "META", col, "VARCHAR", ""])
+        for t in range(n_tables):
+            dbname = table_dbs[t % len(table_dbs)]
+            position = t // len(table_dbs)
+            tablename = f"T{position}"
+            # Each table links to the previous one in its database, except at the start of a chain
+            links = f"{dbname}.T{position - 1}" if position % CHAIN_LENGTH else ""
+            for c in range(COLS_PER_TABLE):
+                writer.writerow([dbname, tablename, f"col{c}", "VARCHAR" if c % 2 else "INTEGER",
+                                 links if c == 0 else ""])
+            tables.append(f"{dbname}.{tablename}")
+
+    with open(os.path.join(folder, "views.csv"), "w", newline="") as file:
+        writer = csv.writer(file, delimiter="|")
+        writer.writerow(["VIEW_NAME", "SQL"])
+        for v in range(n_views):
+            source = tables[v % len(tables)] if tables else "main.META"
+            writer.writerow([f"V{v}", f"SELECT COUNT(*) AS n FROM {source}"])
+    return tables
+
+def run_start(folder):
+    """
+    Run start_db on generated init tables in a fresh interpreter.
+
+    Returns
+    -------
+    dict
+        Wall-clock seconds of the process and the phase totals in seconds.
+    """
+    profile = os.path.join(folder, "profile.json")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", START.format(path=folder, profile=profile)],
+                   cwd=ROOT, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    with open(profile) as file:
+        phases = json.load(file)["phases"]
+    return {"wall_seconds": wall, "phases": phases}
+
+def run_scenario(n_dbs, n_tables, n_views, keep=False):
+    """
+    Time a cold and a warm start for one scale.
+
+    Returns
+    -------
+    dict
+        The scale and the cold and warm results.
+    """
+    folder = tempfile.mkdtemp(prefix="bench_scale_")
+    try:
+        generate_init_tables(folder, n_dbs, n_tables, n_views)
+        cold = run_start(folder)
+        warm = run_start(folder)
+    finally:
+        if not keep:
+            shutil.rmtree(folder, ignore_errors=True)
+    return {"dbs": n_dbs, "tables": n_tables, "views": n_views, "cold": cold, "warm": warm}
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def format_row(result):
+    def ms(run, phase):
+        return f"{run['phases'].get(phase, 0.0) * 1000:9.1f}"
+    cold, warm = result["cold"], result["warm"]
+    return (f"{result['dbs']:>4} {result['tables']:>6} {result['views']:>6} | "
+            f"{cold['wall_seconds'] * 1000:9.1f} {ms(cold, 'attach')} {ms(cold, 'table_init')} "
+            f"{ms(cold, 'view_setup')} | {warm['wall_seconds'] * 1000:9.1f} {ms(warm, 'attach')}")
+
+def run(scenarios, output=None, keep=False):
+    import duckdb
+
+    commit = current_commit()
+    print(" dbs tables  views |   cold ms attach ms  table ms   view ms |   warm ms attach ms")
+    results = []
+    for n_dbs, n_tables, n_views in scenarios:
+        result = run_scenario(n_dbs, n_tables, n_views, keep)
+        results.append(result)
+        print(format_row(result))
+
+    output = output or os.path.join(RESULTS_DIR, f"scale-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({
+            "commit": commit,
+            "python_version": platform.python_version(),
+            "duckdb_version": duckdb.__version__,
+            "results": results,
+        }, file, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dbs", type=int, help="databases in a single scenario, including the driver")
+    parser.add_argument("--tables", type=int, help="tables in a single scenario")
+    parser.add_argument("--views", type=int, default=0, help="views in a single scenario")
+    parser.add_argument("--output", help="results file, by default benchmarks/results/scale-<commit>.json")
+    parser.add_argument("--keep", action="store_true", help="keep the generated directories")
+    args = parser.parse_args()
+
+    if args.dbs is not None or args.tables is not None:
+        scenarios = [(args.dbs or 1, 10 if args.tables is None else args.tables, args.views)]
+    else:
+        scenarios = SCENARIOS
+    run(scenarios, args.output, args.keep)
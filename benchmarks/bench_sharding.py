@@ -0,0 +1,95 @@
+"""
+Benchmark a hash-sharded table against a single table.
+
+Creates an EVENTS table keyed by USERS_ID twice in file-backed databases in a
+temporary folder: once as a plain table and once sharded over four
+databases. Both are loaded with ``ingest.ingest``, then probed by key
+through the plain table, the routing view (which scans every shard) and
+``sharding.shard_sql`` (which only reads the owning shard). Run from the
+repository root.
+"""
+import os
+import sys
+import time
+import tempfile
+import duckdb
+import pyarrow as pa
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(ROOT)
+sys.path.append(os.path.join(ROOT, "launcher"))
+import ingest
+import schema_model
+import sharding
+
+ROWS = 2_000_000
+USERS = 100_000
+LOOKUPS = 200
+SHARD_DBS = ("s0", "s1", "s2", "s3")
+
+DEF_TABLES = f"""DBNAME,TABLENAME,VARNAME,TYPE,LINKS_TO,SHARD_BY
+single,EVENTS,USERS_ID,INT64,,
+single,EVENTS,kind,VARCHAR,,
+single,EVENTS,payload,VARCHAR,,
+main,EVENTS,USERS_ID,INT64,,"USERS_ID:{','.join(SHARD_DBS)}"
+main,EVENTS,kind,VARCHAR,,
+main,EVENTS,payload,VARCHAR,,
+"""
+
+def make_connection(folder):
+    con = duckdb.connect(os.path.join(folder, "driver.duckdb"))
+    for name in ("single",) + SHARD_DBS:
+        con.execute(f"ATTACH '{os.path.join(folder, name + '.duckdb')}' AS {name}")
+    model = schema_model.load_schema(os.path.join(folder, "def_tables.csv"))
+    con.execute(schema_model.table_ddl(model.tables["single.EVENTS"]))
+    sharded = model.tables["main.EVENTS"]
+    for name in sharding.shard_tables(sharded, "driver"):
+        con.execute(schema_model.table_ddl(sharded, with_fks=False, name=name))
+    con.execute(sharding.routing_view_sql(sharded, "driver"))
+    return con
+
+def make_rows(rows):
+    return pa.table({
+        "USERS_ID": [i % USERS for i in range(rows)],
+        "kind": [f"kind{i % 7}" for i in range(rows)],
+        "payload": [f"payload {i}" for i in range(rows)],
+    })
+
+def timed_lookups(label, run_lookup, keys):
+    start = time.perf_counter()
+    found = sum(run_lookup(key) for key in keys)
+    per_lookup = (time.perf_counter() - start) / len(keys) * 1000
+    print(f"{label:<32} {per_lookup:>8.2f} ms per lookup ({found:,} rows found)")
+    return per_lookup
+
+def run():
+    data = make_rows(ROWS)
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, "def_tables.csv"), "w") as file:
+            file.write(DEF_TABLES)
+        con = make_connection(folder)
+
+        for label, table_key in (("single table", "single.EVENTS"), (f"{len(SHARD_DBS)} shards", "main.EVENTS")):
+            start = time.perf_counter()
+            ingest.ingest(con, table_key, data, def_tables_path=folder)
+            seconds = time.perf_counter() - start
+            print(f"Ingest into {label:<20} {ROWS / seconds:>12,.0f} rows/s ({ROWS:,} rows)")
+        con.execute("CHECKPOINT")
+        sizes = [os.path.getsize(os.path.join(folder, name + ".duckdb")) for name in SHARD_DBS]
+        print(f"Shard files: {', '.join(f'{size / 1e6:.1f} MB' for size in sizes)}")
+
+        keys = list(range(0, USERS, USERS // LOOKUPS))
+        single = timed_lookups("single table", lambda key: len(
+            con.execute("SELECT * FROM single.EVENTS WHERE USERS_ID = ?", [key]).fetchall()), keys)
+        view = timed_lookups("routing view (all shards)", lambda key: len(
+            con.execute("SELECT * FROM driver.EVENTS WHERE USERS_ID = ?", [key]).fetchall()), keys)
+
+        def pruned_lookup(key):
+            sql, params = sharding.shard_sql(con, "main.EVENTS", [key], def_tables_path=folder)
+            return len(con.execute(sql, params).fetchall())
+        pruned = timed_lookups("shard_sql (owning shard)", pruned_lookup, keys)
+        print(f"\nPruning speedup over the routing view: {view / pruned:.1f}x (single table {single:.2f} ms)")
+        con.close()
+
+if __name__ == "__main__":
+    run()
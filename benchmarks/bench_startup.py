@@ -0,0 +1,81 @@
+"""
+Benchmark import time and time-to-first-query of the launcher entry points.
+
+Each measurement runs in a fresh interpreter from the repository root:
+``python -X importtime`` gives the import cost of ``conn``, and a timed
+script measures wall-clock time until the first query returns for the fast
+connect-and-attach path and for the full ``get_connection`` start.
+"""
+import os
+import sys
+import subprocess
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+RUNS = 5
+
+FIRST_QUERY = """
+import time, sys
+start = time.perf_counter()
+import conn
+con = conn.{entry}()
+con.sql("SELECT COUNT(*) FROM duckdb_tables()").fetchall()
+elapsed = time.perf_counter() - start
+print("RESULT", elapsed, "pandas" in sys.modules)
+"""
+
+def import_time(module="conn"):
+    """
+    Measure the cumulative import time of a module with -X importtime.
+
+    Returns
+    -------
+    tuple
+        (seconds, imported modules) for a single fresh interpreter.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    total_us = 0
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        modules.append(name)
+        # Only top-level imports, nested ones are part of their parent's cumulative time
+        if not line.split("|")[2].startswith("  "):
+            total_us += int(cumulative)
+    return total_us / 1e6, modules
+
+def first_query(entry):
+    """
+    Time a fresh interpreter from start to the first query result.
+
+    Returns
+    -------
+    tuple
+        (in-process seconds, whole process seconds, pandas imported)
+    """
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", FIRST_QUERY.format(entry=entry)],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    result = [line for line in proc.stdout.splitlines() if line.startswith("RESULT")][-1].split()
+    return float(result[1]), wall, result[2] == "True"
+
+def run():
+    # Make sure the system is initialised so the fast path has something to attach
+    first_query("get_connection")
+
+    seconds, modules = import_time()
+    print(f"import conn: {seconds * 1000:.1f} ms, pandas imported: {'pandas' in modules}")
+
+    for entry in ("get_fast_connection", "get_connection"):
+        results = [first_query(entry) for _ in range(RUNS)]
+        in_process = min(r[0] for r in results)
+        wall = min(r[1] for r in results)
+        print(f"{entry}: first query after {in_process * 1000:.1f} ms "
+              f"(process {wall * 1000:.1f} ms, pandas imported: {results[0][2]})")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,72 @@
+"""
+Benchmark concurrent queries through per-thread cursors.
+
+Runs the same aggregate queries from a thread pool three ways: on one
+connection shared behind a lock, through ``conn_pool.ThreadCursors`` on
+one started connection, and with a full ``start_db`` per task, which is
+what workers calling ``conn.get_connection()`` pay. Run from the
+repository root after the system has been initialised once.
+"""
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+import conn
+import conn_pool
+
+WORKERS = 8
+TASKS = 64
+START_TASKS = 4
+QUERY = "SELECT SUM(i * i) FROM range(2000000) t(i)"
+
+def run_locked(con):
+    lock = threading.Lock()
+    def task(_):
+        with lock:
+            return con.execute(QUERY).fetchone()[0]
+    with ThreadPoolExecutor(WORKERS) as pool:
+        return list(pool.map(task, range(TASKS)))
+
+def run_thread_cursors(con):
+    with conn_pool.ThreadCursors(con) as cursors:
+        with ThreadPoolExecutor(WORKERS) as pool:
+            return list(pool.map(lambda _: cursors.get().execute(QUERY).fetchone()[0], range(TASKS)))
+
+def run_start_per_task():
+    def task(_):
+        con = conn.sdb.start_db()
+        try:
+            return con.execute(QUERY).fetchone()[0]
+        finally:
+            con.close()
+    # start_db writes META, so the starts themselves cannot overlap
+    return [task(i) for i in range(START_TASKS)]
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def run():
+    per_start = timed(run_start_per_task) / START_TASKS
+
+    startup = time.perf_counter()
+    con = conn.sdb.start_db()
+    startup = time.perf_counter() - startup
+
+    locked = timed(run_locked, con)
+    threaded = timed(run_thread_cursors, con)
+    con.close()
+
+    print(f"{TASKS} queries on {WORKERS} threads")
+    print(f"start_db per task:          {per_start * 1000:.1f} ms startup per task")
+    print(f"shared connection + lock:   {locked * 1000:.1f} ms")
+    print(f"per-thread cursors:         {threaded * 1000:.1f} ms (one startup of {startup * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,52 @@
+import argparse
+import conn
+# conn puts launcher/ on sys.path; import its modules the way start_db does
+import lazy_attach
+import integrity
+
+def check_integrity(incremental=False, workers=integrity.CHECK_WORKERS, tables=None, def_tables_path="init_tables"):
+    """
+    Check every LINKS_TO reference, including links across databases.
+
+    Parameters
+    ----------
+    incremental : bool, optional
+        Only check rows added since the last check of each link.
+    workers : int, optional
+        Maximum number of links checked at once.
+    tables : list of str, optional
+        Only check the links of these ``dbname.tablename`` tables.
+    def_tables_path : str, optional
+        Path to the directory containing the init CSV files.
+
+    Returns
+    -------
+    list of integrity.Violation
+        Links with orphan rows; the full results are stored in
+        ``main.INTEGRITY_CHECKS``.
+    """
+    con = conn.get_fast_connection()
+    try:
+        # Links can point into lazy databases
+        lazy_attach.attach_all(con)
+        results = integrity.run_checks(con, def_tables_path, incremental=incremental, workers=workers, tables=tables)
+        for r in results:
+            scope = "all rows" if r.after_id is None else f"rows after ID {r.after_id}"
+            print(f"{r.table}.{r.column} -> {r.ref_table}.ID: {r.rows_checked} {scope} checked, "
+                  f"{r.orphans} orphans in {r.seconds:.3f} s")
+        violations = integrity.violations_of(results)
+        print(integrity.format_report(violations))
+    finally:
+        conn.close_connection(con)
+    return violations
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check every LINKS_TO reference across the attached databases.")
+    parser.add_argument("--incremental", action="store_true", help="only check rows added since the last check")
+    parser.add_argument("--workers", type=int, default=integrity.CHECK_WORKERS, help="links checked at once")
+    parser.add_argument("--table", action="append", dest="tables", metavar="DB.TABLE",
+                        help="only check the links of this table, may be repeated")
+    args = parser.parse_args()
+
+    violations = check_integrity(args.incremental, args.workers, args.tables)
+    raise SystemExit(1 if violations else 0)
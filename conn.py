@@ -1,20 +1,45 @@
-from uainepydat import duckfunc
-
 # Append the directory path to openserver
 import sys
 sys.path.append("launcher")
 from launcher import start_db as sdb
 
-def get_connection():
-    con = sdb.start_db()
+def get_connection(parallel_attach=False, fk_mode="enforced"):
+    con = sdb.start_db(parallel_attach=parallel_attach, fk_mode=fk_mode)
     
     # Print the table list
-    duckfunc.get_inventory(con).show()
+    con.sql("SELECT * from duckdb_tables").show()
     
     # Print the contents of the META table
     print(con.sql("SELECT * from main.META"))
     
     return con
 
+def get_fast_connection(parallel_attach=False):
+    """
+    Connect and attach the databases without table, META or view setup.
+    
+    Intended for short jobs against an already initialised system; pandas
+    is not imported on this path. The salt check still runs.
+    """
+    con = sdb.create_and_attach_dbs("init_tables", parallel=parallel_attach)
+    if not sdb.salt_checking(con):
+        con.close()
+        raise ValueError("SALT_CHECK value mismatch. Potential integrity issue detected.")
+    return con
+
+def get_client(socket_path=None):
+    """
+    Get a client for the running query server, or None if none is running.
+    
+    Start the server with ``python launcher/start_db.py --serve``. Queries
+    through the client return pyarrow Tables and skip the bootstrap. The
+    socket is ``temp/uainedb.sock`` unless ``socket_path`` is given.
+    """
+    import query_server
+    socket_path = socket_path or query_server.SOCKET_PATH
+    if query_server.server_running(socket_path):
+        return query_server.QueryClient(socket_path)
+    return None
+
 def close_connection(con):
     con.close()
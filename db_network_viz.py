@@ -2,11 +2,13 @@
 Script to visualize the live DuckDB network (databases and views) using pyvis.
 """
 import conn
+import lazy_attach
 from uainepydat import duckfunc
 from pyvis.network import Network
 
 # Connect to the database system
 con = conn.get_connection()
+lazy_attach.attach_all(con)
 
 # Get all attached databases
 attached_dbs = duckfunc.get_attached_dbs(con).df()
@@ -1,81 +1,536 @@
 import os
-import pandas as pd
-import conn
-from uainepydat import duckfunc
 import csv
+import time
+import shutil
+import argparse
+from typing import NamedTuple, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import conn
+# conn puts launcher/ on sys.path; import its modules the way start_db does
+import lazy_attach
+import conn_pool
+import partitioning
+import db_utils
+
+# Default number of tables exported at once
+DUMP_WORKERS = min(8, os.cpu_count() or 1)
+
+FORMATS = ("csv", "parquet")
+
+MANIFEST_NAME = "dumped_tables.csv"
+MANIFEST_FIELDS = ["database_name", "table_name", "path", "rows", "bytes", "seconds", "fingerprint", "options", "action"]
+
+class ExportOptions(NamedTuple):
+    """
+    COPY settings for a dump.
+
+    ``partition_by`` holds (lower-cased ``database.table``, columns) pairs
+    for the tables whose files are partitioned on those columns. ``max_file_size`` (for example
+    ``"256MB"``) splits other tables into several files; DuckDB cannot
+    combine it with partitioning. ``compression`` and ``row_group_size``
+    only apply to Parquet. ``memory_limit`` (for example ``"4GB"``) caps
+    DuckDB's memory for the whole dump.
+    """
+    output_format: str = "parquet"
+    compression: Optional[str] = None
+    row_group_size: Optional[int] = None
+    max_file_size: Optional[str] = None
+    partition_by: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+    memory_limit: Optional[str] = None
+
+def dump_inventory(con):
+    """
+    List every user table to dump with a single catalog query.
+
+    Dump files and manifest rows are keyed by database and table name, and
+    the launcher only creates tables in the ``main`` schema, so tables in
+    other schemas are skipped with a warning rather than written over each
+    other.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+
+    Returns
+    -------
+    list of tuple
+        (database, schema, table, estimated size) rows, largest first.
+    """
+    tables = con.execute("""
+        SELECT database_name, schema_name, table_name, estimated_size FROM duckdb_tables()
+        WHERE NOT internal
+        ORDER BY estimated_size DESC, database_name, table_name
+    """).fetchall()
+    for db_name, schema_name, table_name, _ in tables:
+        if schema_name != "main":
+            print(f"Warning: {db_name}.{schema_name}.{table_name} is not in the main schema and is not dumped")
+    return [row for row in tables if row[1] == "main"]
+
+def table_fingerprint(con, db_name, schema_name, table_name):
+    """
+    Fingerprint the contents and columns of a table.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor to run the query on.
+    db_name, schema_name, table_name : str
+        The table.
+
+    Returns
+    -------
+    str
+        ``<row count>:<sum of row hashes>:<column hash>``. The row hash
+        covers every column, so inserts, deletes and updates change it; the
+        column hash covers the column names and types, so schema changes to
+        empty tables are caught too.
+    """
+    count, row_hash, columns = con.execute(f"""
+        SELECT COUNT(*), COALESCE(sum(hash(t)), 0),
+            (SELECT hash(string_agg(column_name || ' ' || data_type, ',' ORDER BY column_index))
+             FROM duckdb_columns()
+             WHERE database_name = '{db_name}' AND schema_name = '{schema_name}' AND table_name = '{table_name}')
+        FROM "{db_name}"."{schema_name}"."{table_name}" AS t
+    """).fetchone()
+    return f"{count}:{row_hash}:{columns}"
+
+def read_manifest(dump_name):
+    """
+    Read the manifest of an earlier dump.
+
+    Parameters
+    ----------
+    dump_name : str
+        Dump folder.
+
+    Returns
+    -------
+    dict
+        Manifest rows keyed by (database, table). Empty if the dump has no
+        manifest.
+    """
+    csv_path = os.path.join(dump_name, MANIFEST_NAME)
+    if not os.path.exists(csv_path):
+        return {}
+    with open(csv_path, newline='') as csvfile:
+        return {(row["database_name"], row["table_name"]): row for row in csv.DictReader(csvfile)}
+
+def carry_forward(previous_path, output_path):
+    """
+    Reuse an unchanged file, or folder of files, from an earlier dump.
+
+    A hard link is used where the file system allows it, otherwise the
+    file is copied.
+
+    Parameters
+    ----------
+    previous_path : str
+        File or folder in the earlier dump.
+    output_path : str
+        File or folder in the new dump.
+
+    Returns
+    -------
+    str
+        ``linked`` or ``copied``.
+    """
+    remove_output(output_path)
+    if os.path.isdir(previous_path):
+        actions = set()
+        for folder, _, files in os.walk(previous_path):
+            target_folder = os.path.join(output_path, os.path.relpath(folder, previous_path))
+            os.makedirs(target_folder, exist_ok=True)
+            for name in files:
+                actions.add(carry_forward(os.path.join(folder, name), os.path.join(target_folder, name)))
+        return "copied" if "copied" in actions else "linked"
+    try:
+        os.link(previous_path, output_path)
+        return "linked"
+    except OSError:
+        shutil.copy2(previous_path, output_path)
+        return "copied"
+
+def remove_output(output_path):
+    """Remove an earlier output file or folder; it may be hard linked to an older dump."""
+    if os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+def output_size(output_path):
+    """Size in bytes of an output file, or of every file in an output folder."""
+    if not os.path.isdir(output_path):
+        return os.path.getsize(output_path)
+    return sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, files in os.walk(output_path) for name in files)
+
+def table_partitions(options, db_name, table_name):
+    """The partition columns configured for a table, empty if none."""
+    return dict(options.partition_by).get(f"{db_name}.{table_name}".lower(), ())
+
+def copy_options(options, partition_cols=()):
+    """
+    Build the COPY options for a table.
+
+    Parameters
+    ----------
+    options : ExportOptions
+        Dump settings.
+    partition_cols : tuple of str, optional
+        Columns to partition the table's files on.
+
+    Returns
+    -------
+    str
+        The option list, without parentheses.
+    """
+    if options.output_format == "csv":
+        parts = ["FORMAT csv", "HEADER"]
+    else:
+        parts = ["FORMAT parquet"]
+        if options.compression:
+            parts.append(f"COMPRESSION {options.compression}")
+        if options.row_group_size:
+            parts.append(f"ROW_GROUP_SIZE {int(options.row_group_size)}")
+    if partition_cols:
+        # DuckDB cannot combine FILE_SIZE_BYTES with PARTITION_BY, so partitioned tables get one file per partition
+        parts.append("PARTITION_BY (" + ", ".join(f'"{col}"' for col in partition_cols) + ")")
+    elif options.max_file_size:
+        parts.append(f"FILE_SIZE_BYTES '{options.max_file_size}'")
+    return ", ".join(parts)
+
+def output_relpath(options, db_name, table_name, partition_cols=()):
+    """
+    Path of a table's output inside the dump folder.
+
+    Returns
+    -------
+    str
+        ``<db>/<table>.<format>``, or the folder ``<db>/<table>`` when the
+        table is partitioned or split by file size.
+    """
+    if partition_cols or options.max_file_size:
+        return os.path.join(db_name, table_name)
+    return os.path.join(db_name, f"{table_name}.{options.output_format}")
+
+def export_table(con, db_name, schema_name, table_name, output_path, copy_opts):
+    """
+    Export one table with a native COPY.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor to run the COPY on.
+    db_name, schema_name, table_name : str
+        The table to export.
+    output_path : str
+        File, or folder for partitioned and split output, to write.
+    copy_opts : str
+        Options from ``copy_options``.
+
+    Returns
+    -------
+    dict
+        Manifest row with the rows written, size in bytes and seconds taken.
+    """
+    start = time.perf_counter()
+    path = output_path.replace("'", "''")
+    rows = con.execute(
+        f'COPY (SELECT * FROM "{db_name}"."{schema_name}"."{table_name}") TO \'{path}\' ({copy_opts})'
+    ).fetchone()[0]
+    seconds = time.perf_counter() - start
+    return {
+        "database_name": db_name,
+        "table_name": table_name,
+        "rows": rows,
+        "bytes": output_size(output_path),
+        "seconds": round(seconds, 6),
+        "options": copy_opts,
+        "action": "written",
+    }
+
+def write_manifest(dump_name, dumped_tables):
+    """
+    Write the dumped tables information to the manifest CSV file.
+
+    Parameters
+    ----------
+    dump_name : str
+        Dump folder.
+    dumped_tables : list of dict
+        Manifest rows from ``export_table``.
+
+    Returns
+    -------
+    str
+        Path of the manifest.
+    """
+    csv_path = os.path.join(dump_name, MANIFEST_NAME)
+    with open(csv_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(dumped_tables)
+    return csv_path
+
+def dump_tables(con, dump_name, options=ExportOptions(), workers=DUMP_WORKERS, previous_dump=None):
+    """
+    Export every table in parallel, largest first, with a cursor per worker.
+
+    Every table is fingerprinted in the same transaction as its COPY and
+    the fingerprint is stored in the manifest, so any dump can be the base
+    of a later incremental one. With ``previous_dump``, a table whose
+    fingerprint and COPY options match the earlier dump's manifest is not
+    exported again; its files are hard linked (or copied) from the earlier
+    dump instead.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection with every database attached.
+    dump_name : str
+        Dump folder; each table is written to ``<dump>/<db>/<table>.<format>``,
+        or to the folder ``<dump>/<db>/<table>`` when it is partitioned or
+        split by file size.
+    options : ExportOptions, optional
+        Format and COPY settings, by default plain Parquet files.
+    workers : int, optional
+        Maximum number of tables exported at once.
+    previous_dump : str, optional
+        Earlier dump folder to carry unchanged tables forward from.
+
+    Returns
+    -------
+    list of dict
+        Manifest rows in inventory order.
+
+    Raises
+    ------
+    RuntimeError
+        If any table fails to export; the other tables are still exported.
+    """
+    inventory = dump_inventory(con)
+    previous = read_manifest(previous_dump) if previous_dump else {}
+    cursors = conn_pool.ThreadCursors(con)
+
+    def export(db_name, schema_name, table_name):
+        os.makedirs(os.path.join(dump_name, db_name), exist_ok=True)
+        partition_cols = table_partitions(options, db_name, table_name)
+        relpath = output_relpath(options, db_name, table_name, partition_cols)
+        output_path = os.path.join(dump_name, relpath)
+        copy_opts = copy_options(options, partition_cols)
+        cursor = cursors.get()
+
+        start = time.perf_counter()
+        # The fingerprint and the COPY read one snapshot, so the manifest describes the exported file
+        with db_utils.transaction(cursor):
+            fingerprint = table_fingerprint(cursor, db_name, schema_name, table_name)
+            earlier = previous.get((db_name, table_name))
+            unchanged = (earlier and earlier.get("fingerprint") == fingerprint and earlier.get("options") == copy_opts
+                         and earlier.get("path") == relpath and os.path.exists(os.path.join(previous_dump, relpath)))
+            if not unchanged:
+                remove_output(output_path)
+                row = export_table(cursor, db_name, schema_name, table_name, output_path, copy_opts)
+
+        if unchanged:
+            action = carry_forward(os.path.join(previous_dump, relpath), output_path)
+            return {
+                "database_name": db_name,
+                "table_name": table_name,
+                "path": relpath,
+                "rows": earlier["rows"],
+                "bytes": output_size(output_path),
+                "seconds": round(time.perf_counter() - start, 6),
+                "fingerprint": fingerprint,
+                "options": copy_opts,
+                "action": action,
+            }
+
+        row["path"] = relpath
+        row["fingerprint"] = fingerprint
+        return row
+
+    results = {}
+    failures = []
+    with cursors:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # Submitted largest first, so the biggest tables start before the small ones
+            futures = {pool.submit(export, db, schema, table): (db, table) for db, schema, table, _ in inventory}
+            for future in as_completed(futures):
+                db_name, table_name = futures[future]
+                try:
+                    row = future.result()
+                except Exception as e:
+                    failures.append(f"{db_name}.{table_name}: {e}")
+                    print(f"Failed to dump {db_name}.{table_name}: {e}")
+                    continue
+                results[(db_name, table_name)] = row
+                if row["action"] == "written":
+                    print(f"Dumped {db_name}.{table_name}: {row['rows']} rows, {row['bytes']} bytes in {row['seconds']:.3f} s")
+                else:
+                    print(f"Unchanged {db_name}.{table_name}, {row['action']} from {previous_dump}")
+
+    if failures:
+        raise RuntimeError("Dump failed for " + "; ".join(failures))
+    return [results[(db, table)] for db, _, table, _ in inventory]
+
+def dump_archives(con, dump_name, def_tables_path="init_tables"):
+    """
+    Carry the archived periods of every partitioned table into a dump.
+
+    Periods past a table's retention only exist as Parquet files in its
+    archive folder, so they are hard linked (or copied) to
+    ``<dump>/archive/<DBNAME>/<TABLE>`` for ``restore_db`` to put back.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection with every database attached.
+    dump_name : str
+        Dump folder.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+
+    Returns
+    -------
+    int
+        Number of archive files carried.
+    """
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    carried = 0
+    for table in partitioning.partitioned_tables(def_tables_path):
+        catalog = db_utils.resolve_catalog(table.dbname, driver_alias)
+        folder = partitioning.archive_folder(con, table, catalog)
+        labels = partitioning.archived_periods(folder, table)
+        if not labels:
+            continue
+        target = os.path.join(dump_name, partitioning.ARCHIVE_DIR, table.dbname, table.tablename)
+        os.makedirs(target, exist_ok=True)
+        for label in labels:
+            name = partitioning.partition_name(table, label) + ".parquet"
+            carry_forward(os.path.join(folder, name), os.path.join(target, name))
+        carried += len(labels)
+        print(f"Dumped {len(labels)} archived periods of {table.key}")
+    return carried
+
+def parse_partition_specs(specs):
+    """
+    Parse ``database.table=col1,col2`` partition settings.
+
+    Parameters
+    ----------
+    specs : list of str
+        Settings as given on the command line.
+
+    Returns
+    -------
+    tuple of tuple
+        (lower-cased ``database.table``, columns) pairs, for
+        ``ExportOptions.partition_by``.
+
+    Raises
+    ------
+    ValueError
+        If a setting is not in the expected form.
+    """
+    partition_by = {}
+    for spec in specs or []:
+        table, _, columns = spec.partition("=")
+        cols = tuple(col.strip() for col in columns.split(",") if col.strip())
+        if table.count(".") != 1 or not cols:
+            raise ValueError(f"Partition setting {spec} should look like database.table=column[,column]")
+        partition_by[table.strip().lower()] = cols
+    return tuple(partition_by.items())
+
+def dump_database_to_parquet(dump_name, output_format="parquet", workers=DUMP_WORKERS, previous_dump=None, options=None,
+                             def_tables_path="init_tables"):
+    """
+    Dump every table of every database to data files.
+
+    The archived periods of partitioned tables are carried along, see
+    ``dump_archives``.
+
+    Parameters
+    ----------
+    dump_name : str
+        Dump folder to create.
+    output_format : str, optional
+        ``csv`` or ``parquet``, by default ``parquet``. Ignored when
+        ``options`` is given.
+    workers : int, optional
+        Maximum number of tables exported at once.
+    previous_dump : str, optional
+        Earlier dump folder, in the same format, for an incremental dump:
+        only tables whose fingerprint changed are exported again.
+    options : ExportOptions, optional
+        Format, compression, row group, file size, partitioning and memory
+        settings.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+
+    Raises
+    ------
+    ValueError
+        If the format is unknown or the dump would overwrite ``previous_dump``.
+    """
+    options = options or ExportOptions(output_format=output_format)
+    if options.output_format not in FORMATS:
+        raise ValueError(f"Unknown output format {options.output_format}, expected one of {', '.join(FORMATS)}")
+    if options.output_format == "csv" and (options.compression or options.row_group_size):
+        raise ValueError("Compression and row group size settings only apply to Parquet dumps")
+    if previous_dump and os.path.abspath(previous_dump) == os.path.abspath(dump_name):
+        raise ValueError("An incremental dump must be written to a new folder, not over the previous dump")
 
-def dump_database_to_parquet(dump_name):
     # Create the root directory for the dump
     os.makedirs(dump_name, exist_ok=True)
-    
+
     # Get database connection
     con = conn.get_connection()
-    
+
     try:
-        # Get list of all attached databases
-        attached_dbs = duckfunc.get_attached_dbs(con)
-        
-        # Convert to pandas DataFrame if it's not already
-        if not isinstance(attached_dbs, pd.DataFrame):
-            attached_dbs = attached_dbs.df()
-        
-        # List to store dumped tables information
-        dumped_tables = []
-        
-        # Ask for output format once
-        output_format = input("Enter output format for all tables (csv/parquet): ").strip().lower()
-        if output_format not in ['csv', 'parquet']:
-            print("Invalid format, exiting.")
-            return
-        
-        # Iterate through each database
-        for _, db_row in attached_dbs.iterrows():
-            db_name = db_row['DB_NAME']
-            print("dumping for", db_name)
-            db_dir = os.path.join(dump_name, db_name)
-            
-            # Create directory for this database
-            os.makedirs(db_dir, exist_ok=True)
-            
-            # Get inventory of all tables
-            inventory = duckfunc.get_inventory(con)
-            if not isinstance(inventory, pd.DataFrame):
-                inventory = inventory.df()
-            
-            # Filter inventory for current database
-            db_tables = inventory[inventory['database_name'] == db_name]
-            
-            # Dump each table to the chosen format
-            for _, table_row in db_tables.iterrows():
-                table_name = table_row['table_name']
-                output_path = os.path.join(db_dir, f"{table_name}.{output_format}")
-                
-                # Use duckfunc.save_from_db to query and save the table
-                success = duckfunc.save_from_db(con, db_name, table_name, output_path)
-                
-                if success:
-                    print(f"Dumped {db_name}.{table_name} to {output_path}")
-                    # Append database and table name to the list
-                    dumped_tables.append({'database_name': db_name, 'table_name': table_name})
-                else:
-                    print(f"Failed to dump {db_name}.{table_name} (table might not exist). Skipping.")
-        
-        # Write the dumped tables information to a CSV file
-        csv_path = os.path.join(dump_name, 'dumped_tables.csv')
-        with open(csv_path, 'w', newline='') as csvfile:
-            fieldnames = ['database_name', 'table_name']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        # A dump covers every database, including lazy ones
+        lazy_attach.attach_all(con)
+
+        if options.memory_limit:
+            # Let COPY stream in bounded memory instead of keeping rows in order
+            con.execute(f"SET memory_limit = '{options.memory_limit}'")
+            con.execute("SET preserve_insertion_order = false")
 
-            writer.writeheader()
-            writer.writerows(dumped_tables)
+        start = time.perf_counter()
+        dumped_tables = dump_tables(con, dump_name, options, workers, previous_dump)
+        archived = dump_archives(con, dump_name, def_tables_path)
 
+        # Write the dumped tables information to a CSV file
+        csv_path = write_manifest(dump_name, dumped_tables)
         print(f"\nDumped tables information written to {csv_path}")
-        
-        print(f"\nDatabase dump completed successfully to {dump_name}")
-        
+
+        total_bytes = sum(row["bytes"] for row in dumped_tables)
+        written = sum(1 for row in dumped_tables if row["action"] == "written")
+        print(f"\nDatabase dump of {len(dumped_tables)} tables ({written} written, {total_bytes} bytes) and {archived} archive files "
+              f"completed in {time.perf_counter() - start:.2f} s to {dump_name}")
+
     finally:
         conn.close_connection(con)
 
 if __name__ == "__main__":
-    dump_name = input("Enter the name for the dump folder: ")
-    dump_database_to_parquet(dump_name) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Dump every table of every database to data files.")
+    parser.add_argument("dump_name", help="dump folder to create")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="output format, by default parquet")
+    parser.add_argument("--workers", type=int, default=DUMP_WORKERS, help="tables exported at once")
+    parser.add_argument("--previous", help="earlier dump folder for an incremental dump")
+    parser.add_argument("--partition", action="append", metavar="DB.TABLE=COL[,COL]",
+                        help="partition a table's files on columns, may be repeated")
+    parser.add_argument("--max-file-size", help="split unpartitioned tables into files of about this size, e.g. 256MB")
+    parser.add_argument("--compression", help="Parquet compression codec, e.g. zstd, snappy, gzip")
+    parser.add_argument("--row-group-size", type=int, help="rows per Parquet row group")
+    parser.add_argument("--memory-limit", help="DuckDB memory limit for the dump, e.g. 4GB")
+    args = parser.parse_args()
+
+    dump_database_to_parquet(args.dump_name, workers=args.workers, previous_dump=args.previous, options=ExportOptions(
+        output_format=args.format,
+        compression=args.compression,
+        row_group_size=args.row_group_size,
+        max_file_size=args.max_file_size,
+        partition_by=parse_partition_specs(args.partition),
+        memory_limit=args.memory_limit,
+    ))
@@ -17,5 +17,14 @@ for /f "skip=1 tokens=1,2 delims=|" %%a in (%DB_LIST%) do (
     echo ATTACH '%%~a' AS %%b (READ_ONLY^); >> %SQL_OUTPUT%
 )
 
+REM Only run the bootstrap script from start_db(bootstrap=True) when asked: launch_ui.bat bootstrap
+if /i "%~1"=="bootstrap" (
+    if not exist "temp\bootstrap.sql" (
+        echo temp\bootstrap.sql not found, run a bootstrap launch first
+        exit /b 1
+    )
+    set SQL_OUTPUT=temp\bootstrap.sql
+)
+
 REM Start DuckDB and execute the generated SQL file, then keep the CLI open
 duckdb -ui -init %SQL_OUTPUT%
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""
+Batched bootstrap of the database system from the init table lists.
+
+This module compiles the attach, table, META_HISTORY and view statements for
+every database into one SQL script and runs it with one transaction and one
+commit per database. DuckDB only lets a transaction write to a single
+attached database, so each database gets its own block; a failing block is
+rolled back and stops the bootstrap. The script is also written to disk so
+the DuckDB CLI started by launch_ui.bat can reuse it.
+"""
+import os
+import time
+import datetime
+from typing import NamedTuple, List, Tuple
+import dbmet
+import parse_db_list
+import db_utils
+import schema_model
+import sharding
+import partitioning
+import views
+import profiler as startup_profiler
+
+# Where the compiled script is written for the DuckDB CLI
+BOOTSTRAP_SCRIPT = os.path.join("temp", "bootstrap.sql")
+
+class BootstrapPlan(NamedTuple):
+    """Attach statements plus one block of (sql, params) statements per database."""
+    driver_alias: str
+    attach: List[str]
+    blocks: List[Tuple[str, list]]
+
+def sql_literal(value):
+    """
+    Render a Python value as a SQL literal.
+
+    Parameters
+    ----------
+    value : object
+        None, a number or a string.
+
+    Returns
+    -------
+    str
+        The SQL literal.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def render_statement(sql, params):
+    """
+    Inline the parameters of a statement so it can be written to a script.
+
+    Parameters
+    ----------
+    sql : str
+        Statement using ``?`` placeholders.
+    params : list
+        Values for the placeholders, in order.
+
+    Returns
+    -------
+    str
+        The statement with every placeholder replaced by a literal.
+    """
+    parts = sql.split("?")
+    if len(parts) != len(params) + 1:
+        raise ValueError("Statement placeholders do not match its parameters")
+    rendered = parts[0]
+    for value, part in zip(params, parts[1:]):
+        rendered += sql_literal(value) + part
+    return rendered
+
+def compile_bootstrap(con, def_tables_path, fk_mode="enforced"):
+    """
+    Compile the bootstrap plan for the databases attached to a connection.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Driver connection with the listed databases attached.
+    def_tables_path : str
+        Path to the directory containing def_tables.csv and views.csv.
+    fk_mode : str, optional
+        ``enforced`` or ``deferred`` LINKS_TO columns, see
+        ``start_db.init_tables_from_list``.
+
+    Returns
+    -------
+    BootstrapPlan
+        The attach statements and the per-database statement blocks. Tables
+        in attached databases come first, then the driver database with
+        its tables and the views that are missing or changed, except the
+        views reading materialized views. Shards of sharded tables are
+        created in their own databases and the routing views after all
+        tables; partitioned tables get their current partition and view.
+    """
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    attached = con.execute("""
+        SELECT database_name, path, readonly FROM duckdb_databases()
+        WHERE NOT internal AND database_name <> current_database()
+        ORDER BY database_oid
+    """).fetchall()
+
+    attach = []
+    for name, path, readonly in attached:
+        statement = f"ATTACH IF NOT EXISTS '{path}' AS {name}"
+        if readonly:
+            statement += " (READ_ONLY)"
+        attach.append(statement)
+
+    model = schema_model.load_schema(os.path.join(def_tables_path, "def_tables.csv"))
+    for warning in model.warnings:
+        print(f"Warning: {warning}")
+    tables_by_db = {}
+    routing_views = {}
+    for table_key in model.creation_order:
+        table = model.tables[table_key]
+        dbname = db_utils.resolve_catalog(table.dbname, driver_alias)
+        if table.is_sharded:
+            for (shard_db, _), name in zip(table.shards, sharding.shard_tables(table, driver_alias)):
+                shard_db = db_utils.resolve_catalog(shard_db, driver_alias)
+                tables_by_db.setdefault(shard_db, []).append((schema_model.table_ddl(table, with_fks=False, name=name), []))
+            routing_views.setdefault(dbname, []).append((sharding.routing_view_sql(table, driver_alias), []))
+            continue
+        if table.is_partitioned:
+            # The current period's partition, and the view over it and the periods already in the catalog
+            label = partitioning.period_label(datetime.date.today(), table.partition_grain)
+            live = set(partitioning.live_periods(con, table, dbname)) | {label}
+            tables_by_db.setdefault(dbname, []).append(
+                (partitioning.partition_ddl(table, dbname, label, with_fks=fk_mode == "enforced"), []))
+            folder = partitioning.archive_folder(con, table, dbname)
+            tables_by_db[dbname].append(
+                (partitioning.routing_view_sql(table, dbname, live, partitioning.archived_periods(folder, table), folder), []))
+            continue
+        tables_by_db.setdefault(dbname, []).append((schema_model.table_ddl(table, with_fks=fk_mode == "enforced"), []))
+
+    blocks = []
+    for name, _, _ in attached:
+        if name in tables_by_db:
+            blocks.append((name, tables_by_db[name]))
+    # Routing views bind their shards, so they follow every table block
+    for name, _, _ in attached:
+        if name in routing_views:
+            blocks.append((name, routing_views[name]))
+
+    driver_statements = tables_by_db.get(driver_alias, []) + routing_views.get(driver_alias, [])
+    # Views reading materialized views wait for the refresh after the bootstrap
+    driver_statements += views.view_sync_statements(
+        con, def_tables_path, skip=views.materialized_readers(os.path.join(def_tables_path, "views.csv")))
+    blocks.append((driver_alias, driver_statements))
+
+    return BootstrapPlan(driver_alias, attach, blocks)
+
+def render_script(plan, driver_path):
+    """
+    Render a bootstrap plan as a SQL script for the DuckDB CLI.
+
+    Parameters
+    ----------
+    plan : BootstrapPlan
+        The compiled plan.
+    driver_path : str
+        Path to the driver database, attached first so the script can run
+        from a plain CLI session.
+
+    Returns
+    -------
+    str
+        The SQL script.
+    """
+    lines = ["-- Generated by launcher/bootstrap.py, changes will be overwritten"]
+    lines.append(f"ATTACH IF NOT EXISTS '{driver_path}' AS {plan.driver_alias};")
+    lines += [statement + ";" for statement in plan.attach]
+    for dbname, statements in plan.blocks:
+        lines.append("")
+        lines.append(f"USE {dbname};")
+        lines.append("BEGIN TRANSACTION;")
+        lines += [render_statement(sql, params) + ";" for sql, params in statements]
+        lines.append("COMMIT;")
+    lines.append(f"USE {plan.driver_alias};")
+    return "\n".join(lines) + "\n"
+
+def write_script(plan, driver_path, script_path=BOOTSTRAP_SCRIPT):
+    """
+    Write a bootstrap plan to disk as a SQL script.
+
+    Parameters
+    ----------
+    plan : BootstrapPlan
+        The compiled plan.
+    driver_path : str
+        Path to the driver database.
+    script_path : str, optional
+        Output path, by default ``temp/bootstrap.sql``.
+    """
+    parse_db_list.create_filepath_dirs(script_path)
+    with open(script_path, "w") as file:
+        file.write(render_script(plan, driver_path))
+    print(f"Bootstrap script written to {script_path}")
+
+def execute_block(con, dbname, statements):
+    """
+    Run one database block in a single transaction.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    dbname : str
+        Database the block writes to; it is made the current database so
+        unqualified foreign key references resolve.
+    statements : list of tuple
+        (sql, params) pairs to execute.
+
+    Raises
+    ------
+    RuntimeError
+        If a statement fails. The block is rolled back first.
+    """
+    with db_utils.transaction(con, f"Bootstrap of database {dbname}", database=dbname):
+        for sql, params in statements:
+            con.execute(sql, params)
+
+def run_bootstrap(con, def_tables_path, meta_values, script_path=BOOTSTRAP_SCRIPT, profiler=None, fk_mode="enforced"):
+    """
+    Compile, write and run the bootstrap script on a connection.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Driver connection with the listed databases attached.
+    def_tables_path : str
+        Path to the directory containing the init CSV files.
+    meta_values : dict
+        Launch values recorded in META, see ``dbmet.meta_upkeep_statements``.
+        They are only added to the executed plan, not to the script on disk.
+    script_path : str, optional
+        Where to write the script, by default ``temp/bootstrap.sql``.
+    profiler : profiler.StartupProfiler, optional
+        Receives the run time of each database block.
+    fk_mode : str, optional
+        ``enforced`` or ``deferred`` LINKS_TO columns.
+
+    Raises
+    ------
+    RuntimeError
+        If a database block fails to run.
+    """
+    profiler = profiler or startup_profiler.StartupProfiler()
+    plan = compile_bootstrap(con, def_tables_path, fk_mode)
+    driver_path = con.execute("SELECT path FROM duckdb_databases() WHERE database_name = current_database()").fetchone()[0]
+    write_script(plan, driver_path, script_path)
+
+    for statement in plan.attach:
+        con.execute(statement)
+
+    for dbname, statements in plan.blocks:
+        if dbname == plan.driver_alias:
+            statements = statements + dbmet.meta_upkeep_statements(meta_values)
+        start = time.perf_counter()
+        execute_block(con, dbname, statements)
+        profiler.record("bootstrap", dbname, time.perf_counter() - start)
+        print(f"Bootstrapped {dbname} ({len(statements)} statements, 1 commit)")
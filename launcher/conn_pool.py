@@ -0,0 +1,52 @@
+"""
+Per-thread DuckDB cursors for multi-threaded workers.
+
+A DuckDB connection must not be used by several threads at once, but its
+cursors can. This module gives each worker thread a cursor of one started
+connection, so the attached databases are queried concurrently without
+running start_db again.
+"""
+import threading
+
+class ThreadCursors:
+    """
+    One cursor per worker thread on a connection, closed together.
+
+    Used around a thread pool whose tasks each need a cursor of their own
+    for the life of the thread, for example::
+
+        with ThreadCursors(con) as cursors:
+            with ThreadPoolExecutor() as pool:
+                pool.submit(lambda: cursors.get().execute(...))
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        The connection the cursors are created on.
+    """
+    def __init__(self, con):
+        self.con = con
+        self._local = threading.local()
+        self._cursors = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Get the calling thread's cursor, creating it on first use."""
+        if not hasattr(self._local, "cursor"):
+            self._local.cursor = self.con.cursor()
+            with self._lock:
+                self._cursors.append(self._local.cursor)
+        return self._local.cursor
+
+    def close(self):
+        """Close every cursor handed out."""
+        with self._lock:
+            for cursor in self._cursors:
+                cursor.close()
+            self._cursors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -4,16 +4,28 @@ Database hash utilities for salt-based hashing operations.
 This module provides functions for loading salt values and creating
 hashed data using the database salt for security purposes.
 Now loads from db_salt.json, supporting hash method, key, and truncation length.
+The config is read once per salt file and cached for the process, and whole
+columns can be hashed inside DuckDB with ``register_hash_udf``.
 """
 import json
+import hashlib
 from uainepydat import datahash
 
 # Module-level variable to store the salt file location
 salt_location = 'db_salt.json'
 
+# Salt configs already read, keyed by salt file location
+_salt_cache = {}
+
+# Default SQL name of the salted hash function
+HASH_UDF_NAME = "db_salt_hash"
+
 def load_salt_config() -> dict:
     """
     Load salt configuration from the JSON file.
+
+    The file is only read the first time for each ``salt_location``; use
+    ``clear_salt_cache`` after changing it.
     Returns
     -------
     dict
@@ -27,13 +39,23 @@ def load_salt_config() -> dict:
     ValueError
         If the JSON is invalid or missing required fields.
     """
+    cached = _salt_cache.get(salt_location)
+    if cached is not None:
+        return cached
     with open(salt_location, 'r') as file:
         config = json.load(file)
     # Validate required fields
     if not all(k in config for k in ("hash_method", "key", "truncation_length")):
         raise ValueError("db_salt.json missing required fields")
+    _salt_cache[salt_location] = config
     return config
 
+def clear_salt_cache():
+    """
+    Forget the cached salt configs so the next load reads the file again.
+    """
+    _salt_cache.clear()
+
 def load_salt() -> str:
     """
     Load salt value (the key) from the salt config file.
@@ -81,3 +103,80 @@ def generate_salt_check() -> str:
     """
     salt = load_salt()
     return hash_with_db_salt(salt)
+
+# DuckDB function and expression for each hash method, with the same byte
+# layout as datahash.hash256 (data + salt) and datahash.hashmd5 (salt + data)
+_NATIVE_HASHES = {
+    "SHA256": ("sha256", "sha256(value || salt)"),
+    "MD5": ("md5", "md5(salt || value)"),
+}
+
+def _batch_hasher(config):
+    method = config["hash_method"].upper()
+    trunc_len = int(config.get("truncation_length", 0))
+    if method == "SHA256":
+        def digest(value, salt):
+            return hashlib.sha256((value + salt).encode('utf-8')).hexdigest()
+    elif method == "MD5":
+        def digest(value, salt):
+            return hashlib.md5((salt + value).encode('utf-8')).hexdigest()
+    else:
+        raise ValueError(f"Unsupported hash method: {method}")
+    if trunc_len > 0:
+        return lambda value, salt: digest(value, salt)[:trunc_len]
+    return digest
+
+def _native_hash_sql(con, config):
+    # None when this DuckDB build lacks the hash function
+    function, expr = _NATIVE_HASHES[config["hash_method"].upper()]
+    found = con.execute("SELECT COUNT(*) FROM duckdb_functions() WHERE function_name = ?", [function]).fetchone()[0]
+    if not found:
+        return None
+    trunc_len = int(config.get("truncation_length", 0))
+    if trunc_len > 0:
+        expr = f"left({expr}, {trunc_len})"
+    return expr
+
+def register_hash_udf(con, name=HASH_UDF_NAME):
+    """
+    Register the salted hash as a SQL function on a DuckDB connection.
+
+    The function takes a VARCHAR column and the salt, and applies the
+    configured hash method and truncation, giving the same result as
+    ``hash_with_db_salt`` per value. NULL stays NULL. The salt is not part
+    of the function, so pass it as a bound parameter::
+
+        con.execute("UPDATE users.USERS SET email = db_salt_hash(email, ?)",
+                    [db_hash.load_salt()])
+
+    It is a temporary macro over DuckDB's built-in ``sha256`` or ``md5``
+    and ``left``. Only if this DuckDB build lacks the configured hash
+    function is a Python Arrow UDF registered as a fallback; it needs
+    pyarrow and is much slower.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    name : str, optional
+        SQL name of the function, by default ``db_salt_hash``.
+
+    Raises
+    ------
+    ValueError
+        If the configured hash method is not supported.
+    """
+    config = load_salt_config()
+    hasher = _batch_hasher(config)
+    expr = _native_hash_sql(con, config)
+    if expr is not None:
+        con.execute(f"CREATE OR REPLACE TEMP MACRO {name}(value, salt) AS {expr}")
+        return
+
+    import pyarrow as pa
+
+    def hash_batch(values, salts):
+        return pa.array([None if value is None else hasher(value, salt)
+                         for value, salt in zip(values.to_pylist(), salts.to_pylist())], pa.string())
+
+    con.create_function(name, hash_batch, ['VARCHAR', 'VARCHAR'], 'VARCHAR', type='arrow', null_handling='special')
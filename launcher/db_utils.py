@@ -0,0 +1,77 @@
+"""
+Helpers shared by the launcher modules and the scripts built on them.
+
+Definitions name the driver database ``main``, which is attached under
+another alias, so catalog names are resolved with ``resolve_catalog``.
+Writes that must be all or nothing run in ``transaction``.
+"""
+from contextlib import contextmanager
+
+def resolve_catalog(dbname, driver_alias):
+    """
+    Resolve a database name from the init files to its attached catalog.
+
+    Parameters
+    ----------
+    dbname : str
+        Database name as written in the init files.
+    driver_alias : str
+        Alias of the driver database, from ``SELECT current_database()``.
+
+    Returns
+    -------
+    str
+        ``driver_alias`` for ``main``, otherwise ``dbname``.
+    """
+    return driver_alias if dbname.lower() == "main" else dbname
+
+def catalog_key(table_key, driver_alias):
+    """Resolve a def_tables.csv ``dbname.tablename`` to ``catalog.tablename``."""
+    db_name, table_name = table_key.split(".")
+    return f"{resolve_catalog(db_name, driver_alias)}.{table_name}"
+
+@contextmanager
+def transaction(con, action=None, database=None):
+    """
+    Run a block in one transaction, committed when the block ends.
+
+    The transaction is rolled back if the block raises. DuckDB ends a
+    transaction whose COMMIT fails itself, so it is not rolled back again.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor to run the transaction on.
+    action : str, optional
+        What the block does, for example ``"Updating main.META"``. Failures
+        are then raised as ``RuntimeError("<action> failed and was rolled
+        back: ...")``; without it the original exception is raised.
+    database : str, optional
+        Database to make current for the transaction. The previous current
+        database is restored afterwards.
+
+    Raises
+    ------
+    RuntimeError
+        If the block or the commit fails and ``action`` is given.
+    """
+    previous = None
+    if database is not None:
+        previous = con.execute("SELECT current_database()").fetchone()[0]
+        con.execute(f"USE {database}")
+    try:
+        con.execute("BEGIN TRANSACTION")
+        try:
+            try:
+                yield con
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            con.execute("COMMIT")
+        except Exception as e:
+            if action is None:
+                raise
+            raise RuntimeError(f"{action} failed and was rolled back: {e}") from e
+    finally:
+        if previous is not None:
+            con.execute(f"USE {previous}")
@@ -6,6 +6,17 @@ database version compatibility.
 """
 from datetime import datetime
 
+def get_current_time():
+    """
+    Get the current local time formatted for the META table.
+    
+    Returns
+    -------
+    str
+        The time as 'YYYY-MM-DD HH:MM:SS' followed by the UTC offset, if known.
+    """
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S %z')
+
 def get_meta_table(con):
     """
     Retrieve the META table from the main database.
@@ -22,7 +33,33 @@ def get_meta_table(con):
     """
     return con.sql("SELECT * from main.META").df()
 
-def get_last_launch_time(con):
+def read_meta(con):
+    """
+    Read the META table once into row dictionaries.
+    
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    
+    Returns
+    -------
+    list of dict
+        One dictionary per META row, keyed by column name. The table should
+        hold a single row.
+    """
+    result = con.execute("SELECT * FROM main.META")
+    columns = [col[0] for col in result.description]
+    return [dict(zip(columns, row)) for row in result.fetchall()]
+
+def _meta_value(con, column, meta=None):
+    # Use the row already read by read_meta, otherwise fetch just this column
+    if meta is not None:
+        return meta.get(column)
+    row = con.execute(f"SELECT {column} FROM main.META").fetchone()
+    return None if row is None else row[0]
+
+def get_last_launch_time(con, meta=None):
     """
     Get the last launch time from the META table.
     
@@ -30,16 +67,17 @@ def get_last_launch_time(con):
     ----------
     con : duckdb.DuckDBPyConnection
         An active DuckDB connection object.
+    meta : dict, optional
+        A META row from ``read_meta``, used instead of querying the table.
     
     Returns
     -------
     str or datetime
         The START_TIME value from the first row of the META table.
     """
-    df = get_meta_table(con)
-    return df["START_TIME"][0]
+    return _meta_value(con, "START_TIME", meta)
 
-def get_db_version(con):
+def get_db_version(con, meta=None):
     """
     Get the database version from the META table.
     
@@ -47,16 +85,17 @@ def get_db_version(con):
     ----------
     con : duckdb.DuckDBPyConnection
         An active DuckDB connection object.
+    meta : dict, optional
+        A META row from ``read_meta``, used instead of querying the table.
     
     Returns
     -------
     str
         The DB_VERSION value from the first row of the META table.
     """
-    df = get_meta_table(con)
-    return df["DB_VERSION"][0]
+    return _meta_value(con, "DB_VERSION", meta)
 
-def db_version_match(con, expecting_version):
+def db_version_match(con, expecting_version, meta=None):
     """
     Check if the database version matches the expected version.
     
@@ -66,14 +105,77 @@ def db_version_match(con, expecting_version):
         An active DuckDB connection object.
     expecting_version : str
         The expected database version to compare against.
+    meta : dict, optional
+        A META row from ``read_meta``, used instead of querying the table.
     
     Returns
     -------
     bool
         True if the database version matches the expected version, False otherwise.
     """
-    ver = get_db_version(con)
+    ver = get_db_version(con, meta)
     if (ver == expecting_version):
         return True
     #else
-    return False
\ No newline at end of file
+    return False
+
+# Columns written to META and META_HISTORY that are not part of def_tables.csv
+META_EXTRA_COLUMNS = ("UAINEDB_VERSION", "SCHEMA_HASH")
+
+def meta_upkeep_statements(values, meta_columns=None):
+    """
+    Build the statements that record a launch in META and META_HISTORY.
+    
+    The previous META row is copied into META_HISTORY when DB_VERSION or
+    UAINEDB_VERSION changes, the row is then updated in place, and a first
+    row is inserted if the table is empty.
+    
+    Parameters
+    ----------
+    values : dict
+        New META values keyed by column name. Must contain START_TIME,
+        DB_VERSION and UAINEDB_VERSION; SALT_CHECK is only written on the
+        first launch.
+    meta_columns : iterable of str, optional
+        Columns META is known to have, for example from ``read_meta``.
+        Extra columns already present are not altered again.
+    
+    Returns
+    -------
+    list of tuple
+        (sql, params) pairs to execute in order.
+    """
+    statements = []
+    present = set(meta_columns or ())
+    for col in META_EXTRA_COLUMNS:
+        if col in present:
+            continue
+        statements.append((f"ALTER TABLE main.META ADD COLUMN IF NOT EXISTS {col} VARCHAR", []))
+    statements.append(('''
+        CREATE TABLE IF NOT EXISTS main.META_HISTORY AS 
+        SELECT *, CURRENT_TIMESTAMP AS CREATE_DATE FROM main.META WHERE 1=0
+    ''', []))
+    for col in META_EXTRA_COLUMNS:
+        statements.append((f"ALTER TABLE main.META_HISTORY ADD COLUMN IF NOT EXISTS {col} VARCHAR", []))
+
+    statements.append(('''
+        INSERT INTO main.META_HISTORY BY NAME
+        SELECT *, CAST(? AS VARCHAR) AS CREATE_DATE FROM main.META
+        WHERE DB_VERSION IS DISTINCT FROM ? OR UAINEDB_VERSION IS DISTINCT FROM ?
+    ''', [values["START_TIME"], values["DB_VERSION"], values["UAINEDB_VERSION"]]))
+
+    update_cols = [col for col in values if col != "SALT_CHECK"]
+    set_clause = ", ".join(f"{col} = ?" for col in update_cols)
+    statements.append((
+        f"UPDATE main.META SET PREV_START_TIME = START_TIME, {set_clause}",
+        [values[col] for col in update_cols]
+    ))
+
+    insert_cols = ["ID", "PREV_START_TIME"] + list(values)
+    placeholders = ", ".join("?" for _ in insert_cols)
+    statements.append((
+        f"INSERT INTO main.META ({', '.join(insert_cols)}) SELECT {placeholders} "
+        "WHERE NOT EXISTS (SELECT 1 FROM main.META)",
+        [1, ""] + list(values.values())
+    ))
+    return statements
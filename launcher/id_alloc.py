@@ -0,0 +1,297 @@
+"""
+Block-reserved ID allocation for the tables defined in def_tables.csv.
+
+Tables get a plain ``ID INT64 PRIMARY KEY`` without a sequence. Instead of
+every writer running ``SELECT max(ID)`` inside its own insert, an allocator
+reserves a block of IDs per table in one short transaction on the driver
+database and hands them out locally, so threads sharing it never contend for
+keys. Reservations are recorded in ID_BLOCKS next to the per-table high-water
+mark in ID_ALLOCATIONS. A closed allocator hands its unused IDs back as free
+blocks, and blocks left behind by a process that stopped without closing are
+reclaimed on the next start.
+"""
+import os
+import socket
+import threading
+import itertools
+import db_utils
+
+ALLOC_TABLE = "main.ID_ALLOCATIONS"
+BLOCK_TABLE = "main.ID_BLOCKS"
+
+# Default number of IDs reserved at a time
+BLOCK_SIZE = 10_000
+
+_owner_numbers = itertools.count(1)
+
+def ensure_alloc_tables(con):
+    """
+    Create the allocation tables in the current (driver) database if missing.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    """
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ALLOC_TABLE} (
+            TABLE_KEY VARCHAR PRIMARY KEY,
+            NEXT_ID BIGINT
+        )
+    """)
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BLOCK_TABLE} (
+            TABLE_KEY VARCHAR,
+            FIRST_ID BIGINT,
+            LAST_ID BIGINT,
+            OWNER VARCHAR,
+            RESERVED_AT TIMESTAMP
+        )
+    """)
+
+def alloc_tables_exist(con):
+    """
+    Check whether the current database has the allocation tables.
+
+    Returns
+    -------
+    bool
+        True if ID_BLOCKS exists.
+    """
+    return con.execute("""
+        SELECT COUNT(*) FROM duckdb_tables()
+        WHERE database_name = current_database() AND schema_name = 'main' AND table_name = 'ID_BLOCKS'
+    """).fetchone()[0] > 0
+
+def has_reservations(con, table_key):
+    """
+    Check whether an allocator has ever reserved IDs for a table.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor on the driver database.
+    table_key : str
+        ``dbname.tablename`` as written in def_tables.csv.
+
+    Returns
+    -------
+    bool
+        True if ID_ALLOCATIONS has a high-water mark for the table, so IDs
+        above the table's largest one may already be handed out.
+    """
+    if not alloc_tables_exist(con):
+        return False
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    return con.execute(f"SELECT COUNT(*) FROM {ALLOC_TABLE} WHERE TABLE_KEY = ?",
+                       [db_utils.catalog_key(table_key, driver_alias)]).fetchone()[0] > 0
+
+def _target(table_key):
+    db_name, table_name = table_key.split(".")
+    return f'"{db_name}"."main"."{table_name}"'
+
+def reserve_block(con, table_key, size, owner, release_from=None, min_size=None):
+    """
+    Reserve a block of consecutive IDs for a table in one transaction.
+
+    A free block of at least ``min_size`` IDs that no row has taken since is
+    reused first; otherwise the table's high-water mark is moved up by
+    ``size``. A new block always starts after the largest ID already in the
+    table, so rows ingested with their own IDs are never handed out again.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor on the driver database. It must not be in a
+        transaction.
+    table_key : str
+        ``catalog.table`` of the table the IDs are for.
+    size : int
+        Number of IDs to reserve when no free block is reused.
+    owner : str
+        Name of the reserving allocator.
+    min_size : int, optional
+        Smallest free block worth reusing, by default ``size``.
+    release_from : int, optional
+        The owner's current block for the table is handed back as a free
+        block from this ID on, in the same transaction. Without it the
+        current block, if any, is dropped as used up.
+
+    Returns
+    -------
+    tuple of int
+        First and last ID of the reserved block.
+
+    Raises
+    ------
+    RuntimeError
+        If the reservation fails; it is rolled back.
+    """
+    with db_utils.transaction(con, f"Reserving IDs for {table_key}"):
+        if release_from is None:
+            con.execute(f"DELETE FROM {BLOCK_TABLE} WHERE TABLE_KEY = ? AND OWNER = ?", [table_key, owner])
+        else:
+            con.execute(f"""
+                UPDATE {BLOCK_TABLE} SET OWNER = NULL, FIRST_ID = ?
+                WHERE TABLE_KEY = ? AND OWNER = ? AND LAST_ID >= ?
+            """, [release_from, table_key, owner, release_from])
+            con.execute(f"DELETE FROM {BLOCK_TABLE} WHERE TABLE_KEY = ? AND OWNER = ?", [table_key, owner])
+
+        free = con.execute(f"""
+            SELECT FIRST_ID, LAST_ID FROM {BLOCK_TABLE}
+            WHERE TABLE_KEY = ? AND OWNER IS NULL AND LAST_ID - FIRST_ID + 1 >= ?
+              AND NOT EXISTS (SELECT 1 FROM {_target(table_key)} WHERE ID BETWEEN FIRST_ID AND LAST_ID)
+            ORDER BY FIRST_ID LIMIT 1
+        """, [table_key, min_size or size]).fetchone()
+        if free:
+            first, last = free
+            con.execute(f"""
+                UPDATE {BLOCK_TABLE} SET OWNER = ?, RESERVED_AT = current_timestamp
+                WHERE TABLE_KEY = ? AND OWNER IS NULL AND FIRST_ID = ?
+            """, [owner, table_key, first])
+        else:
+            con.execute(f"""
+                INSERT OR IGNORE INTO {ALLOC_TABLE}
+                SELECT ?, COALESCE(max(ID), 0) + 1 FROM {_target(table_key)}
+            """, [table_key])
+            # Rows ingested with their own IDs may have passed the mark since
+            first = con.execute(f"""
+                UPDATE {ALLOC_TABLE}
+                SET NEXT_ID = greatest(NEXT_ID, (SELECT COALESCE(max(ID), 0) + 1 FROM {_target(table_key)})) + ?
+                WHERE TABLE_KEY = ? RETURNING NEXT_ID
+            """, [size, table_key]).fetchone()[0] - size
+            last = first + size - 1
+            con.execute(f"INSERT INTO {BLOCK_TABLE} VALUES (?, ?, ?, ?, current_timestamp)",
+                        [table_key, first, last, owner])
+    return first, last
+
+def reclaim_blocks(con):
+    """
+    Free the blocks still held by allocators of earlier processes.
+
+    Only one process can write a database file, so at startup every
+    reserved block belongs to an allocator that is gone. IDs up to the
+    largest one actually used in each block stay taken; the rest of the
+    block becomes free for the next reservation.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection on the driver database, with the allocation tables.
+
+    Returns
+    -------
+    int
+        Number of blocks reclaimed.
+    """
+    held = con.execute(f"SELECT TABLE_KEY, FIRST_ID, LAST_ID, OWNER FROM {BLOCK_TABLE} WHERE OWNER IS NOT NULL").fetchall()
+    if not held:
+        return 0
+    updates = []
+    for table_key, first, last, owner in held:
+        used = con.execute(f"SELECT max(ID) FROM {_target(table_key)} WHERE ID BETWEEN {first} AND {last}").fetchone()[0]
+        updates.append((table_key, first, owner, first if used is None else used + 1, last))
+
+    with db_utils.transaction(con, "Reclaiming ID blocks"):
+        for table_key, first, owner, free_from, last in updates:
+            if free_from > last:
+                con.execute(f"DELETE FROM {BLOCK_TABLE} WHERE TABLE_KEY = ? AND FIRST_ID = ? AND OWNER = ?",
+                            [table_key, first, owner])
+            else:
+                con.execute(f"""
+                    UPDATE {BLOCK_TABLE} SET OWNER = NULL, FIRST_ID = ?
+                    WHERE TABLE_KEY = ? AND FIRST_ID = ? AND OWNER = ?
+                """, [free_from, table_key, first, owner])
+    return len(updates)
+
+class IdAllocator:
+    """
+    Thread-safe allocator handing out IDs from reserved blocks.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        The connection returned by ``start_db``. The allocator reserves
+        blocks on its own cursor, so reservations never join a caller's
+        transaction.
+    block_size : int, optional
+        IDs reserved per table at a time, by default 10,000.
+    """
+    def __init__(self, con, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{next(_owner_numbers)}"
+        self._cursor = con.cursor()
+        self._cursor.execute(f"USE {self.driver_alias}")
+        ensure_alloc_tables(self._cursor)
+        self._lock = threading.Lock()
+        # Next unused ID and last ID of the current block, per table
+        self._blocks = {}
+        self._closed = False
+
+    def table_key(self, table_key):
+        """Resolve a def_tables.csv ``dbname.tablename`` to ``catalog.table``."""
+        return db_utils.catalog_key(table_key, self.driver_alias)
+
+    def allocate(self, table_key, count=1):
+        """
+        Take consecutive IDs for a table.
+
+        Parameters
+        ----------
+        table_key : str
+            ``dbname.tablename`` as written in def_tables.csv, ``main`` being
+            the driver database.
+        count : int, optional
+            Number of IDs, by default 1.
+
+        Returns
+        -------
+        range
+            The IDs, which no other allocator will hand out.
+
+        Raises
+        ------
+        RuntimeError
+            If the allocator is closed or a block cannot be reserved.
+        """
+        key = self.table_key(table_key)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The ID allocator is closed")
+            next_id, last = self._blocks.get(key, (None, None))
+            if next_id is None or last - next_id + 1 < count:
+                # The rest of the current block is handed back when a request does not fit
+                release_from = next_id if next_id is not None and next_id <= last else None
+                next_id, last = reserve_block(self._cursor, key, max(self.block_size, count), self.owner,
+                                              release_from, min_size=count)
+            self._blocks[key] = (next_id + count, last)
+            return range(next_id, next_id + count)
+
+    def close(self):
+        """Hand the unused IDs of the current blocks back as free blocks."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                with db_utils.transaction(self._cursor):
+                    for key, (next_id, last) in self._blocks.items():
+                        if next_id <= last:
+                            self._cursor.execute(f"""
+                                UPDATE {BLOCK_TABLE} SET OWNER = NULL, FIRST_ID = ?
+                                WHERE TABLE_KEY = ? AND OWNER = ?
+                            """, [next_id, key, self.owner])
+                        else:
+                            self._cursor.execute(f"DELETE FROM {BLOCK_TABLE} WHERE TABLE_KEY = ? AND OWNER = ?",
+                                                 [key, self.owner])
+            except Exception as e:
+                print(f"Warning: could not release ID blocks, they are reclaimed on the next start ({e})")
+            finally:
+                self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,254 @@
+"""
+Bulk ingest into the tables defined in def_tables.csv.
+
+Data is addressed by ``dbname.tablename`` as written in def_tables.csv and
+may be a pandas DataFrame, a pyarrow Table or RecordBatchReader, or the path
+of a CSV or Parquet file (globs allowed). Frames and Arrow data are
+registered with the connection without copying, checked against the table
+definition and inserted with one ``INSERT ... SELECT`` in a single
+transaction, so DuckDB loads them in large vectorised batches. Rows without
+an ID get the next free IDs of the table, or IDs from an ``id_alloc``
+allocator when several writers load the same table. Rows for a sharded
+table are routed to their shards by ``sharding.insert_sharded`` and rows for
+a partitioned table to their periods by ``partitioning.insert_partitioned``.
+"""
+import os
+import itertools
+import schema_model
+import id_alloc
+import db_utils
+
+# Schema models already compiled, keyed by def_tables.csv path and modification time
+_model_cache = {}
+
+_source_names = itertools.count()
+
+def table_definition(table_key, def_tables_path="init_tables"):
+    """
+    Look up a table in the compiled def_tables.csv.
+
+    Parameters
+    ----------
+    table_key : str
+        ``dbname.tablename`` as written in def_tables.csv; case is ignored.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+
+    Returns
+    -------
+    schema_model.TableDef
+        The compiled table.
+
+    Raises
+    ------
+    KeyError
+        If the table is not defined.
+    """
+    path = os.path.join(def_tables_path, "def_tables.csv")
+    cache_key = (os.path.abspath(path), os.path.getmtime(path))
+    if cache_key not in _model_cache:
+        _model_cache.clear()
+        _model_cache[cache_key] = schema_model.load_schema(path)
+    tables = {key.lower(): table for key, table in _model_cache[cache_key].tables.items()}
+    if table_key.lower() not in tables:
+        raise KeyError(f"Table {table_key} is not defined in {path}")
+    return tables[table_key.lower()]
+
+def _is_path(data):
+    return isinstance(data, (str, os.PathLike))
+
+def source_relation(data):
+    """
+    Build the SQL reading a CSV or Parquet path.
+
+    Parameters
+    ----------
+    data : str or os.PathLike
+        File path or glob; ``.csv`` (optionally compressed) is read with
+        ``read_csv``, anything else with ``read_parquet``.
+
+    Returns
+    -------
+    str
+        The table function call.
+    """
+    path = os.fspath(data)
+    quoted = path.replace("'", "''")
+    if ".csv" in os.path.basename(path).lower():
+        return f"read_csv('{quoted}', header = true)"
+    return f"read_parquet('{quoted}')"
+
+def check_columns(table, source_columns):
+    """
+    Check the columns of the incoming data against a table definition.
+
+    Parameters
+    ----------
+    table : schema_model.TableDef
+        The target table.
+    source_columns : list of str
+        Column names of the incoming data.
+
+    Returns
+    -------
+    list of str
+        The table's column names for the incoming columns, in source order.
+
+    Raises
+    ------
+    ValueError
+        If a column is not in the definition or appears twice.
+    """
+    defined = {col.name.lower(): col.name for col in table.columns}
+    unknown = [name for name in source_columns if name.lower() not in defined]
+    if unknown:
+        raise ValueError(f"Columns {', '.join(unknown)} are not defined for {table.key}; "
+                         f"expected some of {', '.join(defined.values())}")
+    lowered = [name.lower() for name in source_columns]
+    duplicates = sorted({name for name in lowered if lowered.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Columns {', '.join(duplicates)} appear more than once in the data for {table.key}")
+    return [defined[name] for name in lowered]
+
+def register_source(con, data, allocator=None):
+    """
+    Make incoming data readable from SQL.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        The connection to register frames and Arrow data with.
+    data : pandas.DataFrame, pyarrow.Table, pyarrow.RecordBatchReader or str
+        The rows, or the path of a CSV or Parquet file.
+    allocator : id_alloc.IdAllocator, optional
+        The allocator the rows get IDs from, if any. A RecordBatchReader
+        without an ID column is then collected in memory first, since the
+        rows are counted before they are inserted.
+
+    Returns
+    -------
+    tuple
+        (SQL source, registered view name or None). Unregister the view
+        once done.
+    """
+    if allocator is not None and hasattr(data, "read_all") and "id" not in [n.lower() for n in data.schema.names]:
+        # A reader can only be scanned once, so its batches are kept to count the rows first
+        data = data.read_all()
+    if _is_path(data):
+        return source_relation(data), None
+    # Registered as a view over the caller's object, the data is not copied
+    view_name = f"_ingest_source_{next(_source_names)}"
+    con.register(view_name, data)
+    return view_name, view_name
+
+def insert_select(con, table, source, id_source, allocator=None):
+    """
+    Build the column and select lists inserting a source into a table.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        An active DuckDB connection object.
+    table : schema_model.TableDef
+        The target table.
+    source : str
+        SQL source from ``register_source``.
+    id_source : str
+        Table or view whose largest ID new IDs follow without an allocator.
+    allocator : id_alloc.IdAllocator, optional
+        Where IDs come from when the data has no ID column.
+
+    Returns
+    -------
+    tuple
+        (target column names, select expressions aliased to them, whether
+        the data brings its own IDs).
+
+    Raises
+    ------
+    ValueError
+        If the data has columns the table does not define.
+    """
+    source_columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    columns = check_columns(table, source_columns)
+    select = [f'"{name}" AS "{column}"' for name, column in zip(source_columns, columns)]
+    if "ID" in columns:
+        return columns, select, True
+    # The next free IDs, in the order the rows arrive
+    columns.insert(0, "ID")
+    if allocator is None:
+        select.insert(0, f"(SELECT COALESCE(max(ID), 0) FROM {id_source}) + row_number() OVER () AS ID")
+    else:
+        count = con.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+        first_id = allocator.allocate(table.key, count).start if count else 1
+        select.insert(0, f"{first_id - 1} + row_number() OVER () AS ID")
+    return columns, select, False
+
+def ingest(con, table_key, data, def_tables_path="init_tables", allocator=None):
+    """
+    Bulk insert data into a defined table.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        Connection with the table's database attached.
+    table_key : str
+        ``dbname.tablename`` as written in def_tables.csv, ``main`` being the
+        driver database.
+    data : pandas.DataFrame, pyarrow.Table, pyarrow.RecordBatchReader or str
+        The rows to insert, or the path of a CSV or Parquet file. Columns
+        are matched by name; defined columns that are missing are NULL.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+    allocator : id_alloc.IdAllocator, optional
+        Where IDs come from when the data has no ID column. By default the
+        insert numbers rows after the table's current largest ID, which is
+        only safe with a single writer; once an allocator has reserved IDs
+        for the table, a short-lived allocator is used instead so reserved
+        IDs are never reused. A RecordBatchReader is collected in memory
+        first so its rows can be counted.
+
+    Returns
+    -------
+    int
+        Number of rows inserted.
+
+    Raises
+    ------
+    KeyError
+        If the table is not defined.
+    ValueError
+        If the data has columns the table does not define.
+    RuntimeError
+        If the insert fails; nothing is inserted.
+    """
+    table = table_definition(table_key, def_tables_path)
+    if allocator is None and id_alloc.has_reservations(con, table.key):
+        # Numbering after max(ID) would reuse IDs other allocators hold in ID_BLOCKS
+        with id_alloc.IdAllocator(con, block_size=1) as reserved:
+            return ingest(con, table_key, data, def_tables_path, reserved)
+    # Imported here since the sharding and partitioning modules build on this one
+    if table.is_sharded:
+        import sharding
+        return sharding.insert_sharded(con, table, data, def_tables_path, allocator)
+    if table.is_partitioned:
+        import partitioning
+        return partitioning.insert_partitioned(con, table, data, def_tables_path, allocator)
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    dbname = db_utils.resolve_catalog(table.dbname, driver_alias)
+    target = f'"{dbname}"."main"."{table.tablename}"'
+
+    # Also attaches the table's database if it is lazy
+    con.execute(f"SELECT 1 FROM {target} LIMIT 0")
+
+    source, view_name = register_source(con, data, allocator)
+    try:
+        columns, select, _ = insert_select(con, table, source, target, allocator)
+        insert = (f"INSERT INTO {target} ({', '.join(columns)}) "
+                  f"SELECT {', '.join(select)} FROM {source}")
+        with db_utils.transaction(con, f"Ingest into {table.key}", database=dbname):
+            rows = con.execute(insert).fetchone()[0]
+    finally:
+        if view_name:
+            con.unregister(view_name)
+    return rows
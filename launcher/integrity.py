@@ -0,0 +1,378 @@
+"""
+Set-based validation of the LINKS_TO references in def_tables.csv.
+
+Every LINKS_TO entry gives a table a ``<TABLE>_ID`` column pointing at the
+linked table's ID. Tables can be created with these columns enforced as
+foreign keys, which DuckDB checks on every inserted row, or in the deferred
+mode, where the columns are plain INT64 and integrity is checked afterwards
+by running one anti-join per link over the whole table. Links across
+databases are never enforced by DuckDB and are always checked this way.
+
+``run_checks`` runs the anti-joins in parallel and records each result and
+its timing in INTEGRITY_CHECKS in the driver database. Incremental runs
+only check the rows whose ID is above the largest ID covered by earlier
+checks of the same link that found no orphans, so open violations are
+reported again until they are fixed.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple, Optional, Tuple
+import schema_model
+import conn_pool
+import db_utils
+
+# Foreign keys checked by DuckDB on insert, or only by validate_links
+FK_MODES = ("enforced", "deferred")
+
+# Orphan values shown per link in a report
+SAMPLE_SIZE = 5
+
+# Default number of links checked at once
+CHECK_WORKERS = min(8, os.cpu_count() or 1)
+
+RESULTS_TABLE = "main.INTEGRITY_CHECKS"
+
+class LinkCheck(NamedTuple):
+    """A foreign key column and the table it references, by catalog name."""
+    table: str
+    column: str
+    ref_table: str
+
+class CheckResult(NamedTuple):
+    """The outcome of checking one link, as stored in INTEGRITY_CHECKS."""
+    table: str
+    column: str
+    ref_table: str
+    after_id: Optional[int]
+    rows_checked: int
+    max_id: Optional[int]
+    orphans: int
+    sample: Tuple[int, ...]
+    seconds: float
+
+class Violation(NamedTuple):
+    """Rows of a table whose link column points at no row of the linked table."""
+    table: str
+    column: str
+    ref_table: str
+    orphans: int
+    sample: Tuple[int, ...]
+
+def check_fk_mode(fk_mode):
+    """
+    Check a foreign key mode.
+
+    Raises
+    ------
+    ValueError
+        If the mode is not one of ``FK_MODES``.
+    """
+    if fk_mode not in FK_MODES:
+        raise ValueError(f"Unknown foreign key mode {fk_mode}, expected one of {', '.join(FK_MODES)}")
+
+def _quoted(key):
+    db_name, table_name = key.split(".")
+    return f'"{db_name}"."main"."{table_name}"'
+
+def link_checks(model, driver_alias, tables=None):
+    """
+    List the link columns of a schema model.
+
+    Parameters
+    ----------
+    model : schema_model.SchemaModel
+        The compiled def_tables.csv.
+    driver_alias : str
+        Catalog name of the driver database, used for ``main`` tables.
+    tables : collection of str, optional
+        Only the links of these ``dbname.tablename`` tables, by default all.
+
+    Returns
+    -------
+    list of LinkCheck
+        One check per foreign key column, in creation order.
+    """
+    wanted = {key.lower() for key in tables} if tables is not None else None
+    checks = []
+    for key in model.creation_order:
+        table = model.tables[key]
+        if wanted is not None and key.lower() not in wanted:
+            continue
+        columns = {col.name for col in table.columns}
+        for dependency in table.dependencies:
+            # The link column also counts when def_tables.csv declares it itself
+            column = f"{dependency.split('.')[1]}_ID"
+            if column in columns:
+                checks.append(LinkCheck(db_utils.catalog_key(key, driver_alias), column,
+                                        db_utils.catalog_key(dependency, driver_alias)))
+    return checks
+
+def orphan_sql(check, sample_size=SAMPLE_SIZE, after_id=None):
+    """
+    Build the anti-join counting the orphan rows of one link.
+
+    Parameters
+    ----------
+    check : LinkCheck
+        The link to check.
+    sample_size : int, optional
+        Number of distinct orphan values returned as a sample.
+    after_id : int, optional
+        Only check rows with a larger ID, by default all rows.
+
+    Returns
+    -------
+    str
+        Query returning the rows checked, their largest ID, the orphan row
+        count and a list of sample orphan values.
+    """
+    where = f"WHERE ID > {int(after_id)}" if after_id is not None else ""
+    return f"""
+        WITH checked AS (SELECT ID, {check.column} AS link FROM {_quoted(check.table)} {where})
+        SELECT
+            (SELECT COUNT(*) FROM checked),
+            (SELECT max(ID) FROM checked),
+            COUNT(*),
+            list(DISTINCT orphan.link ORDER BY orphan.link)[1:{sample_size}]
+        FROM checked AS orphan
+        ANTI JOIN {_quoted(check.ref_table)} AS ref ON orphan.link = ref.ID
+        WHERE orphan.link IS NOT NULL
+    """
+
+def check_link(con, check, after_id=None, sample_size=SAMPLE_SIZE):
+    """
+    Run the anti-join of one link.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor with both tables' databases attached.
+    check : LinkCheck
+        The link to check.
+    after_id : int, optional
+        Only check rows with a larger ID.
+    sample_size : int, optional
+        Number of distinct orphan values kept as a sample.
+
+    Returns
+    -------
+    CheckResult
+        Rows checked, orphans found and the time taken.
+    """
+    start = time.perf_counter()
+    rows_checked, max_id, orphans, sample = con.execute(orphan_sql(check, sample_size, after_id)).fetchone()
+    return CheckResult(check.table, check.column, check.ref_table, after_id, rows_checked, max_id,
+                       orphans, tuple(sample or ()), time.perf_counter() - start)
+
+def validate_links(con, def_tables_path="init_tables", tables=None):
+    """
+    Check every link column of def_tables.csv with one anti-join each.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection with the linked databases attached.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+    tables : collection of str, optional
+        Only check the links of these ``dbname.tablename`` tables.
+
+    Returns
+    -------
+    list of Violation
+        The links with orphan rows; empty when every reference resolves.
+    """
+    model = schema_model.load_schema(os.path.join(def_tables_path, "def_tables.csv"))
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    violations = []
+    for check in link_checks(model, driver_alias, tables):
+        result = check_link(con, check)
+        if result.orphans:
+            violations.append(Violation(check.table, check.column, check.ref_table, result.orphans, result.sample))
+    return violations
+
+def ensure_results_table(con):
+    """
+    Create the INTEGRITY_CHECKS table in the current (driver) database if missing.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    """
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+            CHECKED_AT TIMESTAMP,
+            TABLE_KEY VARCHAR,
+            COLUMN_NAME VARCHAR,
+            REF_TABLE VARCHAR,
+            INCREMENTAL BOOLEAN,
+            AFTER_ID BIGINT,
+            ROWS_CHECKED BIGINT,
+            MAX_ID BIGINT,
+            ORPHANS BIGINT,
+            SAMPLE VARCHAR,
+            SECONDS DOUBLE
+        )
+    """)
+
+def last_checked_ids(con):
+    """
+    Read the largest ID each link is known to be clean up to.
+
+    Only checks without orphans move the starting point, counted from the
+    latest full check of the link, so a full check that finds orphans
+    makes the next incremental check start from the first row again, and
+    an incremental check that finds orphans is repeated from the same ID.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection on the driver database, with INTEGRITY_CHECKS.
+
+    Returns
+    -------
+    dict
+        Largest clean ID keyed by (table, column, referenced table).
+    """
+    rows = con.execute(f"""
+        WITH latest_full AS (
+            SELECT TABLE_KEY, COLUMN_NAME, REF_TABLE, max(CHECKED_AT) AS FULL_AT FROM {RESULTS_TABLE}
+            WHERE NOT INCREMENTAL
+            GROUP BY ALL
+        )
+        SELECT r.TABLE_KEY, r.COLUMN_NAME, r.REF_TABLE, max(r.MAX_ID) FROM {RESULTS_TABLE} AS r
+        LEFT JOIN latest_full AS f USING (TABLE_KEY, COLUMN_NAME, REF_TABLE)
+        WHERE r.MAX_ID IS NOT NULL AND r.ORPHANS = 0 AND (f.FULL_AT IS NULL OR r.CHECKED_AT >= f.FULL_AT)
+        GROUP BY ALL
+    """).fetchall()
+    return {(table, column, ref_table): max_id for table, column, ref_table, max_id in rows}
+
+def store_results(con, results, incremental, checked_at):
+    """
+    Append check results to INTEGRITY_CHECKS in one transaction.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection on the driver database.
+    results : list of CheckResult
+        The results to store.
+    incremental : bool
+        Whether the run was incremental.
+    checked_at : str
+        Time of the run.
+
+    Raises
+    ------
+    RuntimeError
+        If the insert fails; it is rolled back.
+    """
+    rows = []
+    for r in results:
+        # An incremental check that found no new rows still covers everything up to its starting point
+        max_id = r.max_id if r.max_id is not None else r.after_id
+        rows.append([checked_at, r.table, r.column, r.ref_table, incremental, r.after_id, r.rows_checked,
+                     max_id, r.orphans, ", ".join(str(value) for value in r.sample), r.seconds])
+    with db_utils.transaction(con, "Storing the integrity check results"):
+        con.executemany(f"INSERT INTO {RESULTS_TABLE} VALUES (CAST(? AS TIMESTAMP), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+def run_checks(con, def_tables_path="init_tables", incremental=False, workers=CHECK_WORKERS, tables=None,
+               checked_at=None):
+    """
+    Check every LINKS_TO reference in parallel and record the results.
+
+    Each worker thread runs anti-joins on its own cursor, largest checked
+    tables first, across all attached databases. The results and timings
+    are appended to INTEGRITY_CHECKS in the driver database.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection on the driver database with every linked database attached.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+    incremental : bool, optional
+        Only check rows with an ID above the largest one earlier checks of
+        the same link found clean, see ``last_checked_ids``, by default
+        False. New rows pointing at missing parents are found; parents
+        deleted since the earlier check, and rows given IDs below the
+        starting point (such as IDs from free blocks ``id_alloc`` reuses),
+        are only noticed by a full check.
+    workers : int, optional
+        Maximum number of links checked at once.
+    tables : collection of str, optional
+        Only check the links of these ``dbname.tablename`` tables.
+    checked_at : str, optional
+        Time recorded for the run, by default now.
+
+    Returns
+    -------
+    list of CheckResult
+        One result per link, in creation order.
+
+    Raises
+    ------
+    RuntimeError
+        If a check fails to run; the other checks still run but nothing is
+        recorded.
+    """
+    model = schema_model.load_schema(os.path.join(def_tables_path, "def_tables.csv"))
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    checks = link_checks(model, driver_alias, tables)
+    ensure_results_table(con)
+    previous = last_checked_ids(con) if incremental else {}
+    sizes = dict(((db + "." + table), size) for db, table, size in con.execute(
+        "SELECT database_name, table_name, estimated_size FROM duckdb_tables() WHERE schema_name = 'main'").fetchall())
+
+    start = time.perf_counter()
+    results = {}
+    failures = []
+    with conn_pool.ThreadCursors(con) as cursors:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            ordered = sorted(checks, key=lambda c: sizes.get(c.table, 0), reverse=True)
+            futures = {pool.submit(lambda c: check_link(cursors.get(), c, previous.get(c)), check): check
+                       for check in ordered}
+            for future in as_completed(futures):
+                check = futures[future]
+                try:
+                    results[check] = future.result()
+                except Exception as e:
+                    failures.append(f"{check.table}.{check.column}: {e}")
+                    print(f"Failed to check {check.table}.{check.column}: {e}")
+    if failures:
+        raise RuntimeError("Integrity check failed for " + "; ".join(failures))
+
+    ordered_results = [results[check] for check in checks]
+    checked_at = checked_at or con.execute("SELECT CAST(current_timestamp AS TIMESTAMP)").fetchone()[0].isoformat(" ")
+    store_results(con, ordered_results, incremental, checked_at)
+    print(f"Checked {len(checks)} links in {time.perf_counter() - start:.2f} s")
+    return ordered_results
+
+def violations_of(results):
+    """The results of ``run_checks`` that found orphan rows, as Violations."""
+    return [Violation(r.table, r.column, r.ref_table, r.orphans, r.sample) for r in results if r.orphans]
+
+def format_report(violations):
+    """
+    Describe link violations for printing.
+
+    Parameters
+    ----------
+    violations : list of Violation
+        Result of ``validate_links``, or of ``violations_of`` for
+        ``run_checks`` results.
+
+    Returns
+    -------
+    str
+        One line per violated link, or a line saying all links resolve.
+    """
+    if not violations:
+        return "All links resolve"
+    lines = [f"{len(violations)} links have orphan rows:"]
+    for v in violations:
+        sample = ", ".join(str(value) for value in v.sample)
+        lines.append(f"  {v.table}.{v.column} -> {v.ref_table}.ID: {v.orphans} rows, e.g. {sample}")
+    return "\n".join(lines)
@@ -0,0 +1,193 @@
+"""
+On-demand attach of databases flagged as lazy in the database list.
+
+This module provides a connection wrapper that holds back the lazy databases
+at startup and attaches each one the first time a query references its
+alias, so scripts only pay for the databases they actually touch.
+"""
+import re
+import threading
+import parse_db_list
+
+# String literals and comments are removed before looking for catalog names
+_LITERALS_AND_COMMENTS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# An identifier (optionally double quoted) directly followed by a dot
+_QUALIFIER = re.compile(r'(?<![\w."])"?([A-Za-z_][\w$]*)"?\s*\.')
+# The database a USE statement switches to
+_USE = re.compile(r'(?<![\w$."])USE\s+"?([A-Za-z_][\w$]*)"?', re.IGNORECASE)
+
+def referenced_qualifiers(query):
+    """
+    Find the names used as qualifiers (``name.something``) in a SQL string.
+
+    Parameters
+    ----------
+    query : str
+        SQL text.
+
+    Returns
+    -------
+    set
+        Lower-cased qualifier names, which include any catalog aliases.
+    """
+    stripped = _LITERALS_AND_COMMENTS.sub("''", query)
+    return {name.lower() for name in _QUALIFIER.findall(stripped)}
+
+def referenced_databases(query):
+    """
+    Find the names a SQL string may use as a database.
+
+    These are the qualifiers (``name.something``) and the target of a
+    ``USE name`` statement. Databases named only inside string literals,
+    such as ``database_name = 'a1'`` filters on catalog functions or
+    ``SET search_path``, are not found.
+
+    Parameters
+    ----------
+    query : str
+        SQL text.
+
+    Returns
+    -------
+    set
+        Lower-cased names.
+    """
+    stripped = _LITERALS_AND_COMMENTS.sub("''", query)
+    return referenced_qualifiers(query) | {name.lower() for name in _USE.findall(stripped)}
+
+class LazyConnection:
+    """
+    DuckDB connection wrapper that attaches lazy databases on first use.
+
+    Every ``execute``, ``sql``, ``query`` and ``executemany`` call is checked
+    for references to a pending alias before it runs. Other attributes are
+    passed through to the wrapped connection. DuckDB only resolves Python
+    variables in the calling frame, so frames used in queries through the
+    wrapper must be registered with ``register`` first.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        The driver connection (or a cursor of it).
+    pending : dict, optional
+        Lazy databases keyed by lower-cased alias, as (path, name, readonly).
+    """
+    def __init__(self, con, pending=None, _shared=None):
+        self._con = con
+        if _shared is None:
+            _shared = {"pending": dict(pending or {}), "lock": threading.RLock(), "hooks": []}
+        self._shared = _shared
+
+    @property
+    def pending_dbs(self):
+        """Names of the lazy databases that are not attached yet."""
+        return [name for _, name, _ in self._shared["pending"].values()]
+
+    def on_attach(self, hook):
+        """
+        Register a function called as ``hook(con, name)`` after a lazy attach.
+
+        Parameters
+        ----------
+        hook : callable
+            Called with this wrapper and the attached database name.
+        """
+        self._shared["hooks"].append(hook)
+
+    def _attach(self, key):
+        path, name, readonly = self._shared["pending"][key]
+        parse_db_list.create_filepath_dirs(path)
+        ex_string = f"ATTACH IF NOT EXISTS '{path}' AS {name}"
+        if readonly:
+            ex_string += " (READ_ONLY)"
+        self._con.execute(ex_string)
+        del self._shared["pending"][key]
+        print(f"Lazily attached {name}")
+        for hook in self._shared["hooks"]:
+            hook(self, name)
+
+    def ensure_attached(self, query):
+        """
+        Attach every pending database a query refers to.
+
+        Parameters
+        ----------
+        query : str
+            SQL text about to be run.
+        """
+        pending = self._shared["pending"]
+        if not pending or not isinstance(query, str):
+            return
+        needed = referenced_databases(query) & pending.keys()
+        if not needed:
+            return
+        with self._shared["lock"]:
+            for key in needed:
+                if key in pending:
+                    self._attach(key)
+
+    def attach_pending(self):
+        """Attach all remaining lazy databases."""
+        with self._shared["lock"]:
+            for key in list(self._shared["pending"]):
+                self._attach(key)
+
+    def execute(self, query, *args, **kwargs):
+        self.ensure_attached(query)
+        return self._con.execute(query, *args, **kwargs)
+
+    def executemany(self, query, *args, **kwargs):
+        self.ensure_attached(query)
+        return self._con.executemany(query, *args, **kwargs)
+
+    def sql(self, query, *args, **kwargs):
+        self.ensure_attached(query)
+        return self._con.sql(query, *args, **kwargs)
+
+    def query(self, query, *args, **kwargs):
+        self.ensure_attached(query)
+        return self._con.query(query, *args, **kwargs)
+
+    def cursor(self):
+        """Return a cursor that shares the pending databases with this connection."""
+        return LazyConnection(self._con.cursor(), _shared=self._shared)
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._con.close()
+
+def attach_all(con):
+    """
+    Attach every lazy database of a connection; a no-op for plain connections.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        The connection returned by ``start_db``.
+    """
+    # Duck-typed, so a copy of this module loaded under another name still
+    # recognises the wrapper start_db returns
+    attach_pending = getattr(con, "attach_pending", None)
+    if attach_pending is not None:
+        attach_pending()
+
+def pending_dbs(con):
+    """
+    List the lazy databases of a connection that are not attached yet.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        The connection returned by ``start_db``.
+
+    Returns
+    -------
+    list of str
+        Pending database names, empty for plain connections.
+    """
+    return list(getattr(con, "pending_dbs", None) or [])
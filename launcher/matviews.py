@@ -0,0 +1,356 @@
+"""
+Materialized views from the views.csv list.
+
+Rows of views.csv with a MATERIALIZE mode are stored as tables in the driver
+database instead of plain views, and refreshed by the launcher:
+
+- ``full``: rebuilt with CREATE OR REPLACE TABLE ... AS.
+- ``incremental``: append-only; rows whose WATERMARK column is above the
+  highest value already stored are inserted.
+- ``on_change``: rebuilt when a checksum of the source tables it reads
+  (row count and the sum of the row hashes) changes.
+
+A materialized view is also rebuilt when it is missing or its SQL changed,
+and the full and incremental modes are refreshed once they are older than
+MAX_AGE seconds (every refresh when MAX_AGE is empty). Refresh state and
+timings are kept in main.MATVIEW_STATE and main.MATVIEW_REFRESH_LOG, and
+main.MATVIEW_STATUS shows the age and staleness of each one.
+"""
+import os
+import re
+import time
+import hashlib
+from typing import NamedTuple, Optional
+import views
+import schema_model
+import db_utils
+
+MODES = ("full", "incremental", "on_change")
+
+STATE_TABLE = "main.MATVIEW_STATE"
+LOG_TABLE = "main.MATVIEW_REFRESH_LOG"
+STATUS_VIEW = "main.MATVIEW_STATUS"
+
+# String literals and comments are ignored when looking for source tables
+_STRINGS_AND_COMMENTS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# A table name with up to two qualifiers
+_TABLE_REF = re.compile(r'(?<![\w$."])(?:"?([A-Za-z_][\w$]*)"?\s*\.\s*)?(?:"?([A-Za-z_][\w$]*)"?\s*\.\s*)?"?([A-Za-z_][\w$]*)"?')
+
+class MatView(NamedTuple):
+    """A materialized view definition from views.csv."""
+    name: str
+    sql: str
+    mode: str
+    watermark: str
+    max_age: Optional[float]
+    sql_hash: str
+
+def read_matview_list(tbl_views_path):
+    """
+    Read the materialized view definitions from views.csv.
+
+    Parameters
+    ----------
+    tbl_views_path : str
+        Path to the pipe-separated ``views.csv`` file.
+
+    Returns
+    -------
+    list of MatView
+        Materialized views, ordered so a view reading another materialized
+        view comes after it.
+
+    Raises
+    ------
+    ValueError
+        If a mode is unknown, an incremental view has no WATERMARK or a
+        MAX_AGE is not a number.
+    """
+    matviews = []
+    for row in views.read_view_rows(tbl_views_path):
+        if not views.is_materialized(row):
+            continue
+        name, mode = row["VIEW_NAME"], row["MATERIALIZE"]
+        if mode not in MODES:
+            raise ValueError(f"Materialized view {name} has unknown MATERIALIZE mode {mode}, expected one of {', '.join(MODES)}")
+        if mode == "incremental" and not row["WATERMARK"]:
+            raise ValueError(f"Incremental materialized view {name} needs a WATERMARK column")
+        try:
+            max_age = float(row["MAX_AGE"]) if row["MAX_AGE"] else None
+        except ValueError:
+            raise ValueError(f"Materialized view {name} has a MAX_AGE that is not a number of seconds") from None
+        matviews.append(MatView(name, row["SQL"], mode, row["WATERMARK"], max_age, views.sql_hash(row["SQL"])))
+
+    by_name = {mv.name: mv for mv in matviews}
+    order = schema_model.topological_sort(views.view_dependencies({mv.name: mv.sql for mv in matviews}))
+    return [by_name[name] for name in order]
+
+def ensure_state_tables(con):
+    """
+    Create the refresh state and log tables and the status view if missing.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    """
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            VIEW_NAME VARCHAR PRIMARY KEY,
+            MODE VARCHAR,
+            SQL_HASH VARCHAR,
+            SOURCE_FINGERPRINT VARCHAR,
+            WATERMARK_VALUE VARCHAR,
+            MAX_AGE_SECONDS DOUBLE,
+            LAST_REFRESH TIMESTAMP,
+            REFRESH_SECONDS DOUBLE,
+            ROW_COUNT BIGINT
+        )
+    """)
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
+            VIEW_NAME VARCHAR,
+            MODE VARCHAR,
+            REASON VARCHAR,
+            REFRESHED_AT TIMESTAMP,
+            SECONDS DOUBLE,
+            ROWS_WRITTEN BIGINT
+        )
+    """)
+    con.execute(f"""
+        CREATE VIEW IF NOT EXISTS {STATUS_VIEW} AS
+        SELECT VIEW_NAME, MODE, LAST_REFRESH, REFRESH_SECONDS, ROW_COUNT, WATERMARK_VALUE, MAX_AGE_SECONDS,
+            epoch(current_localtimestamp() - LAST_REFRESH) AS AGE_SECONDS,
+            COALESCE(epoch(current_localtimestamp() - LAST_REFRESH) > MAX_AGE_SECONDS, FALSE) AS STALE
+        FROM {STATE_TABLE}
+    """)
+
+def read_state(con):
+    """
+    Read the refresh state of every materialized view with one query.
+
+    Returns
+    -------
+    dict
+        State rows as dictionaries keyed by lower-cased view name, with the
+        age of the last refresh in seconds under ``AGE_SECONDS``.
+    """
+    result = con.execute(f"""
+        SELECT *, epoch(current_localtimestamp() - LAST_REFRESH) AS AGE_SECONDS FROM {STATE_TABLE}
+    """)
+    columns = [col[0] for col in result.description]
+    return {row[0].lower(): dict(zip(columns, row)) for row in result.fetchall()}
+
+def source_tables(con, sql):
+    """
+    Find the catalog tables a query reads from.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    sql : str
+        The query.
+
+    Returns
+    -------
+    list of str
+        Qualified ``database.schema.table`` names, sorted. Tables reached
+        only through views are not included.
+    """
+    default_db = con.execute("SELECT current_database()").fetchone()[0]
+    catalog = {}
+    for dbname, schema, table in con.execute(
+            "SELECT database_name, schema_name, table_name FROM duckdb_tables() WHERE NOT internal").fetchall():
+        qualified = f"{dbname}.{schema}.{table}"
+        catalog[(dbname.lower(), schema.lower(), table.lower())] = qualified
+
+    found = set()
+    stripped = _STRINGS_AND_COMMENTS.sub(" ", sql)
+    for first, second, name in _TABLE_REF.findall(stripped):
+        first, second, name = first.lower(), second.lower(), name.lower()
+        if first and second:
+            candidates = [(first, second, name)]
+        elif first:
+            # db.table or schema.table
+            candidates = [(first, "main", name), (default_db.lower(), first, name)]
+        else:
+            candidates = [(default_db.lower(), "main", name)]
+        found.update(catalog[key] for key in candidates if key in catalog)
+    return sorted(found)
+
+def source_fingerprint(con, sql):
+    """
+    Checksum the source tables of a query.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    sql : str
+        The query.
+
+    Returns
+    -------
+    str
+        SHA256 over the row count and the sum of the row hashes of every
+        source table. It scans the sources but does not run the query.
+    """
+    digest = hashlib.sha256()
+    for table in source_tables(con, sql):
+        count, row_hash = con.execute(f"SELECT COUNT(*), sum(hash(t)) FROM {table} AS t").fetchone()
+        digest.update(f"{table}:{count}:{row_hash};".encode("utf-8"))
+    return digest.hexdigest()
+
+def stored_tables(con):
+    """
+    List the tables of the driver database's main schema.
+
+    Returns
+    -------
+    set
+        Lower-cased table names.
+    """
+    rows = con.execute("""
+        SELECT table_name FROM duckdb_tables()
+        WHERE database_name = current_database() AND schema_name = 'main'
+    """).fetchall()
+    return {row[0].lower() for row in rows}
+
+def refresh_reason(matview, state, existing, fingerprint=None):
+    """
+    Decide whether a materialized view needs refreshing.
+
+    Parameters
+    ----------
+    matview : MatView
+        The definition.
+    state : dict or None
+        Its row from ``read_state``.
+    existing : set
+        Lower-cased table names from ``stored_tables``.
+    fingerprint : str, optional
+        Current source checksum, needed for ``on_change`` views.
+
+    Returns
+    -------
+    str or None
+        ``missing``, ``changed``, ``scheduled`` or ``sources``, or None if
+        the stored table is up to date.
+    """
+    if state is None or matview.name.lower() not in existing:
+        return "missing"
+    if state["SQL_HASH"] != matview.sql_hash or state["MODE"] != matview.mode:
+        return "changed"
+    if matview.mode == "on_change":
+        if fingerprint != state["SOURCE_FINGERPRINT"]:
+            return "sources"
+        if matview.max_age is not None and state["AGE_SECONDS"] >= matview.max_age:
+            return "scheduled"
+        return None
+    if matview.max_age is None or state["AGE_SECONDS"] >= matview.max_age:
+        return "scheduled"
+    return None
+
+def refresh_matview(con, matview, reason, fingerprint=None):
+    """
+    Refresh one materialized view and record it, in a single transaction.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    matview : MatView
+        The definition.
+    reason : str
+        Why it is refreshed, from ``refresh_reason``.
+    fingerprint : str, optional
+        Source checksum to store for ``on_change`` views.
+
+    Returns
+    -------
+    float
+        Seconds the refresh took.
+
+    Raises
+    ------
+    RuntimeError
+        If the refresh fails; the transaction is rolled back first.
+    """
+    name, watermark = matview.name, matview.watermark
+    append = matview.mode == "incremental" and reason == "scheduled"
+    start = time.perf_counter()
+    with db_utils.transaction(con, f"Refresh of materialized view {name}"):
+        if append:
+            # Only rows past the highest watermark already stored; all rows into an empty table
+            rows = con.execute(f"""
+                INSERT INTO {name} SELECT * FROM ({matview.sql}) AS src
+                WHERE src.{watermark} > (SELECT max({watermark}) FROM {name})
+                   OR NOT EXISTS (SELECT 1 FROM {name})
+            """).fetchone()[0]
+        else:
+            con.execute(f"CREATE OR REPLACE TABLE {name} AS {matview.sql}")
+            rows = con.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        seconds = time.perf_counter() - start
+
+        watermark_value = None
+        if watermark:
+            watermark_value = con.execute(f"SELECT CAST(max({watermark}) AS VARCHAR) FROM {name}").fetchone()[0]
+        row_count = con.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0] if append else rows
+
+        con.execute(f"""
+            INSERT OR REPLACE INTO {STATE_TABLE}
+            VALUES (?, ?, ?, ?, ?, ?, current_localtimestamp(), ?, ?)
+        """, [name, matview.mode, matview.sql_hash, fingerprint, watermark_value, matview.max_age, seconds, row_count])
+        con.execute(f"""
+            INSERT INTO {LOG_TABLE} VALUES (?, ?, ?, current_localtimestamp(), ?, ?)
+        """, [name, matview.mode, reason, seconds, rows])
+    print(f"Refreshed materialized view {name} ({matview.mode}, {reason}): {rows} rows in {seconds * 1000:.1f} ms")
+    return seconds
+
+def refresh_materialized(con, def_tables_path, force=False, names=None, profiler=None):
+    """
+    Refresh the materialized views from views.csv that are due.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    def_tables_path : str
+        Path to the directory containing ``views.csv``.
+    force : bool, optional
+        Refresh every selected view whether it is due or not, by default
+        False. Incremental views still only append.
+    names : collection of str, optional
+        Only consider these materialized views, by default all of them.
+    profiler : profiler.StartupProfiler, optional
+        Receives the refresh time of each view.
+
+    Returns
+    -------
+    list of tuple
+        (view name, reason, seconds) for each refreshed view.
+    """
+    matviews = read_matview_list(os.path.join(def_tables_path, "views.csv"))
+    if names is not None:
+        wanted = {name.lower() for name in names}
+        matviews = [mv for mv in matviews if mv.name.lower() in wanted]
+    if not matviews:
+        return []
+
+    ensure_state_tables(con)
+    state = read_state(con)
+    existing = stored_tables(con)
+    refreshed = []
+    for matview in matviews:
+        fingerprint = source_fingerprint(con, matview.sql) if matview.mode == "on_change" else None
+        reason = refresh_reason(matview, state.get(matview.name.lower()), existing, fingerprint)
+        if reason is None and force:
+            reason = "forced" if matview.mode != "incremental" else "scheduled"
+        if reason is None:
+            continue
+        seconds = refresh_matview(con, matview, reason, fingerprint)
+        if profiler is not None:
+            profiler.record("matview_refresh", matview.name, seconds)
+        refreshed.append((matview.name, reason, seconds))
+    return refreshed
@@ -3,115 +3,190 @@ Database list parsing utilities for processing database configuration files.
 
 This module provides functions to parse, validate, and clean database
 list CSV files, ensuring proper database configuration and preventing
-duplicate entries.
+duplicate entries. The list is read with the standard csv module so the
+connect-and-attach path does not need pandas.
 """
-from uainepydat import dataio
-from uainepydat import dataclean
+import os
+import csv
 
-def clean_db_list(df):
+def read_db_list(csvpath):
     """
-    Clean whitespace from the database list DataFrame.
-    
+    Read the pipe-separated database list into row dictionaries.
+
+    Parameters
+    ----------
+    csvpath : str
+        Path to the CSV file containing database list.
+
+    Returns
+    -------
+    list of dict
+        One dictionary per database, keyed by column name.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist.
+    """
+    if not os.path.exists(csvpath):
+        raise FileNotFoundError(f"File {csvpath} does not exist")
+    with open(csvpath, newline="") as file:
+        return [dict(row) for row in csv.DictReader(file, delimiter="|")]
+
+def clean_db_list(rows):
+    """
+    Clean whitespace from the database list rows.
+
     Parameters
     ----------
-    df : pandas.DataFrame
-        DataFrame containing database list information.
-    
+    rows : list of dict
+        Database list rows.
+
     Returns
     -------
-    pandas.DataFrame
-        DataFrame with whitespace cleaned from all string columns.
+    list of dict
+        Rows with leading and trailing whitespace removed from every value.
     """
     print("Cleaning database list file...")
-    df_cleaned = dataclean.clean_whitespace_in_df(df)
-    if (df_cleaned.equals(df) == False):
+    cleaned = [{key: (value.strip() if isinstance(value, str) else value) for key, value in row.items()} for row in rows]
+    if cleaned != rows:
         print("Frame was cleaned to remove whitespace, please fix this in your list")
-    return df_cleaned
+    return cleaned
 
-def verify_if_any_duplicates(df):
+def verify_if_any_duplicates(rows):
     """
     Verify that there are no duplicate database names in the list.
-    
+
     Parameters
     ----------
-    df : pandas.DataFrame
-        DataFrame containing database list with a 'DB_NAME' column.
-    
+    rows : list of dict
+        Database list rows with a 'DB_NAME' column.
+
     Returns
     -------
-    pandas.Series
-        Series containing all database names.
-    
+    list of str
+        All database names.
+
     Raises
     ------
     ValueError
         If duplicate database names are found.
     """
-    all_names = df["DB_NAME"]
-    if all_names.duplicated().any():
+    all_names = [row["DB_NAME"] for row in rows]
+    if len(set(all_names)) != len(all_names):
         raise ValueError("DB_LIST has duplicated database names")
-    
+
     return all_names
 
-def verify_if_1_metadb(df):
+def verify_if_1_metadb(rows):
     """
     Verify that exactly one meta database exists and return its path.
-    
+
     Parameters
     ----------
-    df : pandas.DataFrame
-        DataFrame containing database list with 'PURPOSE' and 'PATH' columns.
-    
+    rows : list of dict
+        Database list rows with 'PURPOSE' and 'PATH' columns.
+
     Returns
     -------
     str
         Path to the single meta database.
-    
+
     Raises
     ------
     ValueError
-        If more than one meta database is found.
+        If there is not exactly one meta database.
     """
-    driver_names = df[df['PURPOSE'] == 'main']['PATH']
-    n_names = driver_names.shape[0]
-    if n_names > 1:
+    driver_names = [row['PATH'] for row in rows if row['PURPOSE'] == 'main']
+    if len(driver_names) > 1:
         raise ValueError("DB_LIST can only contain 1 meta database")
+    if not driver_names:
+        raise ValueError("DB_LIST must contain a meta database")
 
     return driver_names[0]
 
+def get_meta_db_name(rows):
+    """
+    Get the DB_NAME given to the meta database in the list.
+
+    Parameters
+    ----------
+    rows : list of dict
+        Database list rows with 'PURPOSE' and 'DB_NAME' columns.
+
+    Returns
+    -------
+    str
+        Name of the meta database as written in the list.
+    """
+    return next(row['DB_NAME'] for row in rows if row['PURPOSE'] == 'main')
+
+def set_lazy_flags(rows):
+    """
+    Normalise the optional LAZY column to booleans.
+
+    Parameters
+    ----------
+    rows : list of dict
+        Database list rows.
+
+    Returns
+    -------
+    list of dict
+        Rows with a boolean LAZY value; empty values and a missing column
+        are treated as not lazy.
+    """
+    return [dict(row, LAZY=str(row.get('LAZY') or "").strip().lower() in ("true", "1", "yes", "y")) for row in rows]
+
+def create_filepath_dirs(path):
+    """
+    Create the folders a database path from the list lives in.
+
+    Parameters
+    ----------
+    path : str
+        Database file path.
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
 def parselist(csvpath):
     """
     Parse the database list CSV file and extract database information.
-    
+
     Parameters
     ----------
     csvpath : str
         Path to the CSV file containing database list.
-    
+
     Returns
     -------
     tuple
         A tuple containing:
         - driver_name (str): Path to the main/meta database
-        - all_names (pandas.Series): All database names
-        - primary_dbs (pandas.DataFrame): DataFrame of primary databases
-        - secondary_dbs (pandas.DataFrame): DataFrame of secondary databases
-    
+        - all_names (list of str): All database names
+        - primary_dbs (list of dict): Rows of primary databases
+        - secondary_dbs (list of dict): Rows of secondary databases
+          (both carry a boolean LAZY value)
+        - meta_name (str): DB_NAME of the main/meta database
+
     Raises
     ------
     ValueError
-        If duplicate database names are found or more than one meta database exists.
+        If duplicate database names are found or there is not exactly one meta database.
     """
     print("Parsing database list file...")
-    df = clean_db_list(dataio.read_flat_psv(csvpath))
+    rows = set_lazy_flags(clean_db_list(read_db_list(csvpath)))
 
     #check for duplicated names
-    all_names = verify_if_any_duplicates(df)
+    all_names = verify_if_any_duplicates(rows)
 
     #get the driver name
-    driver_name = verify_if_1_metadb(df)
+    driver_name = verify_if_1_metadb(rows)
+    meta_name = get_meta_db_name(rows)
 
-    primary_dbs = df[df['PURPOSE'] == 'primary'] # Filter for primary databases
-    secondary_dbs = df[df['PURPOSE'] == 'secondary'] # Filter for secondary databases
+    primary_dbs = [row for row in rows if row['PURPOSE'] == 'primary'] # Filter for primary databases
+    secondary_dbs = [row for row in rows if row['PURPOSE'] == 'secondary'] # Filter for secondary databases
 
-    return driver_name, all_names, primary_dbs, secondary_dbs
+    return driver_name, all_names, primary_dbs, secondary_dbs, meta_name
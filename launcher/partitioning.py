@@ -0,0 +1,535 @@
+"""
+Time-range partitioned tables with retention and Parquet archival.
+
+A table with ``PARTITION_BY`` set to ``COLUMN:month`` or ``COLUMN:year`` in
+def_tables.csv is stored as one physical table ``<TABLENAME>_P<YYYYMM>`` or
+``<TABLENAME>_P<YYYY>`` per period of its DATE or TIMESTAMP column, in the
+table's own database. A view named after the logical table unions the
+partitions, each branch filtered to its period, so DuckDB drops the
+partitions a date predicate rules out before scanning anything. Rows are
+inserted through ``insert_partitioned`` (``ingest.ingest`` calls it for
+partitioned tables), which creates missing partitions and rebuilds the view
+in the same transaction.
+
+With a retention of N periods (``COLUMN:month:N``), ``apply_retention``
+moves partitions older than the N most recent periods to Parquet files
+under ``archive/<DBNAME>/<TABLENAME>/`` next to the database file and drops
+them from the database. The view keeps reading archived periods through
+``read_parquet`` with absolute paths, so queries see every row, from any
+working directory, while the database file only holds recent data.
+"""
+import os
+import re
+import csv
+import datetime
+import itertools
+import ingest
+import db_utils
+import schema_model
+
+# Where expired partitions are written, relative to the folder of the table's database file
+ARCHIVE_DIR = "archive"
+
+_stage_names = itertools.count()
+
+def period_label(day, grain):
+    """
+    Name the period a date falls in.
+
+    Parameters
+    ----------
+    day : datetime.date
+        Any date in the period.
+    grain : str
+        ``month`` or ``year``.
+
+    Returns
+    -------
+    str
+        ``YYYYMM`` for months, ``YYYY`` for years.
+    """
+    return f"{day.year:04d}{day.month:02d}" if grain == "month" else f"{day.year:04d}"
+
+def period_bounds(label):
+    """
+    Get the first day of a period and of the period after it.
+
+    Parameters
+    ----------
+    label : str
+        ``YYYYMM`` or ``YYYY`` from ``period_label``.
+
+    Returns
+    -------
+    tuple of datetime.date
+        (start, end); the period holds dates from start up to, but not
+        including, end.
+    """
+    year = int(label[:4])
+    if len(label) == 4:
+        return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+    month = int(label[4:])
+    return datetime.date(year, month, 1), datetime.date(year + month // 12, month % 12 + 1, 1)
+
+def retention_cutoff(grain, retention, today=None):
+    """
+    Find the first day of the oldest period a retention policy keeps.
+
+    Parameters
+    ----------
+    grain : str
+        ``month`` or ``year``.
+    retention : int
+        Number of periods kept, counting the current one.
+    today : datetime.date, optional
+        Reference date, by default today.
+
+    Returns
+    -------
+    datetime.date
+        Partitions starting before this date have expired.
+    """
+    today = today or datetime.date.today()
+    if grain == "year":
+        return datetime.date(today.year - retention + 1, 1, 1)
+    months = today.year * 12 + today.month - 1 - (retention - 1)
+    return datetime.date(months // 12, months % 12 + 1, 1)
+
+def partition_name(table, label):
+    """Physical table name of one period of a partitioned table."""
+    return f"{table.tablename}_P{label}"
+
+def archive_folder(con, table, catalog):
+    """
+    Get the folder holding the archived periods of a partitioned table.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    table : schema_model.TableDef
+        The partitioned table.
+    catalog : str
+        Catalog of the table's database.
+
+    Returns
+    -------
+    str
+        Absolute path of ``archive/<DBNAME>/<TABLENAME>`` next to the
+        database file, or under the working directory for an in-memory
+        database.
+    """
+    row = con.execute("SELECT path FROM duckdb_databases() WHERE database_name = ?", [catalog]).fetchone()
+    base = os.path.dirname(os.path.abspath(row[0])) if row and row[0] else os.getcwd()
+    return os.path.join(base, ARCHIVE_DIR, table.dbname, table.tablename)
+
+def _label_pattern(table):
+    digits = 6 if table.partition_grain == "month" else 4
+    return re.compile(re.escape(table.tablename) + r"_P(\d{" + str(digits) + r"})")
+
+def partition_period(table, name):
+    """
+    Get the period of a partition table name.
+
+    Returns
+    -------
+    str or None
+        The period label, or None if the name is not a partition of the table.
+    """
+    match = _label_pattern(table).fullmatch(name)
+    return match.group(1) if match else None
+
+def live_periods(con, table, catalog):
+    """
+    List the periods of a partitioned table that are still in its database.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    table : schema_model.TableDef
+        The partitioned table.
+    catalog : str
+        Catalog of the table's database.
+
+    Returns
+    -------
+    list of str
+        Period labels in ascending order.
+    """
+    names = con.execute("""
+        SELECT table_name FROM duckdb_tables()
+        WHERE database_name = ? AND schema_name = 'main' AND starts_with(table_name, ?)
+    """, [catalog, f"{table.tablename}_P"]).fetchall()
+    return sorted(label for label in (partition_period(table, row[0]) for row in names) if label)
+
+def archived_periods(folder, table):
+    """
+    List the periods of a partitioned table archived to Parquet.
+
+    Parameters
+    ----------
+    folder : str
+        The table's ``archive_folder``.
+    table : schema_model.TableDef
+        The partitioned table.
+
+    Returns
+    -------
+    list of str
+        Period labels in ascending order.
+    """
+    if not os.path.isdir(folder):
+        return []
+    labels = (partition_period(table, name[:-len(".parquet")]) for name in os.listdir(folder) if name.endswith(".parquet"))
+    return sorted(label for label in labels if label)
+
+def routing_view_sql(table, catalog, live, archived=(), folder=None):
+    """
+    Build the statement creating the view over every period of a table.
+
+    Each branch carries its period's date range, which lets DuckDB skip
+    the partitions and archive files a query's date filter excludes.
+
+    Parameters
+    ----------
+    table : schema_model.TableDef
+        The partitioned table.
+    catalog : str
+        Catalog of the table's database.
+    live : collection of str
+        Periods with a partition table.
+    archived : collection of str, optional
+        Periods archived to Parquet; a period that is also live is read
+        from its table.
+    folder : str, optional
+        The table's ``archive_folder``, needed with ``archived``.
+
+    Returns
+    -------
+    str or None
+        A CREATE OR REPLACE VIEW statement, or None without any period.
+    """
+    column_list = ", ".join(f'"{col.name}"' for col in table.columns)
+    branches = []
+    for label in sorted(set(live) | set(archived)):
+        if label in live:
+            source = f'"{catalog}"."main"."{partition_name(table, label)}"'
+        else:
+            path = os.path.join(folder, partition_name(table, label) + ".parquet")
+            source = "read_parquet('" + path.replace("'", "''") + "')"
+        start, end = period_bounds(label)
+        branches.append(f"SELECT {column_list} FROM {source} "
+                        f"WHERE \"{table.partition_key}\" >= DATE '{start}' AND \"{table.partition_key}\" < DATE '{end}'")
+    if not branches:
+        return None
+    return f'CREATE OR REPLACE VIEW "{catalog}"."main"."{table.tablename}" AS ' + " UNION ALL ".join(branches)
+
+def partition_ddl(table, catalog, label, with_fks=True):
+    """
+    Build the CREATE TABLE statement of one period's partition.
+
+    Parameters
+    ----------
+    table : schema_model.TableDef
+        The partitioned table.
+    catalog : str
+        Catalog of the table's database, which must be the current
+        database when foreign keys are created.
+    label : str
+        Period label.
+    with_fks : bool, optional
+        Whether to add REFERENCES constraints to foreign key columns.
+
+    Returns
+    -------
+    str
+        The CREATE TABLE IF NOT EXISTS statement.
+    """
+    return schema_model.table_ddl(table, with_fks=with_fks, name=f'"{catalog}"."main"."{partition_name(table, label)}"')
+
+def links_enforced(con, table, catalog, live):
+    """
+    Check whether the existing partitions of a table enforce its links.
+
+    New partitions follow the foreign key mode the table was created with.
+
+    Returns
+    -------
+    bool
+        True if the newest live partition has a foreign key constraint,
+        or if there is none and the table has links.
+    """
+    if not live:
+        return bool(table.foreign_keys)
+    return con.execute("""
+        SELECT COUNT(*) FROM duckdb_constraints()
+        WHERE database_name = ? AND table_name = ? AND constraint_type = 'FOREIGN KEY'
+    """, [catalog, partition_name(table, live[-1])]).fetchone()[0] > 0
+
+def ensure_partitions(con, table, catalog, labels, with_fks=None):
+    """
+    Create missing partitions of a table and rebuild its view, in one transaction.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    table : schema_model.TableDef
+        The partitioned table.
+    catalog : str
+        Catalog of the table's database.
+    labels : collection of str
+        Periods that need a partition.
+    with_fks : bool, optional
+        Foreign key mode for new partitions, by default that of the
+        existing ones.
+
+    Raises
+    ------
+    RuntimeError
+        If creating a partition fails; it is rolled back.
+    """
+    live = live_periods(con, table, catalog)
+    if with_fks is None:
+        with_fks = links_enforced(con, table, catalog, live)
+    with db_utils.transaction(con, f"Creating partitions of {table.key}", database=catalog):
+        for label in sorted(set(labels) - set(live)):
+            con.execute(partition_ddl(table, catalog, label, with_fks))
+        folder = archive_folder(con, table, catalog)
+        view = routing_view_sql(table, catalog, set(live) | set(labels), archived_periods(folder, table), folder)
+        if view:
+            con.execute(view)
+
+def insert_partitioned(con, table, data, def_tables_path="init_tables", allocator=None):
+    """
+    Bulk insert data into a partitioned table, routing each row to its period.
+
+    Every partition lives in the table's database, so missing partitions
+    are created, every period is inserted and the view is rebuilt in one
+    transaction.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        Connection with the table's database attached or lazy.
+    table : schema_model.TableDef
+        The partitioned table.
+    data : pandas.DataFrame, pyarrow.Table, pyarrow.RecordBatchReader or str
+        The rows to insert, see ``ingest.ingest``. Every row needs a value
+        in the partition column.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+    allocator : id_alloc.IdAllocator, optional
+        Where IDs come from when the data has no ID column, by default the
+        largest ID across all periods.
+
+    Returns
+    -------
+    int
+        Number of rows inserted.
+
+    Raises
+    ------
+    ValueError
+        If the data has undefined columns, rows without a partition date,
+        rows for archived periods or IDs already in the table.
+    RuntimeError
+        If the insert fails; nothing is inserted.
+    """
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    catalog = db_utils.resolve_catalog(table.dbname, driver_alias)
+    target = f'"{catalog}"."main"."{table.tablename}"'
+    # Also attaches the table's database if it is lazy
+    con.execute(f"SELECT 1 FROM {target} LIMIT 0")
+
+    source, view_name = ingest.register_source(con, data, allocator)
+    stage = f"_partition_stage_{next(_stage_names)}"
+    label_format = "%Y%m" if table.partition_grain == "month" else "%Y"
+    try:
+        columns, select, own_ids = ingest.insert_select(con, table, source, target, allocator)
+        if table.partition_key not in columns:
+            raise ValueError(f"The data for {table.key} has no {table.partition_key} column to partition on")
+
+        # One scan of the source fixes the IDs and period of every row
+        con.execute(f"CREATE TEMP TABLE {stage} AS SELECT *, strftime(\"{table.partition_key}\", '{label_format}') "
+                    f"AS _period FROM (SELECT {', '.join(select)} FROM {source})")
+        labels = [row[0] for row in con.execute(f"SELECT DISTINCT _period FROM temp.main.{stage} ORDER BY 1").fetchall()]
+        if None in labels:
+            raise ValueError(f"Rows for {table.key} need a {table.partition_key} value to be partitioned")
+        live = live_periods(con, table, catalog)
+        folder = archive_folder(con, table, catalog)
+        archived = archived_periods(folder, table)
+        closed = sorted(set(labels) & set(archived) - set(live))
+        if closed:
+            raise ValueError(f"Periods {', '.join(closed)} of {table.key} are archived and take no new rows")
+        if own_ids:
+            clash = con.execute(f"SELECT ID FROM temp.main.{stage} WHERE ID IN (SELECT ID FROM {target}) LIMIT 1").fetchone()
+            if clash:
+                raise ValueError(f"ID {clash[0]} is already used in {table.key}")
+
+        with_fks = links_enforced(con, table, catalog, live)
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        with db_utils.transaction(con, f"Ingest into partitioned {table.key}", database=catalog):
+            rows = 0
+            for label in labels:
+                if label not in live:
+                    con.execute(partition_ddl(table, catalog, label, with_fks))
+                rows += con.execute(f'INSERT INTO "{catalog}"."main"."{partition_name(table, label)}" '
+                                    f"({column_list}) SELECT {column_list} FROM temp.main.{stage} "
+                                    f"WHERE _period = ?", [label]).fetchone()[0]
+            if set(labels) - set(live):
+                con.execute(routing_view_sql(table, catalog, set(live) | set(labels), archived, folder))
+    finally:
+        con.execute(f"DROP TABLE IF EXISTS temp.main.{stage}")
+        if view_name:
+            con.unregister(view_name)
+    return rows
+
+def partitioned_tables(def_tables_path="init_tables"):
+    """
+    List the partitioned tables of def_tables.csv.
+
+    The CSV is scanned for PARTITION_BY values first, so systems without
+    partitioned tables do not compile the schema on every start.
+
+    Returns
+    -------
+    list of schema_model.TableDef
+        The partitioned tables.
+    """
+    path = os.path.join(def_tables_path, "def_tables.csv")
+    with open(path, newline="") as file:
+        keys = {f"{row['DBNAME'].strip()}.{row['TABLENAME'].strip()}" for row in csv.DictReader(file)
+                if (row.get("PARTITION_BY") or "").strip()}
+    return [ingest.table_definition(key, def_tables_path) for key in sorted(keys)]
+
+def ensure_current_partitions(con, def_tables_path="init_tables", today=None, skip_dbs=()):
+    """
+    Create the current period's partition of every partitioned table.
+
+    Runs on every start, so a new month or year gets its partition even
+    when table setup is skipped. A view that is missing, or reads archived
+    periods from another folder than the archive's current location, is
+    rebuilt as well.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        An active DuckDB connection object.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+    today : datetime.date, optional
+        Reference date for the current period, by default today.
+    skip_dbs : collection of str, optional
+        Databases left alone, such as lazy databases not attached yet.
+
+    Returns
+    -------
+    list of str
+        ``dbname.partition`` of every partition created.
+    """
+    created = []
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    for table in partitioned_tables(def_tables_path):
+        if table.dbname in skip_dbs:
+            continue
+        catalog = db_utils.resolve_catalog(table.dbname, driver_alias)
+        label = period_label(today or datetime.date.today(), table.partition_grain)
+        folder = archive_folder(con, table, catalog)
+        view = con.execute("""
+            SELECT sql FROM duckdb_views() WHERE database_name = ? AND schema_name = 'main' AND view_name = ?
+        """, [catalog, table.tablename]).fetchone()
+        moved = archived_periods(folder, table) and folder.replace("'", "''") not in (view[0] if view else "")
+        if label in live_periods(con, table, catalog) and view and not moved:
+            continue
+        if label not in live_periods(con, table, catalog):
+            print(f"Creating partition {table.dbname}.{partition_name(table, label)} of {table.key}")
+            created.append(f"{table.dbname}.{partition_name(table, label)}")
+        ensure_partitions(con, table, catalog, [label])
+    return created
+
+def archive_partition(con, table, catalog, label):
+    """
+    Move one partition to a Parquet file and read it from there.
+
+    The file is written next to its final name and renamed once its row
+    count is verified. The partition is then dropped and the view rebuilt
+    in one transaction, so readers never miss the period's rows.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    table : schema_model.TableDef
+        The partitioned table.
+    catalog : str
+        Catalog of the table's database.
+    label : str
+        Period to archive.
+
+    Returns
+    -------
+    int
+        Rows archived.
+
+    Raises
+    ------
+    RuntimeError
+        If the file does not hold every row or the swap fails; the
+        partition is then kept.
+    """
+    partition = f'"{catalog}"."main"."{partition_name(table, label)}"'
+    folder = archive_folder(con, table, catalog)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, partition_name(table, label) + ".parquet")
+    partial = path + ".partial"
+    quoted = partial.replace("'", "''")
+
+    rows = con.execute(f"SELECT COUNT(*) FROM {partition}").fetchone()[0]
+    con.execute(f"COPY (SELECT * FROM {partition} ORDER BY ID) TO '{quoted}' (FORMAT parquet)")
+    written = con.execute(f"SELECT COUNT(*) FROM read_parquet('{quoted}')").fetchone()[0]
+    if written != rows:
+        os.remove(partial)
+        raise RuntimeError(f"Archive of {partition} holds {written} of its {rows} rows, the partition is kept")
+    os.replace(partial, path)
+
+    live = [period for period in live_periods(con, table, catalog) if period != label]
+    with db_utils.transaction(con, f"Dropping archived {partition}", database=catalog):
+        con.execute(f"DROP TABLE {partition}")
+        con.execute(routing_view_sql(table, catalog, live, archived_periods(folder, table), folder))
+    return rows
+
+def apply_retention(con, def_tables_path="init_tables", today=None, skip_dbs=()):
+    """
+    Archive the expired partitions of every table with a retention policy.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        An active DuckDB connection object.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+    today : datetime.date, optional
+        Reference date for the retention, by default today.
+    skip_dbs : collection of str, optional
+        Databases left alone, such as lazy databases not attached yet.
+
+    Returns
+    -------
+    list of tuple
+        (table, period, rows) for every archived partition.
+    """
+    archived = []
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    for table in partitioned_tables(def_tables_path):
+        if table.retention is None or table.dbname in skip_dbs:
+            continue
+        catalog = db_utils.resolve_catalog(table.dbname, driver_alias)
+        cutoff = retention_cutoff(table.partition_grain, table.retention, today)
+        for label in live_periods(con, table, catalog):
+            if period_bounds(label)[0] < cutoff:
+                rows = archive_partition(con, table, catalog, label)
+                print(f"Archived {table.key} period {label}: {rows} rows to {archive_folder(con, table, catalog)}")
+                archived.append((table.key, label, rows))
+    return archived
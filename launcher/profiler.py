@@ -0,0 +1,118 @@
+"""
+Startup profiling utilities for timing the phases of start_db.
+
+This module records how long each startup phase takes, along with the
+individual databases and tables handled inside a phase, and persists the
+results to the main.STARTUP_PROFILE table keyed by launch time.
+"""
+import json
+import time
+from contextlib import contextmanager
+
+class StartupProfiler:
+    """
+    Collects (phase, item, seconds) timings for one launch.
+
+    A phase total is recorded with ``item`` set to None; databases and
+    tables timed inside a phase are recorded with their name as ``item``.
+    """
+    def __init__(self):
+        self.records = []
+
+    def record(self, phase, item, seconds):
+        """
+        Add a timing.
+
+        Parameters
+        ----------
+        phase : str
+            Startup phase name, such as ``attach``.
+        item : str or None
+            Database or table name, or None for the phase total.
+        seconds : float
+            Elapsed wall-clock seconds.
+        """
+        self.records.append((phase, item, seconds))
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a block of code as a startup phase.
+
+        Parameters
+        ----------
+        name : str
+            Startup phase name.
+        """
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.record(name, None, time.perf_counter() - start)
+
+    def phase_totals(self):
+        """
+        Get the total time of every phase, in the order they ran.
+
+        Returns
+        -------
+        dict
+            Seconds keyed by phase name.
+        """
+        return {phase: seconds for phase, item, seconds in self.records if item is None}
+
+    def summary(self):
+        """
+        Format the phase totals as a single line.
+
+        Returns
+        -------
+        str
+            Phase names and durations in milliseconds.
+        """
+        parts = [f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in self.phase_totals().items()]
+        return "Startup profile: " + ", ".join(parts)
+
+    def to_json(self, launch_time):
+        """
+        Serialise the timings as JSON.
+
+        Parameters
+        ----------
+        launch_time : str
+            Launch time the timings belong to.
+
+        Returns
+        -------
+        str
+            JSON document with the launch time, phase totals and every record.
+        """
+        return json.dumps({
+            "launch_time": launch_time,
+            "phases": self.phase_totals(),
+            "records": [{"phase": phase, "item": item, "seconds": seconds} for phase, item, seconds in self.records],
+        }, indent=2)
+
+    def persist(self, con, launch_time):
+        """
+        Append the timings to the main.STARTUP_PROFILE table.
+
+        Parameters
+        ----------
+        con : duckdb.DuckDBPyConnection
+            An active DuckDB connection object.
+        launch_time : str
+            Launch time the timings belong to.
+        """
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS main.STARTUP_PROFILE (
+                LAUNCH_TIME VARCHAR,
+                SEQ INTEGER,
+                PHASE VARCHAR,
+                ITEM VARCHAR,
+                SECONDS DOUBLE
+            )
+        """)
+        rows = [(launch_time, seq, phase, item, seconds) for seq, (phase, item, seconds) in enumerate(self.records)]
+        if rows:
+            con.executemany("INSERT INTO main.STARTUP_PROFILE VALUES (?, ?, ?, ?, ?)", rows)
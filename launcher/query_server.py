@@ -0,0 +1,284 @@
+"""
+Local query server that keeps a started database system warm.
+
+The server runs ``start_db`` once and then answers SQL sent over a Unix
+socket, so short jobs skip the bootstrap. Each client connection carries one
+request: a 4-byte big-endian length followed by a JSON object with ``sql``
+and optional ``params``. The reply is one status byte, then either an Arrow
+IPC stream with the result (status 0) or a UTF-8 error message (status 1).
+Queries run one at a time on the single connection, which keeps DuckDB's
+single writer safe.
+
+Trust model: the server runs any SQL it receives with the rights of the
+user that started it, and DuckDB SQL can read and write files (``COPY``,
+``read_csv``, ``ATTACH``). Anyone who can connect to the socket therefore
+has that user's file access. The socket is created readable and writable
+by its owner only (mode 0600), so only the same user, and root, can use
+it. Do not loosen its permissions to share the server with other users.
+
+The server needs Unix domain sockets; on platforms without them
+``QueryServer`` is not defined and ``serve`` raises. pyarrow is required on both sides and is imported when it is first needed.
+"""
+import os
+import json
+import stat
+import socket
+import struct
+import threading
+import socketserver
+
+# Default socket location, relative to the repository root
+SOCKET_PATH = os.path.join("temp", "uainedb.sock")
+# Rows per Arrow record batch written to the socket
+BATCH_ROWS = 100_000
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+def unix_sockets_supported():
+    """
+    Check whether this platform supports Unix domain sockets.
+
+    Returns
+    -------
+    bool
+        True if ``socket.AF_UNIX`` is available.
+    """
+    return hasattr(socket, "AF_UNIX")
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed before the message was complete")
+        data += chunk
+    return data
+
+def _send_request(sock, request):
+    payload = json.dumps(request).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+def _read_request(sock):
+    size = struct.unpack(">I", _recv_exact(sock, 4))[0]
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+def _arrow_reader(result, batch_rows=BATCH_ROWS):
+    # to_arrow_reader replaces fetch_record_batch in newer DuckDB releases
+    if hasattr(result, "to_arrow_reader"):
+        return result.to_arrow_reader(batch_rows)
+    return result.fetch_record_batch(batch_rows)
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        import pyarrow as pa
+
+        try:
+            request = _read_request(self.request)
+        except (ConnectionError, ValueError) as e:
+            print(f"Query server: bad request ({e})")
+            return
+
+        if request.get("op") == "shutdown":
+            self.wfile.write(bytes([STATUS_OK]))
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+
+        with self.server.lock:
+            try:
+                result = self.server.con.execute(request["sql"], request.get("params") or [])
+                reader = _arrow_reader(result)
+            except Exception as e:
+                self.wfile.write(bytes([STATUS_ERROR]) + str(e).encode("utf-8"))
+                return
+            # Once the stream has started an error can only drop the connection
+            self.wfile.write(bytes([STATUS_OK]))
+            with pa.ipc.new_stream(self.wfile, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+
+if unix_sockets_supported():
+    class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """
+        Unix socket server answering queries on one started connection.
+
+        The socket is bound with mode 0600, so only its owner can connect.
+
+        Parameters
+        ----------
+        socket_path : str
+            Where to create the socket.
+        con : duckdb.DuckDBPyConnection or LazyConnection
+            The connection returned by ``start_db``.
+        """
+        daemon_threads = True
+
+        def __init__(self, socket_path, con):
+            self.con = con
+            self.lock = threading.Lock()
+            super().__init__(socket_path, _QueryHandler)
+
+        def server_bind(self):
+            # Bind under a private umask so the socket is never open to others
+            previous = os.umask(0o077)
+            try:
+                super().server_bind()
+            finally:
+                os.umask(previous)
+            os.chmod(self.server_address, 0o600)
+
+class QueryClient:
+    """
+    Client for a running query server.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Socket of the server, by default ``temp/uainedb.sock``.
+    timeout : float, optional
+        Socket timeout in seconds, by default None (no timeout).
+    """
+    def __init__(self, socket_path=SOCKET_PATH, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def execute(self, sql, params=None):
+        """
+        Run a statement on the server.
+
+        Parameters
+        ----------
+        sql : str
+            SQL statement, with ``?`` placeholders for ``params``.
+        params : list, optional
+            JSON-serialisable parameter values.
+
+        Returns
+        -------
+        pyarrow.Table
+            The result; statements without a result return their row count.
+
+        Raises
+        ------
+        RuntimeError
+            If the statement failed on the server.
+        """
+        import pyarrow as pa
+
+        with self._connect() as sock:
+            _send_request(sock, {"sql": sql, "params": list(params or [])})
+            with sock.makefile("rb") as stream:
+                status = stream.read(1)
+                if status == bytes([STATUS_OK]):
+                    return pa.ipc.open_stream(stream).read_all()
+                message = stream.read().decode("utf-8")
+        raise RuntimeError(f"Query server error: {message}")
+
+    def sql(self, sql, params=None):
+        """Alias of ``execute``, matching the DuckDB connection API."""
+        return self.execute(sql, params)
+
+    def df(self, sql, params=None):
+        """
+        Run a statement on the server and return the result as a DataFrame.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The result.
+        """
+        return self.execute(sql, params).to_pandas()
+
+    def ping(self):
+        """
+        Check that the server answers.
+
+        Returns
+        -------
+        bool
+            True if a trivial query succeeded.
+        """
+        try:
+            self.execute("SELECT 1")
+            return True
+        except (OSError, RuntimeError):
+            return False
+
+    def shutdown(self):
+        """Ask the server to stop."""
+        with self._connect() as sock:
+            _send_request(sock, {"op": "shutdown"})
+            _recv_exact(sock, 1)
+
+def server_running(socket_path=SOCKET_PATH):
+    """
+    Check whether a query server is listening on a socket.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Socket of the server, by default ``temp/uainedb.sock``.
+
+    Returns
+    -------
+    bool
+        True if a server answered on the socket.
+    """
+    if not unix_sockets_supported() or not os.path.exists(socket_path):
+        return False
+    return QueryClient(socket_path, timeout=5).ping()
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+def serve(con, socket_path=SOCKET_PATH):
+    """
+    Serve queries on a started connection until shut down.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        The connection returned by ``start_db``. It is closed when the
+        server stops.
+    socket_path : str, optional
+        Where to create the socket, by default ``temp/uainedb.sock``.
+
+    Raises
+    ------
+    RuntimeError
+        If Unix sockets are not supported, a server already uses the socket,
+        or something other than a socket exists at ``socket_path``.
+    """
+    if not unix_sockets_supported():
+        raise RuntimeError("The query server needs Unix domain sockets, which this platform does not support")
+    if os.path.lexists(socket_path):
+        if not _is_socket(socket_path):
+            raise RuntimeError(f"{socket_path} exists and is not a socket; not removing it")
+        if server_running(socket_path):
+            raise RuntimeError(f"A query server is already running on {socket_path}")
+        os.remove(socket_path) # left behind by a server that did not stop cleanly
+
+    folder = os.path.dirname(socket_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    server = QueryServer(socket_path, con)
+    print(f"Query server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if _is_socket(socket_path):
+            os.remove(socket_path)
+        con.close()
+        print("Query server stopped")
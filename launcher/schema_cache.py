@@ -0,0 +1,180 @@
+"""
+Schema fingerprint utilities for skipping table initialisation on warm starts.
+
+This module hashes the init table lists and compares the result with the
+SCHEMA_HASH stored in the META table. When the hash matches and the catalog
+still holds every expected table and view, startup can skip DDL generation.
+"""
+import os
+import hashlib
+import views
+import schema_model
+
+# Init files that together define the schema, in hashing order
+INIT_FILES = ("db_list.csv", "def_tables.csv", "views.csv")
+
+def compute_schema_hash(def_tables_path):
+    """
+    Compute a content hash of the init table lists.
+
+    Parameters
+    ----------
+    def_tables_path : str
+        Path to the directory containing the init CSV files.
+
+    Returns
+    -------
+    str
+        SHA256 hex digest over the name and contents of every init file.
+    """
+    sha = hashlib.sha256()
+    for filename in INIT_FILES:
+        sha.update(filename.encode("utf-8"))
+        path = os.path.join(def_tables_path, filename)
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                sha.update(file.read())
+    return sha.hexdigest()
+
+def get_stored_schema_hash(con):
+    """
+    Read the SCHEMA_HASH value from the META table if there is one.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+
+    Returns
+    -------
+    str or None
+        The stored hash, or None if META or its SCHEMA_HASH column is missing.
+    """
+    has_column = con.execute("""
+        SELECT COUNT(*) FROM duckdb_columns()
+        WHERE database_name = current_database() AND schema_name = 'main'
+        AND table_name = 'META' AND column_name = 'SCHEMA_HASH'
+    """).fetchone()[0]
+    if has_column == 0:
+        return None
+
+    row = con.execute("SELECT SCHEMA_HASH FROM main.META LIMIT 1").fetchone()
+    if row is None:
+        return None
+    return row[0]
+
+def expected_objects(def_tables_path):
+    """
+    List the tables and views the init files should produce.
+
+    Parameters
+    ----------
+    def_tables_path : str
+        Path to the directory containing the init CSV files.
+
+    Returns
+    -------
+    tuple
+        A tuple containing:
+        - tables (set): (DBNAME, TABLENAME) pairs from def_tables.csv, with
+          the shards in place of each sharded table and no partitioned
+          tables
+        - views (set): view names from views.csv and the views of sharded
+          and partitioned tables; materialized views are listed as tables
+          of the driver database instead
+    """
+    model = schema_model.load_schema(os.path.join(def_tables_path, "def_tables.csv"))
+    tables = set()
+    view_names = set()
+    for table in model.tables.values():
+        if table.is_partitioned:
+            # Partitions come and go with the data, only the view over them is fixed
+            view_names.add(table.tablename)
+        elif table.is_sharded:
+            # A sharded table is a routing view over one table per shard database
+            tables.update(table.shards)
+            view_names.add(table.tablename)
+        else:
+            tables.add((table.dbname, table.tablename))
+
+    for row in views.read_view_rows(os.path.join(def_tables_path, "views.csv")):
+        if views.is_materialized(row):
+            tables.add(("main", row["VIEW_NAME"]))
+        else:
+            view_names.add(row["VIEW_NAME"])
+
+    return tables, view_names
+
+def existing_tables(con):
+    """
+    Read every table in the catalog with a single query.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+
+    Returns
+    -------
+    set
+        (database, table) pairs. Tables in the driver database are listed a
+        second time under ``main``, the name def_tables.csv uses for it.
+    """
+    default_db = con.execute("SELECT current_database()").fetchone()[0]
+    existing = set()
+    for dbname, tablename in con.execute("SELECT database_name, table_name FROM duckdb_tables()").fetchall():
+        existing.add((dbname, tablename))
+        if dbname == default_db:
+            existing.add(("main", tablename))
+    return existing
+
+def catalog_has_objects(con, tables, views):
+    """
+    Check that every expected table and view exists in the catalog.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    tables : set
+        (DBNAME, TABLENAME) pairs expected to exist.
+    views : set
+        View names expected to exist.
+
+    Returns
+    -------
+    bool
+        True if nothing is missing, False otherwise.
+    """
+    if not tables <= existing_tables(con):
+        return False
+
+    existing_views = {row[0] for row in con.execute("SELECT view_name FROM duckdb_views()").fetchall()}
+    return views <= existing_views
+
+def is_schema_current(con, def_tables_path, schema_hash, skip_dbs=()):
+    """
+    Decide whether table and view initialisation can be skipped.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    def_tables_path : str
+        Path to the directory containing the init CSV files.
+    schema_hash : str
+        Hash of the current init files from ``compute_schema_hash``.
+    skip_dbs : collection of str, optional
+        Databases whose tables are not probed, such as lazy databases that
+        are not attached yet.
+
+    Returns
+    -------
+    bool
+        True if the stored hash matches and the catalog holds every object.
+    """
+    if get_stored_schema_hash(con) != schema_hash:
+        return False
+    tables, views = expected_objects(def_tables_path)
+    tables = {(dbname, tablename) for dbname, tablename in tables if dbname not in skip_dbs}
+    return catalog_has_objects(con, tables, views)
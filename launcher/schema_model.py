@@ -0,0 +1,407 @@
+"""
+Table definition compiler for the def_tables.csv list.
+
+This module turns the table definition list into an immutable schema model
+of tables, columns, foreign keys and dependency edges in a single grouped
+pass, and generates the CREATE TABLE statements from that model. A table
+with a SHARD_BY entry is a logical table whose rows are spread over one
+physical shard table per listed database, see the sharding module. A table
+with a PARTITION_BY entry is split into one table per month or year of a date
+column, see the partitioning module.
+"""
+import csv
+from types import MappingProxyType
+from typing import NamedTuple, Optional, Tuple, Mapping
+
+class Column(NamedTuple):
+    """A table column, with the table it references if it is a foreign key."""
+    name: str
+    type: str
+    references: Optional[str] = None
+
+class ForeignKey(NamedTuple):
+    """A foreign key column created from a LINKS_TO entry."""
+    column: str
+    ref_db: str
+    ref_table: str
+
+class TableDef(NamedTuple):
+    """A compiled table definition."""
+    dbname: str
+    tablename: str
+    columns: Tuple[Column, ...]
+    foreign_keys: Tuple[ForeignKey, ...]
+    dependencies: Tuple[str, ...]
+    shard_key: Optional[str] = None
+    shard_dbs: Tuple[str, ...] = ()
+    partition_key: Optional[str] = None
+    partition_grain: Optional[str] = None
+    retention: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.dbname}.{self.tablename}"
+
+    @property
+    def is_sharded(self) -> bool:
+        return bool(self.shard_dbs)
+
+    @property
+    def is_partitioned(self) -> bool:
+        return self.partition_key is not None
+
+    @property
+    def is_routed(self) -> bool:
+        """Whether the table is a view over physical tables of other names."""
+        return self.is_sharded or self.is_partitioned
+
+    @property
+    def shards(self) -> Tuple[Tuple[str, str], ...]:
+        """(database, physical table) of every shard, in shard number order."""
+        return tuple((db, f"{self.tablename}_S{i}") for i, db in enumerate(self.shard_dbs))
+
+class SchemaModel(NamedTuple):
+    """
+    All compiled tables keyed by DBNAME.TABLENAME, with a creation order.
+
+    ``warnings`` lists the links that cannot be enforced, printed by table
+    initialisation rather than on every compile.
+    """
+    tables: Mapping[str, TableDef]
+    creation_order: Tuple[str, ...]
+    warnings: Tuple[str, ...] = ()
+
+def parse_links(links_str, dbname):
+    """
+    Split a LINKS_TO value into referenced (database, table) pairs.
+
+    Parameters
+    ----------
+    links_str : str
+        Comma-separated list of DBNAME.TABLENAME or TABLENAME entries.
+    dbname : str
+        Database of the linking table, used when no database is given.
+
+    Returns
+    -------
+    list of tuple
+        (ref_db, ref_table) for every linked table.
+    """
+    links = []
+    for linked_table in [table.strip() for table in links_str.split(',') if table.strip()]:
+        if '.' in linked_table:
+            ref_db, ref_table = linked_table.split('.')[:2]
+        else:
+            ref_db, ref_table = dbname, linked_table  # Fallback for backward compatibility
+        links.append((ref_db, ref_table))
+    return links
+
+def parse_shard_by(shard_str):
+    """
+    Split a SHARD_BY value into the shard key column and the shard databases.
+
+    Parameters
+    ----------
+    shard_str : str
+        ``COLUMN:db1,db2[,...]``.
+
+    Returns
+    -------
+    tuple
+        (column, tuple of database names).
+
+    Raises
+    ------
+    ValueError
+        If the value is not in that form or names fewer than two databases.
+    """
+    column, _, dbs = shard_str.partition(":")
+    shard_dbs = tuple(db.strip() for db in dbs.split(",") if db.strip())
+    if not column.strip() or len(shard_dbs) < 2:
+        raise ValueError(f"SHARD_BY value {shard_str} should look like COLUMN:db1,db2")
+    if len(set(shard_dbs)) != len(shard_dbs):
+        raise ValueError(f"SHARD_BY value {shard_str} lists a database twice")
+    return column.strip(), shard_dbs
+
+# Partition sizes a PARTITION_BY entry can ask for
+PARTITION_GRAINS = ("month", "year")
+
+def parse_partition_by(partition_str):
+    """
+    Split a PARTITION_BY value into the date column, grain and retention.
+
+    Parameters
+    ----------
+    partition_str : str
+        ``COLUMN:month`` or ``COLUMN:year``, optionally followed by
+        ``:N`` to keep only the N most recent periods in the database.
+
+    Returns
+    -------
+    tuple
+        (column, grain, retention or None).
+
+    Raises
+    ------
+    ValueError
+        If the value is not in that form.
+    """
+    parts = [part.strip() for part in partition_str.split(":")]
+    if len(parts) not in (2, 3) or not parts[0] or parts[1].lower() not in PARTITION_GRAINS:
+        raise ValueError(f"PARTITION_BY value {partition_str} should look like COLUMN:month or COLUMN:year[:N]")
+    retention = None
+    if len(parts) == 3:
+        if not parts[2].isdigit() or int(parts[2]) < 1:
+            raise ValueError(f"PARTITION_BY value {partition_str} should keep a positive number of periods")
+        retention = int(parts[2])
+    return parts[0], parts[1].lower(), retention
+
+def compile_table(dbname, tablename, varnames, types, links, shard_by=None, partition_by=None):
+    """
+    Compile the rows of one table into a TableDef.
+
+    Parameters
+    ----------
+    dbname : str
+        Name of the database holding the table.
+    tablename : str
+        Name of the table.
+    varnames : list of str
+        Column names in file order.
+    types : list of str
+        DuckDB column types in file order.
+    links : list
+        LINKS_TO values of the table rows; the first non-empty one is used.
+    shard_by : list, optional
+        SHARD_BY values of the table rows; the first non-empty one is used.
+    partition_by : list, optional
+        PARTITION_BY values of the table rows; the first non-empty one is
+        used.
+
+    Returns
+    -------
+    TableDef
+        The compiled table.
+    """
+    columns = [Column(name, coltype) for name, coltype in zip(varnames, types)]
+    names = set(varnames)
+
+    links_str = ""
+    for link_val in links:
+        if isinstance(link_val, str) and link_val.strip():
+            links_str = link_val.strip()
+            break
+
+    dependencies = []
+    foreign_keys = []
+    for ref_db, ref_table in parse_links(links_str, dbname):
+        dependencies.append(f"{ref_db}.{ref_table}")
+        fk_column_name = f"{ref_table}_ID"
+        # Only add the foreign key column if it is not defined already
+        if fk_column_name not in names:
+            names.add(fk_column_name)
+            if ref_db == dbname:
+                columns.append(Column(fk_column_name, "INT64", ref_table))
+            else:
+                # Cross-database references not supported, create without constraint
+                columns.append(Column(fk_column_name, "INT64"))
+            foreign_keys.append(ForeignKey(fk_column_name, ref_db, ref_table))
+
+    # Always add ID column as INT64 PRIMARY KEY if not present
+    if "ID" not in names:
+        columns.insert(0, Column("ID", "INT64 PRIMARY KEY"))
+
+    shard_key, shard_dbs = None, ()
+    for shard_val in shard_by or []:
+        if isinstance(shard_val, str) and shard_val.strip():
+            shard_key, shard_dbs = parse_shard_by(shard_val.strip())
+            if shard_key not in {col.name for col in columns}:
+                raise ValueError(f"Shard key {shard_key} is not a column of {dbname}.{tablename}")
+            break
+
+    partition_key, grain, retention = None, None, None
+    for partition_val in partition_by or []:
+        if isinstance(partition_val, str) and partition_val.strip():
+            partition_key, grain, retention = parse_partition_by(partition_val.strip())
+            key_types = {col.name: col.type.upper() for col in columns}
+            if not key_types.get(partition_key, "").startswith(("DATE", "TIMESTAMP")):
+                raise ValueError(f"Partition key {partition_key} is not a DATE or TIMESTAMP column of {dbname}.{tablename}")
+            if shard_dbs:
+                raise ValueError(f"{dbname}.{tablename} cannot be both sharded and partitioned")
+            break
+
+    return TableDef(dbname, tablename, tuple(columns), tuple(foreign_keys), tuple(dependencies),
+                    shard_key, shard_dbs, partition_key, grain, retention)
+
+def topological_sort(dependencies):
+    """
+    Order tables so that referenced tables come before the tables linking to them.
+
+    Parameters
+    ----------
+    dependencies : dict
+        Mapping of table key to the list of table keys it depends on.
+
+    Returns
+    -------
+    list of str
+        Table keys in creation order. Circular dependencies are broken at the
+        point they are detected.
+    """
+    visited = set()
+    temp_visited = set()
+    result = []
+
+    def visit(table):
+        if table in temp_visited or table in visited:
+            return
+        temp_visited.add(table)
+        for dep in dependencies.get(table, []):
+            if dep in dependencies:  # Only process if dependency is in our table list
+                visit(dep)
+        temp_visited.remove(table)
+        visited.add(table)
+        result.append(table)
+
+    for table in dependencies:
+        visit(table)
+
+    return result
+
+def compile_schema(df):
+    """
+    Compile a table definition frame into a SchemaModel in one grouped pass.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Table definitions with DBNAME, TABLENAME, VARNAME, TYPE and optionally
+        LINKS_TO, SHARD_BY and PARTITION_BY columns.
+
+    Returns
+    -------
+    SchemaModel
+        The immutable schema model.
+    """
+    return compile_columns({name: df[name].tolist() for name in df.columns})
+
+def read_table_columns(new_table_list):
+    """
+    Read a def_tables.csv file into column lists without pandas.
+
+    Parameters
+    ----------
+    new_table_list : str
+        Path to the CSV file containing table definitions.
+
+    Returns
+    -------
+    dict
+        Values in file order keyed by column name, for ``compile_columns``.
+    """
+    with open(new_table_list, newline="") as file:
+        reader = csv.DictReader(file)
+        columns = {name: [] for name in reader.fieldnames or []}
+        for row in reader:
+            for name in columns:
+                columns[name].append(row[name])
+    return columns
+
+def compile_columns(columns):
+    """
+    Compile table definition columns into a SchemaModel in one grouped pass.
+
+    Parameters
+    ----------
+    columns : dict
+        Lists of DBNAME, TABLENAME, VARNAME, TYPE and optionally LINKS_TO,
+        SHARD_BY and PARTITION_BY values, one entry per definition row.
+
+    Returns
+    -------
+    SchemaModel
+        The immutable schema model.
+    """
+    varnames = columns["VARNAME"]
+    types = columns["TYPE"]
+    empty = [None] * len(varnames)
+    links = columns.get("LINKS_TO", empty)
+    shard_by = columns.get("SHARD_BY", empty)
+    partition_by = columns.get("PARTITION_BY", empty)
+
+    # Row positions per table, in order of first appearance; rows without a name (NaN) are skipped
+    groups = {}
+    for i, key in enumerate(zip(columns["DBNAME"], columns["TABLENAME"])):
+        if all(value is not None and value == value for value in key):
+            groups.setdefault(key, []).append(i)
+    tables = {}
+    warnings = []
+    for (dbname, tablename), rows in groups.items():
+        table = compile_table(dbname, tablename, [varnames[i] for i in rows],
+                              [types[i] for i in rows], [links[i] for i in rows],
+                              [shard_by[i] for i in rows], [partition_by[i] for i in rows])
+        tables[table.key] = table
+        defined = {varnames[i] for i in rows}
+        for fk in table.foreign_keys:
+            if fk.ref_db != dbname and fk.column not in defined:
+                warnings.append(f"Cross-database foreign key not supported for {table.key}.{fk.column} -> "
+                                f"{fk.ref_db}.{fk.ref_table}")
+
+    # Sharded and partitioned tables are views, which a REFERENCES constraint cannot point at
+    routed = {key for key, table in tables.items() if table.is_routed}
+    for key, table in tables.items():
+        if any(f"{table.dbname}.{col.references}" in routed for col in table.columns if col.references):
+            warnings.append(f"Foreign keys to sharded or partitioned tables are not enforced for {key}")
+            columns = tuple(col._replace(references=None) if f"{table.dbname}.{col.references}" in routed else col
+                            for col in table.columns)
+            tables[key] = table._replace(columns=columns)
+
+    order = topological_sort({key: list(table.dependencies) for key, table in tables.items()})
+    return SchemaModel(MappingProxyType(tables), tuple(order), tuple(warnings))
+
+def load_schema(new_table_list):
+    """
+    Read and compile a table definition file.
+
+    The file is read with ``read_table_columns``, the only def_tables.csv
+    reader, so every caller compiles the same model without pandas.
+
+    Parameters
+    ----------
+    new_table_list : str
+        Path to the CSV file containing table definitions.
+
+    Returns
+    -------
+    SchemaModel
+        The immutable schema model.
+    """
+    return compile_columns(read_table_columns(new_table_list))
+
+def table_ddl(table, with_fks=True, name=None):
+    """
+    Generate the CREATE TABLE statement for a compiled table.
+
+    Parameters
+    ----------
+    table : TableDef
+        The compiled table.
+    with_fks : bool, optional
+        Whether to add REFERENCES constraints to foreign key columns,
+        by default True.
+    name : str, optional
+        Qualified name to create instead of ``DBNAME.TABLENAME``, such as
+        one shard of a sharded table.
+
+    Returns
+    -------
+    str
+        The CREATE TABLE IF NOT EXISTS statement.
+    """
+    coldefs = []
+    for col in table.columns:
+        if with_fks and col.references:
+            coldefs.append(f"{col.name} {col.type} REFERENCES {col.references}(ID)")
+        else:
+            coldefs.append(f"{col.name} {col.type}")
+    return f"CREATE TABLE IF NOT EXISTS {name or table.key}({', '.join(coldefs)})"
@@ -0,0 +1,252 @@
+"""
+Hash-sharded logical tables spread over several databases.
+
+A table with ``SHARD_BY`` set to ``COLUMN:db1,db2[,...]`` in def_tables.csv
+is stored as one physical table ``<TABLENAME>_S<i>`` per listed database,
+created without foreign key constraints. A row lives in shard
+``hash(COLUMN) % n``, where the hash is the first 32 bits of the MD5 of the
+key as text, so it is stable across DuckDB versions and reproducible
+outside the database. A routing view named after the logical table in its
+DBNAME database unions the shards, so reads and joins keep working
+unchanged. DuckDB scans every branch of that view, since it cannot rule a
+branch out from a filter on the key and the hash of the branch, so lookups
+by key should go through ``shard_sql``, which only reads the shards owning
+the keys.
+Inserts go through ``insert_sharded`` (``ingest.ingest`` calls it for
+sharded tables), which routes every row to its shard.
+
+The shard list cannot be changed once a sharded table has rows, since
+rows are not moved between shards.
+"""
+import itertools
+import ingest
+import db_utils
+
+_stage_names = itertools.count()
+
+def shard_expr(column, shard_count):
+    """
+    Build the SQL expression giving the shard number of a key column.
+
+    Parameters
+    ----------
+    column : str
+        Column name or SQL expression of the shard key.
+    shard_count : int
+        Number of shards.
+
+    Returns
+    -------
+    str
+        An expression between 0 and ``shard_count - 1``; NULL keys go to
+        shard 0.
+    """
+    return (f"COALESCE(CAST(('0x' || md5(CAST({column} AS VARCHAR))[1:8]) AS UBIGINT) % {shard_count}, 0)")
+
+def shard_tables(table, driver_alias):
+    """
+    List the qualified physical tables of a sharded table.
+
+    Parameters
+    ----------
+    table : schema_model.TableDef
+        The sharded table.
+    driver_alias : str
+        Catalog name of the driver database, used for ``main``.
+
+    Returns
+    -------
+    list of str
+        ``"db"."main"."TABLE_S<i>"`` names in shard number order.
+    """
+    return [f'"{db_utils.resolve_catalog(db, driver_alias)}"."main"."{name}"' for db, name in table.shards]
+
+def routing_view_sql(table, driver_alias):
+    """
+    Build the statement creating the routing view of a sharded table.
+
+    Parameters
+    ----------
+    table : schema_model.TableDef
+        The sharded table.
+    driver_alias : str
+        Catalog name of the driver database.
+
+    Returns
+    -------
+    str
+        A CREATE OR REPLACE VIEW statement unioning every shard.
+    """
+    union = " UNION ALL ".join(f"SELECT * FROM {name}" for name in shard_tables(table, driver_alias))
+    return f'CREATE OR REPLACE VIEW "{db_utils.resolve_catalog(table.dbname, driver_alias)}"."main"."{table.tablename}" AS {union}'
+
+def _resolve(con, table_key, def_tables_path):
+    table = ingest.table_definition(table_key, def_tables_path)
+    if not table.is_sharded:
+        raise ValueError(f"{table.key} is not a sharded table")
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    return table, driver_alias
+
+def shard_numbers(con, table, keys):
+    """
+    Compute the shards owning some keys.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object; the hash is computed in SQL so
+        keys of any type hash exactly as they do on insert.
+    table : schema_model.TableDef
+        The sharded table.
+    keys : list
+        Shard key values.
+
+    Returns
+    -------
+    list of int
+        Distinct shard numbers, in ascending order.
+    """
+    if not keys:
+        return []
+    rows = con.execute(f"SELECT DISTINCT {shard_expr('k', len(table.shard_dbs))} AS shard "
+                       f"FROM (SELECT UNNEST(?) AS k) ORDER BY shard", [list(keys)]).fetchall()
+    return [row[0] for row in rows]
+
+def shard_for(con, table_key, key, def_tables_path="init_tables"):
+    """
+    Find the physical table holding a key.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        An active DuckDB connection object.
+    table_key : str
+        ``dbname.tablename`` of the sharded table in def_tables.csv.
+    key : object
+        Shard key value.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+
+    Returns
+    -------
+    str
+        The qualified shard table.
+    """
+    table, driver_alias = _resolve(con, table_key, def_tables_path)
+    return shard_tables(table, driver_alias)[shard_numbers(con, table, [key])[0]]
+
+def shard_sql(con, table_key, keys, columns="*", def_tables_path="init_tables"):
+    """
+    Build a query for the rows with some shard keys that skips the other shards.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        An active DuckDB connection object.
+    table_key : str
+        ``dbname.tablename`` of the sharded table in def_tables.csv.
+    keys : list
+        Shard key values to select.
+    columns : str, optional
+        Select list, by default every column.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+
+    Returns
+    -------
+    tuple
+        (sql, params) to pass to ``con.execute``. Only the shards owning a
+        key are read; no keys gives a query without rows.
+    """
+    table, driver_alias = _resolve(con, table_key, def_tables_path)
+    names = shard_tables(table, driver_alias)
+    numbers = shard_numbers(con, table, keys)
+    if not numbers:
+        return f"SELECT {columns} FROM {names[0]} WHERE false", []
+    selects = [f'SELECT {columns} FROM {names[i]} WHERE "{table.shard_key}" IN (SELECT UNNEST(?))' for i in numbers]
+    return " UNION ALL ".join(selects), [list(keys)] * len(numbers)
+
+def insert_sharded(con, table, data, def_tables_path="init_tables", allocator=None):
+    """
+    Bulk insert data into a sharded table, routing each row to its shard.
+
+    The rows are staged once in a temporary table with their IDs and shard
+    numbers, then inserted into each shard in its own transaction, since a
+    DuckDB transaction only writes one database. If a shard fails, the rows
+    already committed to earlier shards are deleted again. The batch is
+    not atomic: readers can see the shards committed so far, and if the
+    process stops between shards their rows stay.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        Connection with the shard databases attached or lazy.
+    table : schema_model.TableDef
+        The sharded table.
+    data : pandas.DataFrame, pyarrow.Table, pyarrow.RecordBatchReader or str
+        The rows to insert, see ``ingest.ingest``. They must include the
+        shard key unless it is the ID column.
+    def_tables_path : str, optional
+        Path to the directory containing def_tables.csv.
+    allocator : id_alloc.IdAllocator, optional
+        Where IDs come from when the data has no ID column, by default the
+        largest ID across all shards.
+
+    Returns
+    -------
+    int
+        Number of rows inserted.
+
+    Raises
+    ------
+    ValueError
+        If the data has undefined columns, lacks the shard key, or has IDs
+        that are already used in any shard.
+    RuntimeError
+        If a shard insert fails; nothing is left inserted.
+    """
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    names = shard_tables(table, driver_alias)
+    for name in names:
+        # Also attaches the shard's database if it is lazy
+        con.execute(f"SELECT 1 FROM {name} LIMIT 0")
+    all_shards = " UNION ALL ".join(f"SELECT ID FROM {name}" for name in names)
+
+    source, view_name = ingest.register_source(con, data, allocator)
+    stage = f"temp.main._shard_stage_{next(_stage_names)}"
+
+    try:
+        columns, select, own_ids = ingest.insert_select(con, table, source, f"({all_shards})", allocator)
+        if table.shard_key not in columns:
+            raise ValueError(f"The data for {table.key} has no {table.shard_key} column to shard on")
+
+        # One scan of the source fixes the IDs and shard of every row
+        con.execute(f"CREATE TEMP TABLE {stage.split('.')[-1]} AS SELECT *, "
+                    f"{shard_expr(table.shard_key, len(names))} AS _shard FROM (SELECT {', '.join(select)} FROM {source})")
+        if own_ids:
+            clash = con.execute(f"SELECT ID FROM {stage} WHERE ID IN ({all_shards}) LIMIT 1").fetchone()
+            if clash:
+                raise ValueError(f"ID {clash[0]} is already used in a shard of {table.key}")
+
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        rows = 0
+        done = []
+        try:
+            for shard, name in enumerate(names):
+                shard_db = db_utils.resolve_catalog(table.shard_dbs[shard], driver_alias)
+                with db_utils.transaction(con, database=shard_db):
+                    rows += con.execute(f"INSERT INTO {name} ({column_list}) "
+                                        f"SELECT {column_list} FROM {stage} WHERE _shard = {shard}").fetchone()[0]
+                done.append((shard, name))
+        except Exception as e:
+            for shard, name in done:
+                con.execute(f"USE {db_utils.resolve_catalog(table.shard_dbs[shard], driver_alias)}")
+                con.execute(f"DELETE FROM {name} WHERE ID IN (SELECT ID FROM {stage} WHERE _shard = {shard})")
+            raise RuntimeError(f"Ingest into sharded {table.key} failed and was rolled back: {e}") from e
+        finally:
+            con.execute(f"USE {driver_alias}")
+    finally:
+        con.execute(f"DROP TABLE IF EXISTS {stage}")
+        if view_name:
+            con.unregister(view_name)
+    return rows
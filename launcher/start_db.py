@@ -7,22 +7,36 @@ It serves as the primary entry point for starting the database system.
 """
 print("[Uaine DB starter template]")
 import os
+import time
+import datetime
 import duckdb
 import sys
-import pandas as pd
-from uainepydat import fileio
-from uainepydat import dataio
-from uainepydat import duckfunc
-#modules
+from concurrent.futures import ThreadPoolExecutor, as_completed
+#modules - pandas and the heavier uainepydat modules are only imported by
+#the features that need them, so connect-and-attach stays fast to import
 import dbmet
 import parse_db_list
 import db_hash
+import db_utils
 import views
+import matviews
+import id_alloc
+import integrity
+import schema_cache
+import schema_model
+import sharding
+import partitioning
+import bootstrap as bootstrap_db
+import lazy_attach
+import profiler as startup_profiler
 
 DB_VER = "1.0"
 UAINEDB_VER = "1.6.1"
 print(f"DB_VER: {DB_VER}, UAINEDB_VER: {UAINEDB_VER}")
 
+# Default upper bound on concurrent database opens in parallel attach mode
+ATTACH_WORKERS = 8
+
 def attach_db(con, path, name, readonly=False):
     """
     Attach a database file to the DuckDB connection.
@@ -38,13 +52,76 @@ def attach_db(con, path, name, readonly=False):
     readonly : bool, optional
         Whether to attach the database in read-only mode, by default False.
     """
-    fileio.create_filepath_dirs(path)
+    parse_db_list.create_filepath_dirs(path)
     ex_string = f"ATTACH DATABASE '{path}' AS {name}"
     if (readonly):
         ex_string += " (READ_ONLY)"
     con.execute(ex_string)
 
-def create_and_attach_dbs(def_tables_path):
+def preopen_db(path, readonly=False):
+    """
+    Create the directories for a database file and open it once on its own.
+    
+    Opening the file replays any outstanding WAL and checkpoints it on close,
+    so the later ATTACH on the driver connection only has to read a clean file.
+    
+    Parameters
+    ----------
+    path : str
+        Path to the database file.
+    readonly : bool, optional
+        Whether the database will be attached read-only, by default False.
+    
+    Returns
+    -------
+    float
+        Seconds spent preparing the database file.
+    """
+    start = time.perf_counter()
+    parse_db_list.create_filepath_dirs(path)
+    duckdb.connect(path, read_only=readonly).close()
+    return time.perf_counter() - start
+
+def preopen_dbs(dbs, max_workers=ATTACH_WORKERS):
+    """
+    Pre-open a set of database files concurrently with a bounded worker pool.
+    
+    Parameters
+    ----------
+    dbs : list of tuple
+        (path, name, readonly) for every database to prepare.
+    max_workers : int, optional
+        Maximum number of databases opened at the same time.
+    
+    Returns
+    -------
+    dict
+        Seconds spent preparing each database, keyed by database name.
+    
+    Raises
+    ------
+    RuntimeError
+        If any database file could not be opened, listing every failure.
+    """
+    timings = {}
+    failures = {}
+    workers = max(1, min(max_workers, len(dbs)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(preopen_db, path, readonly): name for path, name, readonly in dbs}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                timings[name] = future.result()
+            except Exception as e:
+                failures[name] = e
+
+    if failures:
+        details = "; ".join(f"{name}: {err}" for name, err in failures.items())
+        raise RuntimeError(f"Failed to open {len(failures)} database(s): {details}")
+
+    return timings
+
+def create_and_attach_dbs(def_tables_path, parallel=False, max_workers=ATTACH_WORKERS, profiler=None):
     """
     Create and attach all databases defined in the database list.
     
@@ -52,41 +129,83 @@ def create_and_attach_dbs(def_tables_path):
     ----------
     def_tables_path : str
         Path to the directory containing the db_list.csv file.
+    parallel : bool, optional
+        Create directories and open the database files concurrently before
+        attaching them, by default False.
+    max_workers : int, optional
+        Size of the worker pool used when ``parallel`` is set.
+    profiler : profiler.StartupProfiler, optional
+        Receives the parse and attach phase timings and the attach time of
+        each database.
     
     Returns
     -------
-    duckdb.DuckDBPyConnection
-        DuckDB connection object with all databases attached.
+    duckdb.DuckDBPyConnection or lazy_attach.LazyConnection
+        DuckDB connection object with all databases attached, wrapped so
+        that databases flagged LAZY are attached on first reference.
+    
+    Raises
+    ------
+    RuntimeError
+        If a database could not be opened or attached, or is missing afterwards.
     """
+    profiler = profiler or startup_profiler.StartupProfiler()
+
     # Read the CSV file using pandas
     dblist = os.path.join(def_tables_path, "db_list.csv")
-    driver_name, all_names, primary_dbs, secondary_dbs = parse_db_list.parselist(dblist)
+    with profiler.phase("parse"):
+        driver_name, all_names, primary_dbs, secondary_dbs, meta_name = parse_db_list.parselist(dblist)
+
+    # Primary databases are read/write, secondary databases are read only
+    to_attach = [(row['PATH'], row['DB_NAME'], False, row['LAZY']) for row in primary_dbs]
+    to_attach += [(row['PATH'], row['DB_NAME'], True, row['LAZY']) for row in secondary_dbs]
+
+    # Lazy databases are attached on first reference instead
+    lazy_dbs = {name.lower(): (path, name, readonly) for path, name, readonly, lazy in to_attach if lazy}
+    to_attach = [(path, name, readonly) for path, name, readonly, lazy in to_attach if not lazy]
+
+    attach_start = time.perf_counter()
 
     # Connect to the driver database
-    fileio.create_filepath_dirs(driver_name)
+    parse_db_list.create_filepath_dirs(driver_name)
     con = duckdb.connect(driver_name)
 
-    # Attach primary databases
-    for i, row in primary_dbs.iterrows():
-        attach_db(con, row['PATH'], row['DB_NAME'])
+    preopen_times = {}
+    if parallel and to_attach:
+        print(f"Opening {len(to_attach)} databases with up to {max_workers} workers...")
+        preopen_times = preopen_dbs(to_attach, max_workers)
 
-    # Attach secondary databases as read only
-    for i, row in secondary_dbs.iterrows():
-        attach_db(con, row['PATH'], row['DB_NAME'], readonly=True)
+    for path, name, readonly in to_attach:
+        start = time.perf_counter()
+        try:
+            attach_db(con, path, name, readonly=readonly)
+        except Exception as e:
+            con.close()
+            raise RuntimeError(f"Failed to attach database {name} ({path}): {e}") from e
+        elapsed = time.perf_counter() - start + preopen_times.get(name, 0.0)
+        profiler.record("attach", name, elapsed)
+        print(f"Attached {name} in {elapsed * 1000:.1f} ms")
 
-    attached = duckfunc.get_attached_dbs(con)
+    attached = con.sql("SELECT database_name as DB_NAME, path as PATH, type FROM duckdb_databases")
     print("Attached the following databases")
     attached.show()
 
-    all_assigned = attached["DB_NAME"] not in all_names
-    if all_assigned:
-        print("All databases attached successfully.")
-    else:
-        print(f"Missing databases")
+    # The driver is the connection itself, so it is not attached under its list name
+    attached_names = {row[0] for row in attached.fetchall()}
+    deferred = {name for _, name, _ in lazy_dbs.values()}
+    missing = [name for name in all_names if name != meta_name and name not in attached_names and name not in deferred]
+    if missing:
+        con.close()
+        raise RuntimeError(f"Missing databases after attach: {', '.join(missing)}")
+    print("All databases attached successfully.")
+    profiler.record("attach", None, time.perf_counter() - attach_start)
 
+    if lazy_dbs:
+        print(f"Deferred lazy databases: {', '.join(sorted(deferred))}")
+        return lazy_attach.LazyConnection(con, lazy_dbs)
     return con
 
-def check_db_version(con):
+def check_db_version(con, meta=None):
     """
     Check if the database version matches the expected version and warn if not.
     
@@ -94,177 +213,169 @@ def check_db_version(con):
     ----------
     con : duckdb.DuckDBPyConnection
         An active DuckDB connection object.
+    meta : dict, optional
+        A META row from ``dbmet.read_meta``, used instead of querying the table.
     """
-    if (dbmet.db_version_match(con, DB_VER) == False):
+    version = dbmet.get_db_version(con, meta)
+    if version != DB_VER:
         print("WARNING: Database version mismatch")
-        print("Database version is: " + dbmet.get_db_version(con))
+        print("Database version is: " + str(version))
         print("Expecting version " + DB_VER)
 
-def init_tables_from_list(con, new_table_list):
+def init_sharded_table(con, info, existing, deferred=(), only_dbs=None, profiler=None):
+    """
+    Create the missing shards of a sharded table and its routing view.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    info : schema_model.TableDef
+        The sharded table.
+    existing : set
+        (database, table) pairs already in the catalog.
+    deferred : collection of str, optional
+        Lazy databases that are not attached yet.
+    only_dbs : collection of str, optional
+        Only initialise shards in these databases, by default all of them.
+    profiler : profiler.StartupProfiler, optional
+        Receives the creation time of each shard under the table_init phase.
+    """
+    profiler = profiler or startup_profiler.StartupProfiler()
+    default_db = con.execute("SELECT current_database()").fetchone()[0]
+    for (dbname, tablename), name in zip(info.shards, sharding.shard_tables(info, default_db)):
+        if (dbname, tablename) in existing or dbname in deferred:
+            continue
+        if only_dbs is not None and dbname not in only_dbs:
+            continue
+        print(f"Creating shard {dbname}.{tablename} of {info.key}")
+        start = time.perf_counter()
+        # Shards live in other databases than the tables they link to, so links are never enforced
+        con.execute(schema_model.table_ddl(info, with_fks=False, name=name))
+        profiler.record("table_init", f"{dbname}.{tablename}", time.perf_counter() - start)
+
+    # The routing view binds every shard, so it waits until all of their databases are attached
+    involved = {info.dbname, *info.shard_dbs}
+    if involved & set(deferred):
+        return
+    if only_dbs is not None and not involved & set(only_dbs):
+        return
+    con.execute(sharding.routing_view_sql(info, default_db))
+
+def init_partitioned_table(con, info, deferred=(), only_dbs=None, with_fks=True):
+    """
+    Create the partition of the current period of a partitioned table and its view.
+
+    Later partitions are created by ``partitioning.insert_partitioned`` as
+    rows for their period arrive, and by
+    ``partitioning.ensure_current_partitions`` on every start once their
+    period begins.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    info : schema_model.TableDef
+        The partitioned table.
+    deferred : collection of str, optional
+        Lazy databases that are not attached yet.
+    only_dbs : collection of str, optional
+        Only initialise tables in these databases, by default all of them.
+    with_fks : bool, optional
+        Whether the partition enforces the table's links.
+    """
+    if info.dbname in deferred or (only_dbs is not None and info.dbname not in only_dbs):
+        return
+    default_db = con.execute("SELECT current_database()").fetchone()[0]
+    catalog = db_utils.resolve_catalog(info.dbname, default_db)
+    label = partitioning.period_label(datetime.date.today(), info.partition_grain)
+    if label not in partitioning.live_periods(con, info, catalog):
+        print(f"Creating partition {info.dbname}.{partitioning.partition_name(info, label)} of {info.key}")
+    partitioning.ensure_partitions(con, info, catalog, [label], with_fks)
+
+def init_tables_from_list(con, new_table_list, only_dbs=None, profiler=None, fk_mode="enforced"):
     """
     Initialize tables in the database from a table definition list.
     
+    Tables in lazy databases that are not attached yet are left until the
+    database is first used. Sharded tables get their shards and routing
+    view from ``init_sharded_table``, partitioned tables their current
+    partition and view from ``init_partitioned_table``.
+    
     Parameters
     ----------
     con : duckdb.DuckDBPyConnection
         An active DuckDB connection object.
     new_table_list : str
         Path to the CSV file containing table definitions.
+    only_dbs : collection of str, optional
+        Only initialise tables in these databases, by default all of them.
+    profiler : profiler.StartupProfiler, optional
+        Receives the creation time of each table under the table_init phase.
+    fk_mode : str, optional
+        ``enforced`` creates LINKS_TO columns as foreign keys; ``deferred``
+        leaves them unconstrained for bulk loads, to be checked with
+        ``integrity.validate_links``. By default ``enforced``.
     """
-    df = dataio.read_flat_df(new_table_list)
+    integrity.check_fk_mode(fk_mode)
+    with_fks = fk_mode == "enforced"
+    profiler = profiler or startup_profiler.StartupProfiler()
+    model = schema_model.load_schema(new_table_list)
+    if only_dbs is None:
+        # Lazy databases attached later get their tables without repeating the warnings
+        for warning in model.warnings:
+            print(f"Warning: {warning}")
+    existing = schema_cache.existing_tables(con)
+    default_db = con.execute("SELECT current_database()").fetchone()[0]
+    deferred = set(lazy_attach.pending_dbs(con))
 
-    distinct_tables = df[["DBNAME","TABLENAME"]].drop_duplicates()
-    
-    # Collect foreign key relationships for proper table ordering
-    table_dependencies = {}
-    table_info = {}
-    
-    # First pass: collect table information and dependencies
-    for i, row in distinct_tables.iterrows():
-        DBNAME = row["DBNAME"]
-        TABLENAME = row["TABLENAME"]
-        table_key = f"{DBNAME}.{TABLENAME}"
-        table_dependencies[table_key] = []
-        
-        # filter for this result
-        new_table_frame = df[df['DBNAME'] == DBNAME].drop(columns=["DBNAME"])
-        new_table_frame = new_table_frame[new_table_frame['TABLENAME'] == TABLENAME].drop(columns=["TABLENAME"])
-
-        # Process LINKS_TO column if it exists
-        foreign_key_specs = []
-        if 'LINKS_TO' in new_table_frame.columns:
-            # Get links for this table by finding the first non-empty LINKS_TO value
-            links_series = new_table_frame['LINKS_TO'].dropna()
-            links_str = ""
-            if not links_series.empty:
-                # Find the first non-empty LINKS_TO value for this table
-                for link_val in links_series:
-                    if link_val and str(link_val).strip():
-                        links_str = str(link_val).strip()
-                        break
+    # Create tables in dependency order
+    for table_key in model.creation_order:
+        info = model.tables[table_key]
+        if info.is_sharded:
+            init_sharded_table(con, info, existing, deferred, only_dbs, profiler)
+            continue
+        if info.is_partitioned:
+            start = time.perf_counter()
+            init_partitioned_table(con, info, deferred, only_dbs, with_fks)
+            profiler.record("table_init", table_key, time.perf_counter() - start)
+            continue
+        if (info.dbname, info.tablename) in existing or info.dbname in deferred:
+            continue
+        if only_dbs is not None and info.dbname not in only_dbs:
+            continue
+        print("Creating table " + table_key)
+        start = time.perf_counter()
+        try:
+            # Set database context if creating tables with foreign keys in attached databases
+            if info.foreign_keys and info.dbname != 'main':
+                # Use the database context for foreign key references
+                con.execute(f"USE {info.dbname}")
             
-            # Add foreign key columns for linked tables
-            if links_str:
-                import pandas as pd
-                linked_tables = [table.strip() for table in links_str.split(',') if table.strip()]
-                for linked_table in linked_tables:
-                    # Extract table name from DBNAME.TABLENAME format if present
-                    if '.' in linked_table:
-                        ref_db = linked_table.split('.')[0]
-                        ref_table = linked_table.split('.')[1]
-                        ref_table_key = f"{ref_db}.{ref_table}"
-                    else:
-                        ref_db = DBNAME  # Fallback for backward compatibility
-                        ref_table = linked_table
-                        ref_table_key = f"{ref_db}.{ref_table}"
-                    
-                    table_dependencies[table_key].append(ref_table_key)
-                    
-                    fk_column_name = f"{ref_table}_ID"
-                    # Check if foreign key column already exists
-                    if not (new_table_frame["VARNAME"] == fk_column_name).any():
-                        # Use simple table name for references within same database
-                        if ref_db == DBNAME:
-                            fk_type = f"INT64 REFERENCES {ref_table}(ID)"
-                        else:
-                            # Cross-database references not supported, create without constraint
-                            fk_type = "INT64"
-                            print(f"Warning: Cross-database foreign key not supported for {DBNAME}.{TABLENAME}.{fk_column_name} -> {ref_db}.{ref_table}")
-                        
-                        fk_row = pd.DataFrame({
-                            "VARNAME": [fk_column_name],
-                            "TYPE": [fk_type],
-                            "LINKS_TO": [""]
-                        })
-                        new_table_frame = pd.concat([new_table_frame, fk_row], ignore_index=True)
-                        foreign_key_specs.append((fk_column_name, ref_db, ref_table))
+            con.execute(schema_model.table_ddl(info, with_fks=with_fks))
             
-            # Drop LINKS_TO column before creating table
-            new_table_frame = new_table_frame.drop(columns=["LINKS_TO"])
-
-        # Always add ID column as INT64 PRIMARY KEY if not present
-        if not (new_table_frame["VARNAME"] == "ID").any():
-            import pandas as pd
-            id_row = pd.DataFrame({
-                "VARNAME": ["ID"],
-                "TYPE": ["INT64 PRIMARY KEY"]
-            })
-            new_table_frame = pd.concat([id_row, new_table_frame], ignore_index=True)
-
-        table_info[table_key] = {
-            'frame': new_table_frame,
-            'dbname': DBNAME,
-            'tablename': TABLENAME,
-            'foreign_keys': foreign_key_specs
-        }
-    
-    # Topological sort to determine creation order
-    def topological_sort(dependencies):
-        visited = set()
-        temp_visited = set()
-        result = []
-        
-        def visit(table):
-            if table in temp_visited:
-                # Circular dependency detected, create without foreign keys first
-                return []
-            if table in visited:
-                return []
+            # Log foreign key relationships that were created
+            for fk_col, ref_db, ref_table in info.foreign_keys:
+                if with_fks:
+                    print(f"Created foreign key: {table_key}.{fk_col} -> {ref_db}.{ref_table}.ID")
+                else:
+                    print(f"Created unenforced link: {table_key}.{fk_col} -> {ref_db}.{ref_table}.ID")
                 
-            temp_visited.add(table)
-            deps = dependencies.get(table, [])
-            for dep in deps:
-                if dep in dependencies:  # Only process if dependency is in our table list
-                    visit(dep)
-            temp_visited.remove(table)
-            visited.add(table)
-            result.append(table)
+        except Exception as e:
+            # If foreign key creation fails, try creating without foreign keys
+            print(f"Warning: Failed to create table {table_key} with foreign keys: {e}")
+            print(f"Retrying without foreign key constraints...")
             
-        for table in dependencies:
-            if table not in visited:
-                visit(table)
-                
-        return result
-    
-    creation_order = topological_sort(table_dependencies)
-    
-    # Create tables in dependency order
-    for table_key in creation_order:
-        if table_key in table_info:
-            info = table_info[table_key]
+            # Reset database context and try again
+            con.execute(f"USE {default_db}")
+            con.execute(schema_model.table_ddl(info, with_fks=False))
+        finally:
+            # Always reset to main database context
             try:
-                # Set database context if creating tables with foreign keys in attached databases
-                if info['foreign_keys'] and info['dbname'] != 'main_db':
-                    # Use the database context for foreign key references
-                    con.execute(f"USE {info['dbname']}")
-                
-                duckfunc.init_table(con, info['frame'], info['dbname'], info['tablename'])
-                
-                # Log foreign key relationships that were created
-                for fk_col, ref_db, ref_table in info['foreign_keys']:
-                    print(f"Created foreign key: {info['dbname']}.{info['tablename']}.{fk_col} -> {ref_db}.{ref_table}.ID")
-                    
-            except Exception as e:
-                # If foreign key creation fails, try creating without foreign keys
-                print(f"Warning: Failed to create table {table_key} with foreign keys: {e}")
-                print(f"Retrying without foreign key constraints...")
-                
-                # Create a version without foreign key constraints
-                frame_no_fk = info['frame'].copy()
-                for fk_col, _, _ in info['foreign_keys']:
-                    # Change foreign key column type to just INT64
-                    mask = frame_no_fk['VARNAME'] == fk_col
-                    frame_no_fk.loc[mask, 'TYPE'] = 'INT64'
-                
-                # Reset database context and try again
-                con.execute("USE main_db")
-                duckfunc.init_table(con, frame_no_fk, info['dbname'], info['tablename'])
-            finally:
-                # Always reset to main database context
-                try:
-                    con.execute("USE main_db")
-                except:
-                    pass
+                con.execute(f"USE {default_db}")
+            except:
+                pass
+        profiler.record("table_init", table_key, time.perf_counter() - start)
 
 def salt_checking(con) -> bool:
     """
@@ -277,11 +388,11 @@ def salt_checking(con) -> bool:
         bool: True if the SALT_CHECK value matches the current hashed salt, False otherwise.
     """
     # Get the SALT_CHECK value from the META table
-    df = con.execute("SELECT SALT_CHECK FROM main.META").fetchdf()
-    if df.empty:
+    row = con.execute("SELECT SALT_CHECK FROM main.META").fetchone()
+    if row is None:
         return False  # No SALT_CHECK value found
     
-    stored_salt_check = df["SALT_CHECK"].iloc[0]
+    stored_salt_check = row[0]
     
     # Generate the current SALT_CHECK value
     current_salt_check = db_hash.generate_salt_check()
@@ -289,7 +400,76 @@ def salt_checking(con) -> bool:
     # Compare the stored and current values
     return stored_salt_check == current_salt_check
 
-def start_db(def_tables_path="init_tables"):
+def launch_meta_values(schema_hash, start_time=None):
+    """
+    Build the META values recorded for this launch.
+    
+    Parameters
+    ----------
+    schema_hash : str
+        Hash of the init files from ``schema_cache.compute_schema_hash``.
+    start_time : str, optional
+        Launch time to record, by default the current time.
+    
+    Returns
+    -------
+    dict
+        META column values keyed by column name.
+    """
+    return {
+        "START_TIME": start_time or dbmet.get_current_time(),
+        "DB_VERSION": str(DB_VER),
+        "UAINEDB_VERSION": str(UAINEDB_VER),
+        "PYTHON_VERSION": sys.version.split()[0],
+        "DUCKDB_VERSION": duckdb.__version__,
+        "SALT_CHECK": db_hash.generate_salt_check(),
+        "SCHEMA_HASH": schema_hash
+    }
+
+def update_meta_table(con, schema_hash, start_time=None):
+    """
+    Record this launch in the META table, archiving it to META_HISTORY on a version change.
+    
+    META is read once, then updated in place with parameterised statements
+    in a single transaction: the old row is copied to META_HISTORY with
+    INSERT ... SELECT when DB_VERSION or UAINEDB_VERSION changes, the row
+    is updated, and a first row is inserted into an empty table.
+    
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    schema_hash : str
+        Hash of the init files from ``schema_cache.compute_schema_hash``.
+    start_time : str, optional
+        Launch time to record, by default the current time.
+    
+    Returns
+    -------
+    dict or None
+        The META row as it was before this launch, None on the first launch.
+    
+    Raises
+    ------
+    ValueError
+        If the META table has more than one row.
+    RuntimeError
+        If the update fails; the transaction is rolled back first.
+    """
+    meta = dbmet.read_meta(con)
+    if len(meta) > 1:
+        raise ValueError("main.META is broken, too many results")
+    previous = meta[0] if meta else None
+
+    values = launch_meta_values(schema_hash, start_time)
+    statements = dbmet.meta_upkeep_statements(values, meta_columns=previous.keys() if previous else None)
+    with db_utils.transaction(con, "Updating main.META"):
+        for sql, params in statements:
+            con.execute(sql, params)
+    return previous
+
+def start_db(def_tables_path="init_tables", parallel_attach=False, use_schema_cache=True, bootstrap=False,
+             profile_json=None, fk_mode="enforced"):
     """
     Initialize and start the database system with all configurations.
     
@@ -298,6 +478,25 @@ def start_db(def_tables_path="init_tables"):
     def_tables_path : str, optional
         Path to the directory containing database and table definitions,
         by default "init_tables".
+    parallel_attach : bool, optional
+        Open the listed databases concurrently before attaching them,
+        by default False.
+    use_schema_cache : bool, optional
+        Skip table and view initialisation when the init files are unchanged
+        since the last launch and the catalog still holds every object,
+        by default True.
+    bootstrap : bool, optional
+        Run table creation, META upkeep and view setup as one compiled
+        script with a single commit per database, also written to
+        ``temp/bootstrap.sql``, by default False.
+    profile_json : str, optional
+        Also write the startup phase timings to this JSON file. They are
+        always appended to ``main.STARTUP_PROFILE``.
+    fk_mode : str, optional
+        How tables created by this start hold their LINKS_TO columns:
+        ``enforced`` foreign keys (the default) or ``deferred``, unconstrained
+        columns for bulk loads that are validated afterwards with
+        ``integrity.validate_links``. Existing tables keep their constraints.
     
     Returns
     -------
@@ -310,72 +509,111 @@ def start_db(def_tables_path="init_tables"):
     ValueError
         If the META table has invalid data or salt check fails.
     """
-    con = create_and_attach_dbs(def_tables_path)
-    #attempt to make new tables
-    init_tables_from_list(con, os.path.join(def_tables_path, "def_tables.csv"))
-
-    # Ensure META_HISTORY table exists
-    con.execute('''
-        CREATE TABLE IF NOT EXISTS main.META_HISTORY AS 
-        SELECT *, CURRENT_TIMESTAMP AS CREATE_DATE FROM main.META WHERE 1=0
-    ''')
-
-    #read out the system time and update it necessary
-    now = duckfunc.getCurrentTimeForDuck(timezone_included=True)
-    df = dbmet.get_meta_table(con)
-    n = len(df)
-    if n == 0: #empty table, set this up
-        newtime = {
-            "ID": 1,
-            "START_TIME": now, 
-            "PREV_START_TIME" : "", 
-            "DB_VERSION" : str(DB_VER),
-            "UAINEDB_VERSION": str(UAINEDB_VER),
-            "PYTHON_VERSION": sys.version.split()[0],
-            "DUCKDB_VERSION": duckdb.__version__,
-            "SALT_CHECK": db_hash.generate_salt_check()  # Generate new SALT_CHECK for empty table
-        }
-        df.loc[n] = newtime
-    elif n==1:
-        oldtime = dbmet.get_last_launch_time(con)
-        # Extract the existing SALT_CHECK value
-        existing_salt_check = df.loc[0, "SALT_CHECK"]
-        # Check for DB_VERSION or UAINEDB_VERSION change
-        old_db_version = str(df.loc[0, "DB_VERSION"]) if "DB_VERSION" in df.columns else None
-        old_uaine_version = str(df.loc[0, "UAINEDB_VERSION"]) if "UAINEDB_VERSION" in df.columns else None
-        version_changed = (str(DB_VER) != old_db_version) or (str(UAINEDB_VER) != old_uaine_version)
-        if version_changed:
-            # Insert previous row into META_HISTORY with timestamp
-            meta_hist_row = df.copy()
-            meta_hist_row["CREATE_DATE"] = now
-            # Write to META_HISTORY
-            cols = ','.join(meta_hist_row.columns)
-            for _, row in meta_hist_row.iterrows():
-                values = tuple(row)
-                placeholders = ','.join(['?']*len(values))
-                con.execute(f"INSERT INTO main.META_HISTORY ({cols}) VALUES ({placeholders})", values)
-        # Update other fields
-        df.loc[0, "START_TIME"] = now
-        df.loc[0, "PREV_START_TIME"] = oldtime
-        df.loc[0, "PYTHON_VERSION"] = sys.version.split()[0]
-        df.loc[0, "DUCKDB_VERSION"] = duckdb.__version__
-        # Preserve the existing SALT_CHECK value
-        df.loc[0, "SALT_CHECK"] = existing_salt_check
-        df.loc[0, "DB_VERSION"] = str(DB_VER)
-        df.loc[0, "UAINEDB_VERSION"] = str(UAINEDB_VER)
-    else:
-        raise ValueError("main.META is broken, too many results")
+    launch_time = dbmet.get_current_time()
+    profiler = startup_profiler.StartupProfiler()
 
-    # Write the DataFrame back to DuckDB, overwriting the existing table
-    con.execute("CREATE OR REPLACE TABLE main.META AS SELECT * FROM df")
+    con = create_and_attach_dbs(def_tables_path, parallel=parallel_attach, profiler=profiler)
+    if isinstance(con, lazy_attach.LazyConnection):
+        # Tables of a lazy database are created when it is first attached
+        def_tables = os.path.join(def_tables_path, "def_tables.csv")
+        con.on_attach(lambda lazy_con, name: init_tables_from_list(lazy_con, def_tables, only_dbs={name},
+                                                                  fk_mode=fk_mode))
+
+    with profiler.phase("schema_check"):
+        schema_hash = schema_cache.compute_schema_hash(def_tables_path)
+        # A warm start only needs the hash comparison and a catalog probe
+        schema_current = not bootstrap and use_schema_cache and schema_cache.is_schema_current(
+            con, def_tables_path, schema_hash, skip_dbs=lazy_attach.pending_dbs(con))
+        # Plain views reading materialized views are created after the refresh
+        views_path = os.path.join(def_tables_path, "views.csv")
+        view_plan = [] if schema_current else views.plan_view_sync(con, views.read_view_list(views_path))
+        matview_readers = views.materialized_readers(views_path)
+
+    if bootstrap:
+        # Tables, META_HISTORY, META and views in one transaction per database
+        with profiler.phase("bootstrap"):
+            bootstrap_db.run_bootstrap(con, def_tables_path, launch_meta_values(schema_hash, launch_time), profiler=profiler,
+                                       fk_mode=fk_mode)
+            if con.execute("SELECT COUNT(*) FROM main.META").fetchone()[0] > 1:
+                raise ValueError("main.META is broken, too many results")
+        setup_views = False
+    else:
+        if schema_current:
+            print("Init tables unchanged since last launch, skipping table and view setup")
+        else:
+            #attempt to make new tables
+            with profiler.phase("table_init"):
+                init_tables_from_list(con, os.path.join(def_tables_path, "def_tables.csv"), profiler=profiler,
+                                      fk_mode=fk_mode)
+        with profiler.phase("meta_update"):
+            update_meta_table(con, schema_hash, launch_time)
+        setup_views = not schema_current
 
     #check db_versions
-    check_db_version(con)
+    with profiler.phase("version_check"):
+        check_db_version(con)
 
     # Check the SALT_CHECK value
-    if not salt_checking(con):
-        raise ValueError("SALT_CHECK value mismatch. Potential integrity issue detected.")
+    with profiler.phase("salt_check"):
+        if not salt_checking(con):
+            raise ValueError("SALT_CHECK value mismatch. Potential integrity issue detected.")
+
+    # ID blocks still held by an earlier process are handed back
+    with profiler.phase("id_reclaim"):
+        if id_alloc.alloc_tables_exist(con):
+            id_alloc.reclaim_blocks(con)
+
+    # A new month or year needs its partition even when table setup was skipped
+    with profiler.phase("partition_rollover"):
+        partitioning.ensure_current_partitions(con, def_tables_path, skip_dbs=lazy_attach.pending_dbs(con))
+
+    # Partitions past their table's retention move to Parquet
+    with profiler.phase("partition_retention"):
+        partitioning.apply_retention(con, def_tables_path, skip_dbs=lazy_attach.pending_dbs(con))
+
+    if setup_views:
+        with profiler.phase("view_setup"):
+            views.setupviews(con, def_tables_path, plan=[step for step in view_plan if step[0] not in matview_readers])
 
-    views.setupviews(con, def_tables_path)
+    # Materialized views are refreshed when due on every launch, between the views they read and the views reading them
+    with profiler.phase("matview_refresh"):
+        matviews.refresh_materialized(con, def_tables_path, profiler=profiler)
+
+    reader_plan = [step for step in view_plan if step[0] in matview_readers]
+    if reader_plan:
+        with profiler.phase("matview_reader_setup"):
+            views.setupviews(con, def_tables_path, plan=reader_plan)
+
+    print(profiler.summary())
+    profiler.persist(con, launch_time)
+    if profile_json:
+        parse_db_list.create_filepath_dirs(profile_json)
+        with open(profile_json, "w") as file:
+            file.write(profiler.to_json(launch_time))
 
     return con
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Start the database system.")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the connection open and serve queries on a Unix socket")
+    parser.add_argument("--socket",
+                        help="socket path for --serve, by default temp/uainedb.sock")
+    parser.add_argument("--parallel-attach", action="store_true", help="open the databases concurrently")
+    parser.add_argument("--bootstrap", action="store_true", help="run the compiled bootstrap script")
+    parser.add_argument("--fk-mode", choices=integrity.FK_MODES, default="enforced",
+                        help="create LINKS_TO columns as enforced foreign keys or unconstrained (deferred)")
+    args = parser.parse_args()
+
+    if args.serve:
+        import query_server
+        if not query_server.unix_sockets_supported():
+            parser.error("--serve needs Unix domain sockets, which this platform does not support")
+
+    con = start_db(parallel_attach=args.parallel_attach, bootstrap=args.bootstrap, fk_mode=args.fk_mode)
+    if args.serve:
+        query_server.serve(con, args.socket or query_server.SOCKET_PATH)
+    else:
+        con.close()
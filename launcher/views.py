@@ -1,6 +1,26 @@
+"""
+View setup from the views.csv list.
+
+Views are synchronised incrementally: the normalised SQL of every listed
+view is hashed and the hash is kept in the view's comment, so a launch only
+creates or replaces views that are missing or whose SQL changed, plus the
+views that depend on them, in dependency order and in one transaction.
+"""
 import os
-import pandas as pd
-from uainepydat import dataio
+import re
+import csv
+import hashlib
+import schema_model
+import db_utils
+
+# Prefix of the view comment holding the hash of its views.csv SQL
+VIEW_HASH_PREFIX = "views.csv sha256:"
+
+# String literals and quoted identifiers keep their whitespace when normalising; comments are dropped
+_LITERALS_AND_COMMENTS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# String literals and comments are ignored when looking for referenced views
+_STRINGS_AND_COMMENTS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_IDENTIFIER = re.compile(r'(?<![\w$])"?([A-Za-z_][\w$]*)"?')
 
 def get_db_views(con):
     """
@@ -24,7 +44,7 @@ def get_db_views(con):
     return df
 
 
-def read_db_csv(tbl_views_path: str) -> pd.DataFrame:
+def read_db_csv(tbl_views_path: str):
     """
     Load view definitions from a pipe-separated values (PSV) file.
 
@@ -39,18 +59,266 @@ def read_db_csv(tbl_views_path: str) -> pd.DataFrame:
     pandas.DataFrame
         DataFrame containing view metadata read from the CSV file.
     """
+    from uainepydat import dataio
     df = dataio.read_flat_psv(tbl_views_path)
 
     return df
 
-def setupviews(con, def_tables_path: str) -> None:
+def read_view_rows(tbl_views_path):
+    """
+    Read every row of views.csv without pandas.
+
+    Parameters
+    ----------
+    tbl_views_path : str
+        Path to the pipe-separated ``views.csv`` file.
+
+    Returns
+    -------
+    list of dict
+        Rows in file order with surrounding whitespace removed, trailing
+        semicolons removed from the SQL and the optional MATERIALIZE,
+        WATERMARK and MAX_AGE columns filled in (MATERIALIZE lower-cased,
+        empty for a plain view). Empty if the file does not exist.
+    """
+    if not os.path.exists(tbl_views_path):
+        return []
+    rows = []
+    with open(tbl_views_path, newline="") as file:
+        for row in csv.DictReader(file, delimiter="|"):
+            rows.append({
+                "VIEW_NAME": row["VIEW_NAME"].strip(),
+                "SQL": str(row["SQL"]).strip().rstrip(";").strip(),
+                "MATERIALIZE": (row.get("MATERIALIZE") or "").strip().lower(),
+                "WATERMARK": (row.get("WATERMARK") or "").strip(),
+                "MAX_AGE": (row.get("MAX_AGE") or "").strip(),
+            })
+    return rows
+
+def is_materialized(row):
+    """
+    Check whether a views.csv row is stored as a table rather than a view.
+
+    Parameters
+    ----------
+    row : dict
+        A row from ``read_view_rows``.
+
+    Returns
+    -------
+    bool
+        True if the row has a MATERIALIZE mode other than empty or ``view``.
+    """
+    return row["MATERIALIZE"] not in ("", "view")
+
+def read_view_list(tbl_views_path):
+    """
+    Read the plain (not materialized) view definitions without pandas.
+
+    Parameters
+    ----------
+    tbl_views_path : str
+        Path to the pipe-separated ``views.csv`` file.
+
+    Returns
+    -------
+    list of tuple
+        (view name, SQL) pairs in file order, with surrounding whitespace and
+        trailing semicolons removed from the SQL. Empty if the file does not
+        exist.
+    """
+    return [(row["VIEW_NAME"], row["SQL"]) for row in read_view_rows(tbl_views_path) if not is_materialized(row)]
+
+def normalise_sql(sql):
+    """
+    Normalise SQL text so formatting changes do not count as a change.
+
+    Whitespace runs outside string literals and quoted identifiers are
+    collapsed, comments are dropped and trailing semicolons removed.
+
+    Parameters
+    ----------
+    sql : str
+        SQL text.
+
+    Returns
+    -------
+    str
+        The normalised SQL.
+    """
+    parts = []
+    last = 0
+    for match in _LITERALS_AND_COMMENTS.finditer(sql):
+        parts.append(" ".join(sql[last:match.start()].split()))
+        token = match.group(0)
+        if not token.startswith(("--", "/*")):
+            parts.append(token)
+        last = match.end()
+    parts.append(" ".join(sql[last:].split()))
+    return " ".join(part for part in parts if part).rstrip("; ")
+
+def sql_hash(sql):
+    """
+    Hash the normalised form of a view's SQL.
+
+    Returns
+    -------
+    str
+        SHA256 hex digest of ``normalise_sql(sql)``.
+    """
+    return hashlib.sha256(normalise_sql(sql).encode("utf-8")).hexdigest()
+
+def view_dependencies(view_sql):
+    """
+    Find which listed views each view reads from.
+
+    Parameters
+    ----------
+    view_sql : dict
+        SQL keyed by view name.
+
+    Returns
+    -------
+    dict
+        For each view name, the list of other listed views its SQL mentions.
+    """
+    names = {name.lower(): name for name in view_sql}
+    dependencies = {}
+    for name, sql in view_sql.items():
+        stripped = _STRINGS_AND_COMMENTS.sub(" ", sql)
+        mentioned = {ident.lower() for ident in _IDENTIFIER.findall(stripped)}
+        dependencies[name] = [names[ref] for ref in sorted(mentioned & names.keys()) if ref != name.lower()]
+    return dependencies
+
+def materialized_readers(tbl_views_path):
+    """
+    Find the plain views that read a materialized view.
+
+    These views can only be created once the materialized views are
+    refreshed. The other plain views are created before the refresh, so
+    materialized views can read them.
+
+    Parameters
+    ----------
+    tbl_views_path : str
+        Path to the pipe-separated ``views.csv`` file.
+
+    Returns
+    -------
+    set
+        Names of the plain views reading a materialized view, directly or
+        through other plain views.
+    """
+    rows = read_view_rows(tbl_views_path)
+    materialized = {row["VIEW_NAME"] for row in rows if is_materialized(row)}
+    dependencies = view_dependencies({row["VIEW_NAME"]: row["SQL"] for row in rows})
+    readers = set(materialized)
+    for name in schema_model.topological_sort(dependencies):
+        if any(dep in readers for dep in dependencies[name]):
+            readers.add(name)
+    return readers - materialized
+
+def stored_view_hashes(con):
+    """
+    Read the SQL hashes of the views in the current database.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+
+    Returns
+    -------
+    dict
+        Stored hash (None for views not created by the sync) keyed by
+        lower-cased view name.
+    """
+    rows = con.execute("""
+        SELECT view_name, comment FROM duckdb_views()
+        WHERE NOT internal AND database_name = current_database() AND schema_name = 'main'
+    """).fetchall()
+    return {name.lower(): (comment[len(VIEW_HASH_PREFIX):] if comment and comment.startswith(VIEW_HASH_PREFIX) else None)
+            for name, comment in rows}
+
+def plan_view_sync(con, view_list):
+    """
+    Work out which views need to be created or replaced, in order.
+
+    A view is changed when it is missing or its stored hash differs from the
+    hash of its listed SQL. Changed views and every view depending on them,
+    directly or through other views, are returned in dependency order.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    view_list : list of tuple
+        (view name, SQL) pairs from ``read_view_list``.
+
+    Returns
+    -------
+    list of tuple
+        (view name, SQL, hash) for each view to create or replace.
+    """
+    view_sql = dict(view_list)
+    hashes = {name: sql_hash(sql) for name, sql in view_sql.items()}
+    stored = stored_view_hashes(con)
+    dependencies = view_dependencies(view_sql)
+
+    dependants = {name: [] for name in view_sql}
+    for name, deps in dependencies.items():
+        for dep in deps:
+            dependants[dep].append(name)
+
+    todo = set()
+    pending = [name for name in view_sql if stored.get(name.lower()) != hashes[name]]
+    while pending:
+        name = pending.pop()
+        if name not in todo:
+            todo.add(name)
+            pending.extend(dependants[name])
+
+    order = schema_model.topological_sort(dependencies)
+    return [(name, view_sql[name], hashes[name]) for name in order if name in todo]
+
+def view_sync_statements(con, def_tables_path, skip=()):
+    """
+    Build the statements that bring the views in line with views.csv.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    def_tables_path : str
+        Path to the directory containing ``views.csv``.
+    skip : collection of str, optional
+        Views to leave out, such as the ``materialized_readers`` that are
+        created after the materialized view refresh.
+
+    Returns
+    -------
+    list of tuple
+        (sql, params) pairs; a CREATE OR REPLACE VIEW and a COMMENT holding
+        the hash for each changed view.
+    """
+    plan = plan_view_sync(con, read_view_list(os.path.join(def_tables_path, "views.csv")))
+    return _sync_statements([step for step in plan if step[0] not in skip])
+
+def _sync_statements(plan):
+    statements = []
+    for name, sql, digest in plan:
+        statements.append((f"CREATE OR REPLACE VIEW {name} AS {sql}", []))
+        statements.append((f"COMMENT ON VIEW {name} IS '{VIEW_HASH_PREFIX}{digest}'", []))
+    return statements
+
+def setupviews(con, def_tables_path: str, plan=None) -> None:
     """
     Synchronize views in DuckDB with definitions stored in a CSV file.
 
-    This function compares the views defined in the database with those
-    listed in ``views.csv``. Any views present in the CSV but missing from
-    the database are created, and any existing views are updated to match
-    the CSV definition.
+    Views missing from the database or whose SQL changed in ``views.csv``
+    are created or replaced, together with the views depending on them, in
+    dependency order and in a single transaction. Views not in the CSV are
+    left alone.
 
     Parameters
     ----------
@@ -58,32 +326,35 @@ def setupviews(con, def_tables_path: str) -> None:
         An active DuckDB connection object.
     def_tables_path : str
         Path to the directory containing ``views.csv`` with view definitions.
+    plan : list of tuple, optional
+        Steps from ``plan_view_sync`` to run, by default the plan for every
+        listed view.
 
     Returns
     -------
     None
         Executes view creation or replacement in the database, no direct
         return value.
-    """
 
-    # Get the views
-    db_views = get_db_views(con).df()
-    csv_views = read_db_csv(os.path.join(def_tables_path, "views.csv"))
+    Raises
+    ------
+    RuntimeError
+        If a view cannot be created; no view is changed in that case.
+    """
+    if plan is None:
+        plan = plan_view_sync(con, read_view_list(os.path.join(def_tables_path, "views.csv")))
+    if not plan:
+        print("Views up to date")
+        return
 
-    # Only create views from csv_views that do not already exist in db_views
-    existing_view_names = set(db_views["VIEW_NAME"].astype(str))
-    views_to_create = csv_views[~csv_views["VIEW_NAME"].astype(str).isin(existing_view_names)]
+    statements = _sync_statements(plan)
+    with db_utils.transaction(con, "View setup"):
+        for sql, params in statements:
+            con.execute(sql, params)
 
-    for _, row in views_to_create.iterrows():
-        view_name = row['VIEW_NAME']
-        sql_query = row['SQL']
-        create_view_stmt = f"CREATE VIEW {view_name} AS {sql_query};"
-        con.execute(create_view_stmt)
-        print(f"Created view: {view_name}\nSQL: {sql_query}\n")
+    for view_name, sql_query, _ in plan:
+        print(f"Created or replaced view: {view_name}\nSQL: {sql_query}\n")
 
     # After all views are created, display the list of all views in the DB
     print("\nAll views in the database:")
-    all_views = get_db_views(con).show()
-
-    #d = con.execute("SELECT * FROM db_num_tables_view;").df()
-    #print(d)
+    get_db_views(con).show()
@@ -0,0 +1,347 @@
+import os
+import time
+import argparse
+import conn
+from launcher import start_db as sdb
+# conn puts launcher/ on sys.path; import its modules the way start_db does
+import lazy_attach
+import ingest
+import schema_model
+import db_utils
+
+# Rows copied per transaction, which bounds memory and WAL size
+MIGRATE_CHUNK_ROWS = 250_000
+
+# Catch-up passes tried before giving up on a source that keeps changing
+MIGRATE_SWAP_ATTEMPTS = 3
+
+def find_source(con, table, target_db, defined_dbs=()):
+    """
+    Find the database still holding the table that moved to ``target_db``.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection with every database attached.
+    table : schema_model.TableDef
+        The table as now defined in def_tables.csv.
+    target_db : str
+        Catalog the table is assigned to.
+    defined_dbs : collection of str, optional
+        Catalogs where def_tables.csv defines a table of the same name,
+        which are not candidates.
+
+    Returns
+    -------
+    str
+        Catalog of the one other database with a base table of that name.
+
+    Raises
+    ------
+    ValueError
+        If no other database, or more than one, has such a table.
+    """
+    found = [row[0] for row in con.execute("""
+        SELECT database_name FROM duckdb_tables()
+        WHERE schema_name = 'main' AND table_name = ? AND database_name <> ?
+        ORDER BY database_name
+    """, [table.tablename, target_db]).fetchall() if row[0] not in defined_dbs]
+    if not found:
+        raise ValueError(f"No database other than {target_db} holds a {table.tablename} table to migrate")
+    if len(found) > 1:
+        raise ValueError(f"{table.tablename} exists in {', '.join(found)}; name the source database")
+    return found[0]
+
+def linking_tables(con, db_name, table_name):
+    """
+    List the tables with enforced foreign keys to a table.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    db_name, table_name : str
+        The referenced table.
+
+    Returns
+    -------
+    list of str
+        ``database.table`` of every table whose constraints reference it.
+    """
+    return [f"{db}.{name}" for db, name in con.execute("""
+        SELECT DISTINCT database_name, table_name FROM duckdb_constraints()
+        WHERE constraint_type = 'FOREIGN KEY' AND database_name = ? AND referenced_table = ?
+          AND table_name <> ?
+        ORDER BY database_name, table_name
+    """, [db_name, table_name, table_name]).fetchall()]
+
+def table_columns(con, db_name, table_name):
+    """
+    Read the column names of a table, in order.
+
+    Returns
+    -------
+    list of str
+        Column names; empty if the table does not exist.
+    """
+    return [row[0] for row in con.execute("""
+        SELECT column_name FROM duckdb_columns()
+        WHERE database_name = ? AND schema_name = 'main' AND table_name = ?
+        ORDER BY column_index
+    """, [db_name, table_name]).fetchall()]
+
+def content_fingerprint(con, name, columns):
+    """
+    Fingerprint the rows of a table over a fixed column list.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor to run the query on.
+    name : str
+        Qualified table name.
+    columns : list of str
+        Columns to hash, so tables whose columns are ordered differently
+        compare equal.
+
+    Returns
+    -------
+    str
+        ``<row count>:<sum of row hashes>``.
+    """
+    hashed = ", ".join(f'"{column}"' for column in columns)
+    count, row_hash = con.execute(f"SELECT COUNT(*), COALESCE(sum(hash({hashed})), 0) FROM {name}").fetchone()
+    return f"{count}:{row_hash}"
+
+def copy_chunks(con, source, target, target_db, columns, chunk_rows=MIGRATE_CHUNK_ROWS):
+    """
+    Copy the rows of a table that are not in the target yet, in ID ranges.
+
+    Every range of ``chunk_rows`` IDs is inserted and committed on its own,
+    so memory stays bounded and an interrupted copy resumes after the
+    largest ID already in the target.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    source, target : str
+        Qualified source and target tables.
+    target_db : str
+        Catalog of the target, made current for each chunk's transaction.
+    columns : list of str
+        Columns to copy.
+    chunk_rows : int, optional
+        IDs per chunk.
+
+    Returns
+    -------
+    int
+        Rows copied.
+
+    Raises
+    ------
+    RuntimeError
+        If a chunk fails; earlier chunks stay committed.
+    """
+    done = con.execute(f"SELECT COALESCE(max(ID), -9223372036854775808) FROM {target}").fetchone()[0]
+    last = con.execute(f"SELECT max(ID) FROM {source}").fetchone()[0]
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    copied = 0
+    while last is not None and done < last:
+        low = con.execute(f"SELECT min(ID) FROM {source} WHERE ID > ?", [done]).fetchone()[0]
+        high = min(low + chunk_rows - 1, last)
+        with db_utils.transaction(con, f"Copying IDs {low} to {high} into {target}", database=target_db):
+            rows = con.execute(f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {source} "
+                               f"WHERE ID BETWEEN ? AND ?", [low, high]).fetchone()[0]
+        copied += rows
+        done = high
+        print(f"Copied IDs up to {high} ({copied} rows)")
+    return copied
+
+def clear_target(con, target, target_db):
+    """
+    Delete every row copied into the target, so the next run starts over.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    target : str
+        Qualified target table.
+    target_db : str
+        Catalog of the target.
+
+    Raises
+    ------
+    RuntimeError
+        If the delete fails; it is rolled back.
+    """
+    with db_utils.transaction(con, f"Clearing {target}", database=target_db):
+        con.execute(f"DELETE FROM {target}")
+
+def swap_to_view(con, source_db, table_name, target, columns):
+    """
+    Replace the source table with a view of the migrated one, if they match.
+
+    The fingerprints of both tables are compared inside the transaction
+    that drops the source, so rows written to the source after the check
+    cannot be dropped unseen. The drop and the view creation only write
+    the source database, so they commit together and readers of the old
+    name never see it missing.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    source_db, table_name : str
+        The migrated source table.
+    target : str
+        Qualified migrated table.
+    columns : list of str
+        Columns compared, see ``content_fingerprint``.
+
+    Returns
+    -------
+    str or None
+        The fingerprint both tables had, or None if they differ; nothing
+        is changed then and the source table stays.
+
+    Raises
+    ------
+    RuntimeError
+        If the swap fails; it is rolled back and the source table stays.
+    """
+    source = f'"{source_db}"."main"."{table_name}"'
+    with db_utils.transaction(con, f"Swapping {source_db}.{table_name} for a view", database=source_db):
+        source_print = content_fingerprint(con, source, columns)
+        if content_fingerprint(con, target, columns) != source_print:
+            # Nothing is written yet, so the transaction just ends
+            return None
+        con.execute(f"DROP TABLE {source}")
+        con.execute(f"CREATE VIEW {source} AS SELECT * FROM {target}")
+    return source_print
+
+def migrate(con, table_key, source_db=None, chunk_rows=MIGRATE_CHUNK_ROWS, def_tables_path="init_tables"):
+    """
+    Move a table's rows to the database it is now assigned to in def_tables.csv.
+
+    Change the table's DBNAME in def_tables.csv first; the system start
+    creates the empty table in its new database. The rows are then copied
+    from the old database in chunks of IDs while it stays readable and
+    writable, and rows added to the source meanwhile are picked up by a
+    catch-up pass. The row counts and content fingerprints of both tables
+    are then compared in the transaction that replaces the source table by
+    a view of the new one, so queries using the old name keep working. If
+    the source changed in between, another catch-up pass runs, up to
+    ``MIGRATE_SWAP_ATTEMPTS`` times. If the tables still differ, such as
+    after rows of the source were updated, the target is cleared so the
+    next run copies everything again, and the source is kept.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection or LazyConnection
+        Connection or cursor of a started system. The current database is
+        switched for each transaction, so other threads should use their
+        own cursors.
+    table_key : str
+        ``dbname.tablename`` as now written in def_tables.csv.
+    source_db : str, optional
+        Database the table is moving out of. By default the one other
+        database holding a table of that name.
+    chunk_rows : int, optional
+        IDs copied per transaction.
+    def_tables_path : str, optional
+        Path to the directory containing the init CSV files.
+
+    Returns
+    -------
+    int
+        Rows in the migrated table.
+
+    Raises
+    ------
+    KeyError
+        If the table is not defined.
+    ValueError
+        If the source cannot be found, has no ID or has columns the
+        definition lacks, or is referenced by enforced foreign keys that
+        dropping it would break.
+    RuntimeError
+        If copying or the swap fails, or the fingerprints still differ
+        after the catch-up passes; the source table is left in place.
+    """
+    table = ingest.table_definition(table_key, def_tables_path)
+    if table.is_routed:
+        raise ValueError(f"{table.key} is sharded or partitioned; its tables cannot be migrated as one table")
+
+    lazy_attach.attach_all(con)
+    driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+    target_db = db_utils.resolve_catalog(table.dbname, driver_alias)
+    if source_db is None:
+        model = schema_model.load_schema(os.path.join(def_tables_path, "def_tables.csv"))
+        defined_dbs = {db_utils.resolve_catalog(t.dbname, driver_alias)
+                       for t in model.tables.values() if t.tablename == table.tablename}
+        source_db = find_source(con, table, target_db, defined_dbs)
+    source_db = db_utils.resolve_catalog(source_db, driver_alias)
+    source = f'"{source_db}"."main"."{table.tablename}"'
+    target = f'"{target_db}"."main"."{table.tablename}"'
+
+    columns = table_columns(con, target_db, table.tablename)
+    source_columns = table_columns(con, source_db, table.tablename)
+    if not columns or not source_columns:
+        raise ValueError(f"Both {source_db}.{table.tablename} and {target_db}.{table.tablename} must exist as tables")
+    if "ID" not in source_columns:
+        raise ValueError(f"{source_db}.{table.tablename} has no ID column to copy it by")
+    extra = [column for column in source_columns if column not in columns]
+    if extra:
+        raise ValueError(f"Columns {', '.join(extra)} of {source_db}.{table.tablename} are not defined "
+                         f"for {table.key} and would be lost")
+    linked = linking_tables(con, source_db, table.tablename)
+    if linked:
+        raise ValueError(f"{', '.join(linked)} reference {source_db}.{table.tablename} with enforced "
+                         f"foreign keys; migrate them first")
+
+    start = time.perf_counter()
+    copied = copy_chunks(con, source, target, target_db, source_columns, chunk_rows)
+    for _ in range(MIGRATE_SWAP_ATTEMPTS):
+        # Rows written to the source since the last pass
+        copied += copy_chunks(con, source, target, target_db, source_columns, chunk_rows)
+        fingerprint = swap_to_view(con, source_db, table.tablename, target, source_columns)
+        if fingerprint is not None:
+            break
+        print(f"{source_db}.{table.tablename} changed since the last pass, catching up again")
+    else:
+        clear_target(con, target, target_db)
+        raise RuntimeError(f"{target} still does not match {source} after {MIGRATE_SWAP_ATTEMPTS} catch-up passes; "
+                           f"rows of the source were changed during the copy or the target already had rows. "
+                           f"The source is kept and {target} was cleared, so the next run copies it again")
+    rows = int(fingerprint.split(":")[0])
+    print(f"Migrated {source_db}.{table.tablename} to {target_db}.{table.tablename}: {copied} rows copied, "
+          f"{rows} rows verified in {time.perf_counter() - start:.2f} s")
+    print(f"{source_db}.{table.tablename} is now a view of {target_db}.{table.tablename}")
+    return rows
+
+def migrate_table(table_key, source_db=None, chunk_rows=MIGRATE_CHUNK_ROWS, def_tables_path="init_tables"):
+    """
+    Start the system and migrate one table, see ``migrate``.
+
+    Returns
+    -------
+    int
+        Rows in the migrated table.
+    """
+    con = sdb.start_db(def_tables_path)
+    try:
+        return migrate(con, table_key, source_db, chunk_rows, def_tables_path)
+    finally:
+        conn.close_connection(con)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move a table's rows to the database def_tables.csv now assigns it to.")
+    parser.add_argument("table", metavar="DB.TABLE", help="the table as now written in def_tables.csv")
+    parser.add_argument("--source", help="database the table is moving out of, found by name by default")
+    parser.add_argument("--chunk-rows", type=int, default=MIGRATE_CHUNK_ROWS, help="IDs copied per transaction")
+    args = parser.parse_args()
+
+    migrate_table(args.table, source_db=args.source, chunk_rows=args.chunk_rows)
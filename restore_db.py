@@ -0,0 +1,410 @@
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import conn
+import dump_db
+from launcher import start_db as sdb
+# conn puts launcher/ on sys.path; import its modules the way start_db does
+import lazy_attach
+import schema_model
+import matviews
+import integrity
+import partitioning
+import conn_pool
+import db_utils
+
+# Default number of tables loaded at once
+RESTORE_WORKERS = dump_db.DUMP_WORKERS
+
+# Tables describing the environment itself, which a restore leaves alone
+SKIP_TABLES = {"META"}
+
+def load_waves(model, driver_alias, partitions=None):
+    """
+    Group the tables of a schema model into waves that can load in parallel.
+
+    A table is placed in the wave after the last table it links to, so every
+    referenced table is loaded before the tables whose foreign keys point at it.
+
+    Parameters
+    ----------
+    model : schema_model.SchemaModel
+        The compiled def_tables.csv.
+    driver_alias : str
+        Catalog name of the driver database, used for ``main`` tables.
+    partitions : dict, optional
+        Partition table names of each partitioned table, keyed by table
+        key; partitioned tables are left out without them.
+
+    Returns
+    -------
+    list of list
+        (database, table) pairs per wave, in creation order within a wave.
+    """
+    level = {}
+    waves = []
+    for key in model.creation_order:
+        table = model.tables[key]
+        wave = 1 + max((level[dep] for dep in table.dependencies if dep in level), default=-1)
+        level[key] = wave
+        if wave == len(waves):
+            waves.append([])
+        if table.is_sharded:
+            # The dump holds the shards, the routing view has no rows of its own
+            waves[wave] += [(db_utils.resolve_catalog(db, driver_alias), name) for db, name in table.shards]
+            continue
+        dbname = db_utils.resolve_catalog(table.dbname, driver_alias)
+        if table.is_partitioned:
+            waves[wave] += [(dbname, name) for name in (partitions or {}).get(key, [])]
+            continue
+        waves[wave].append((dbname, table.tablename))
+    return waves
+
+def restore_partitions(con, model, manifest, driver_alias, with_fks=True):
+    """
+    Create the partitions a dump holds for each partitioned table.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection with every database attached.
+    model : schema_model.SchemaModel
+        The compiled def_tables.csv.
+    manifest : dict
+        Manifest rows keyed by (database, table).
+    driver_alias : str
+        Catalog name of the driver database.
+    with_fks : bool, optional
+        Whether new partitions enforce the table's links.
+
+    Returns
+    -------
+    dict
+        Names of the dumped and existing partitions per partitioned table
+        key, for ``load_waves``.
+    """
+    partitions = {}
+    for key, table in model.tables.items():
+        if not table.is_partitioned:
+            continue
+        catalog = db_utils.resolve_catalog(table.dbname, driver_alias)
+        labels = set(partitioning.live_periods(con, table, catalog))
+        labels |= {partitioning.partition_period(table, name) for db, name in manifest if db == catalog}
+        labels.discard(None)
+        partitioning.ensure_partitions(con, table, catalog, labels, with_fks)
+        partitions[key] = [partitioning.partition_name(table, label) for label in sorted(labels)]
+    return partitions
+
+def restore_archives(con, model, dump_name, driver_alias, replace=False):
+    """
+    Put the archived periods a dump holds back into the archive folders.
+
+    Files come from ``<dump>/archive/<DBNAME>/<TABLE>``, see
+    ``dump_db.dump_archives``, and each table's view is rebuilt so it reads
+    them again.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection with every database attached.
+    model : schema_model.SchemaModel
+        The compiled def_tables.csv.
+    dump_name : str
+        Dump folder.
+    driver_alias : str
+        Catalog name of the driver database.
+    replace : bool, optional
+        Overwrite archive files that already exist, by default False.
+
+    Returns
+    -------
+    int
+        Number of archive files restored.
+
+    Raises
+    ------
+    ValueError
+        If an archive file already exists and ``replace`` is not set;
+        nothing is copied then.
+    """
+    copies = {}
+    for key, table in model.tables.items():
+        if not table.is_partitioned:
+            continue
+        source = os.path.join(dump_name, partitioning.ARCHIVE_DIR, table.dbname, table.tablename)
+        catalog = db_utils.resolve_catalog(table.dbname, driver_alias)
+        folder = partitioning.archive_folder(con, table, catalog)
+        for label in partitioning.archived_periods(source, table):
+            name = partitioning.partition_name(table, label) + ".parquet"
+            if os.path.exists(os.path.join(folder, name)) and not replace:
+                raise ValueError(f"Archive file {os.path.join(folder, name)} already exists, "
+                                 "restore with replace to overwrite it")
+            copies.setdefault(key, []).append((os.path.join(source, name), os.path.join(folder, name)))
+
+    for key, files in copies.items():
+        table = model.tables[key]
+        os.makedirs(os.path.dirname(files[0][1]), exist_ok=True)
+        for source, target in files:
+            dump_db.carry_forward(source, target)
+        catalog = db_utils.resolve_catalog(table.dbname, driver_alias)
+        partitioning.ensure_partitions(con, table, catalog, [])
+        print(f"Restored {len(files)} archived periods of {key}")
+    return sum(len(files) for files in copies.values())
+
+def source_sql(dump_name, entry):
+    """
+    Build the table function reading one table's files from a dump.
+
+    Parameters
+    ----------
+    dump_name : str
+        Dump folder.
+    entry : dict
+        The table's manifest row.
+
+    Returns
+    -------
+    str
+        A ``read_parquet`` or ``read_csv`` call. Partitioned and size-split
+        folders are read with a glob and Hive partitioning.
+    """
+    relpath = entry.get("path") or os.path.join(entry["database_name"], f"{entry['table_name']}.parquet")
+    path = os.path.join(dump_name, relpath)
+    is_csv = (entry.get("options") or "").startswith("FORMAT csv") or relpath.endswith(".csv")
+    if not os.path.isdir(path) and not os.path.exists(path):
+        # Manifests written before the path column only name parquet files
+        path = os.path.splitext(path)[0] + ".csv"
+        is_csv = True
+    if os.path.isdir(path):
+        pattern = os.path.join(path, "**", "*.csv" if is_csv else "*.parquet").replace("'", "''")
+        reader = "read_csv" if is_csv else "read_parquet"
+        extra = ", header = true" if is_csv else ""
+        return f"{reader}('{pattern}', hive_partitioning = true{extra})"
+    path = path.replace("'", "''")
+    if is_csv:
+        return f"read_csv('{path}', header = true)"
+    return f"read_parquet('{path}')"
+
+def load_table(con, dump_name, entry, db_name, table_name):
+    """
+    Load one table from a dump with a native insert.
+
+    Columns are matched by name, so the files may list them in any order.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection or cursor to run the insert on.
+    dump_name : str
+        Dump folder.
+    entry : dict
+        The table's manifest row.
+    db_name, table_name : str
+        The table to load.
+
+    Returns
+    -------
+    dict
+        Rows loaded and seconds taken.
+
+    Raises
+    ------
+    RuntimeError
+        If the loaded row count differs from the manifest.
+    """
+    start = time.perf_counter()
+    expected = int(entry["rows"])
+    rows = 0
+    if expected:
+        # Empty partitioned tables have no files to read
+        rows = con.execute(
+            f'INSERT INTO "{db_name}"."main"."{table_name}" BY NAME SELECT * FROM {source_sql(dump_name, entry)}'
+        ).fetchone()[0]
+    if rows != expected:
+        raise RuntimeError(f"loaded {rows} rows but the dump manifest lists {expected}")
+    return {"rows": rows, "seconds": time.perf_counter() - start}
+
+def clear_tables(con, waves):
+    """
+    Delete the rows of every restored table, dependants first.
+
+    DuckDB only lets a transaction write to one database, and its foreign
+    key checks do not see rows deleted earlier in the same transaction. The
+    deletes of each wave therefore run in one transaction per database,
+    and a wave is only cleared once the waves depending on it are.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        An active DuckDB connection object.
+    waves : list of list
+        (database, table) waves from ``load_waves``.
+
+    Raises
+    ------
+    RuntimeError
+        If a delete fails; the deletes of that wave and database are rolled
+        back and no further tables are cleared.
+    """
+    for wave in reversed(waves):
+        tables_by_db = {}
+        for db_name, table_name in reversed(wave):
+            tables_by_db.setdefault(db_name, []).append(table_name)
+        for db_name, tables in tables_by_db.items():
+            with db_utils.transaction(con, f"Clearing tables of {db_name}", database=db_name):
+                for table_name in tables:
+                    con.execute(f'DELETE FROM "{db_name}"."main"."{table_name}"')
+
+def restore_tables(con, dump_name, waves, manifest, workers=RESTORE_WORKERS):
+    """
+    Load the tables of a dump in parallel, one dependency wave at a time.
+
+    DuckDB checks enforced foreign keys as rows are inserted and cannot defer them,
+    so each wave starts only once the tables it references are committed.
+    Within a wave every worker thread loads with its own cursor, and each
+    table is loaded in its own transaction.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection with every database attached.
+    dump_name : str
+        Dump folder.
+    waves : list of list
+        (database, table) waves from ``load_waves``.
+    manifest : dict
+        Manifest rows keyed by (database, table), see ``dump_db.read_manifest``.
+    workers : int, optional
+        Maximum number of tables loaded at once.
+
+    Returns
+    -------
+    list of tuple
+        (database, table, rows, seconds) for every loaded table.
+
+    Raises
+    ------
+    RuntimeError
+        If any table in a wave fails to load; later waves are not started.
+    """
+    cursors = conn_pool.ThreadCursors(con)
+
+    def load(db_name, table_name):
+        return load_table(cursors.get(), dump_name, manifest[(db_name, table_name)], db_name, table_name)
+
+    loaded = []
+    with cursors:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for wave in waves:
+                tables = [(db, table) for db, table in wave if (db, table) in manifest]
+                # Largest first, so the biggest tables of the wave start before the small ones
+                tables.sort(key=lambda key: int(manifest[key]["rows"]), reverse=True)
+                futures = {pool.submit(load, db, table): (db, table) for db, table in tables}
+                failures = []
+                for future in as_completed(futures):
+                    db_name, table_name = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failures.append(f"{db_name}.{table_name}: {e}")
+                        print(f"Failed to restore {db_name}.{table_name}: {e}")
+                        continue
+                    loaded.append((db_name, table_name, result["rows"], result["seconds"]))
+                    print(f"Restored {db_name}.{table_name}: {result['rows']} rows in {result['seconds']:.3f} s")
+                if failures:
+                    raise RuntimeError("Restore failed for " + "; ".join(failures))
+    return loaded
+
+def restore_database(dump_name, workers=RESTORE_WORKERS, replace=False, def_tables_path="init_tables",
+                     fk_mode="enforced"):
+    """
+    Restore every table defined in def_tables.csv from a dump folder.
+
+    The system is started first, which creates any missing database and
+    table from the init tables, then the dumped files are inserted in
+    foreign key order. META is left alone since it describes this
+    environment, and dumped tables not in def_tables.csv (such as
+    materialized views) are skipped; the materialized views are refreshed
+    from the restored tables at the end. Partitioned tables get a partition
+    for every period the dump holds, and their archived periods are put back
+    in the archive folder. Every LINKS_TO reference is then
+    checked with ``integrity.validate_links``.
+
+    Parameters
+    ----------
+    dump_name : str
+        Dump folder written by ``dump_db``.
+    workers : int, optional
+        Maximum number of tables loaded at once.
+    replace : bool, optional
+        Delete the rows already in the restored tables first, by default
+        False.
+    def_tables_path : str, optional
+        Path to the directory containing the init CSV files.
+    fk_mode : str, optional
+        Foreign key mode for tables the restore creates, see
+        ``start_db.start_db``. With ``deferred`` DuckDB does not check each
+        inserted row and the references are only validated at the end.
+
+    Returns
+    -------
+    list of integrity.Violation
+        Links with orphan rows after the restore.
+
+    Raises
+    ------
+    ValueError
+        If the folder has no manifest, or a restored table already has rows
+        or an archive file already exists and ``replace`` is not set.
+    """
+    manifest = dump_db.read_manifest(dump_name)
+    if not manifest:
+        raise ValueError(f"No {dump_db.MANIFEST_NAME} found in {dump_name}")
+
+    con = sdb.start_db(def_tables_path, fk_mode=fk_mode)
+    try:
+        lazy_attach.attach_all(con)
+        driver_alias = con.execute("SELECT current_database()").fetchone()[0]
+        model = schema_model.load_schema(os.path.join(def_tables_path, "def_tables.csv"))
+        partitions = restore_partitions(con, model, manifest, driver_alias, with_fks=fk_mode == "enforced")
+        waves = [[key for key in wave if key[1] not in SKIP_TABLES]
+                 for wave in load_waves(model, driver_alias, partitions)]
+
+        restored = {key for wave in waves for key in wave}
+        for db_name, table_name in sorted(set(manifest) - restored):
+            print(f"Skipping {db_name}.{table_name}, it is not a restored table in def_tables.csv")
+        for db_name, table_name in sorted(restored - set(manifest)):
+            print(f"Warning: {db_name}.{table_name} is not in the dump and stays as it is")
+
+        if replace:
+            clear_tables(con, waves)
+        else:
+            for db_name, table_name in sorted(restored & set(manifest)):
+                if con.execute(f'SELECT 1 FROM "{db_name}"."main"."{table_name}" LIMIT 1').fetchone():
+                    raise ValueError(f"{db_name}.{table_name} already has rows, restore with replace to overwrite them")
+
+        start = time.perf_counter()
+        restore_archives(con, model, dump_name, driver_alias, replace)
+        loaded = restore_tables(con, dump_name, waves, manifest, workers)
+        matviews.refresh_materialized(con, def_tables_path)
+        violations = integrity.validate_links(con, def_tables_path)
+
+        total_rows = sum(rows for _, _, rows, _ in loaded)
+        print(f"\nRestore of {len(loaded)} tables ({total_rows} rows) completed "
+              f"in {time.perf_counter() - start:.2f} s from {dump_name}")
+        print(integrity.format_report(violations))
+    finally:
+        conn.close_connection(con)
+    return violations
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Restore every table from a dump folder.")
+    parser.add_argument("dump_name", help="dump folder written by dump_db.py")
+    parser.add_argument("--workers", type=int, default=RESTORE_WORKERS, help="tables loaded at once")
+    parser.add_argument("--replace", action="store_true", help="delete the rows already in the restored tables first")
+    parser.add_argument("--fk-mode", choices=integrity.FK_MODES, default="enforced",
+                        help="foreign key mode for tables the restore creates")
+    args = parser.parse_args()
+
+    restore_database(args.dump_name, workers=args.workers, replace=args.replace, fk_mode=args.fk_mode)
@@ -0,0 +1,59 @@
+"""
+Shared fixtures for the tests.
+
+Each test builds its own init_tables folder in a temporary directory and
+runs from there, so the repository's DBDAT folder is never touched.
+"""
+import os
+import sys
+import shutil
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "launcher"))
+
+# def_tables.csv rows of the META table start_db writes
+META_ROWS = """main,META,START_TIME,VARCHAR,
+main,META,PREV_START_TIME,VARCHAR,
+main,META,DB_VERSION,VARCHAR,
+main,META,PYTHON_VERSION,VARCHAR,
+main,META,DUCKDB_VERSION,VARCHAR,
+main,META,SALT_CHECK,VARCHAR,
+"""
+
+DEF_TABLES = "DBNAME,TABLENAME,VARNAME,TYPE,LINKS_TO\n" + META_ROWS + "a1,THINGS,label,VARCHAR,\n"
+
+DB_LIST = """PATH|DB_NAME|PURPOSE|LAZY
+"DBDAT/main.duckdb"|meta|main|
+"DBDAT/annex1.duckdb"|a1|primary|true
+"""
+
+def write_init_tables(folder, def_tables=DEF_TABLES, db_list=DB_LIST):
+    os.makedirs(os.path.join(folder, "init_tables"))
+    with open(os.path.join(folder, "init_tables", "db_list.csv"), "w") as f:
+        f.write(db_list)
+    with open(os.path.join(folder, "init_tables", "def_tables.csv"), "w") as f:
+        f.write(def_tables)
+    with open(os.path.join(folder, "init_tables", "views.csv"), "w") as f:
+        f.write("VIEW_NAME|SQL\n")
+    shutil.copy(os.path.join(ROOT, "db_salt.json"), folder)
+
+@pytest.fixture
+def db_folder(tmp_path, monkeypatch):
+    """Temporary working directory with init tables for ``meta`` and a lazy ``a1``."""
+    write_init_tables(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def init_folder(tmp_path, monkeypatch):
+    """Temporary working directory; call the fixture with the init table contents to write them."""
+    monkeypatch.chdir(tmp_path)
+    def write(def_tables=DEF_TABLES, db_list=DB_LIST):
+        if os.path.isdir(os.path.join(tmp_path, "init_tables")):
+            shutil.rmtree(os.path.join(tmp_path, "init_tables"))
+        write_init_tables(tmp_path, def_tables, db_list)
+        return tmp_path
+    return write
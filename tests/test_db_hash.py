@@ -0,0 +1,17 @@
+"""
+Tests for launcher/db_hash.py.
+"""
+import duckdb
+
+import db_hash
+
+def test_hash_function_matches_per_row_hash_and_hides_salt(db_folder):
+    con = duckdb.connect()
+    db_hash.register_hash_udf(con)
+    salt = db_hash.load_salt()
+
+    rows = con.execute("SELECT db_salt_hash(v, ?) FROM (VALUES ('a@example.com'), (NULL)) t(v)", [salt]).fetchall()
+    assert rows == [(db_hash.hash_with_db_salt("a@example.com"),), (None,)]
+
+    definitions = con.execute("SELECT macro_definition FROM duckdb_functions() WHERE function_name = 'db_salt_hash'").fetchall()
+    assert definitions and all(salt not in str(row[0]) for row in definitions)
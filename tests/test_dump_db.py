@@ -0,0 +1,45 @@
+"""
+Tests for dump_db.py.
+"""
+import os
+import csv
+
+import conn
+import dump_db
+
+def test_dump_includes_lazy_databases(db_folder):
+    con = conn.get_connection()
+    try:
+        con.execute("INSERT INTO a1.THINGS (ID, label) VALUES (1, 'first'), (2, 'second')")
+    finally:
+        conn.close_connection(con)
+
+    dump_db.dump_database_to_parquet("dump")
+
+    with open(os.path.join("dump", dump_db.MANIFEST_NAME), newline="") as f:
+        rows = {(row["database_name"], row["table_name"]): row for row in csv.DictReader(f)}
+    assert ("a1", "THINGS") in rows
+    assert int(rows[("a1", "THINGS")]["rows"]) == 2
+
+def read_actions(dump_name):
+    with open(os.path.join(dump_name, dump_db.MANIFEST_NAME), newline="") as f:
+        return {(row["database_name"], row["table_name"]): row["action"] for row in csv.DictReader(f)}
+
+def test_incremental_dump_after_full_dump_carries_unchanged_tables(db_folder):
+    con = conn.get_connection()
+    try:
+        con.execute("INSERT INTO a1.THINGS (ID, label) VALUES (1, 'first')")
+    finally:
+        conn.close_connection(con)
+    dump_db.dump_database_to_parquet("full")
+
+    con = conn.get_connection()
+    try:
+        con.execute("INSERT INTO a1.THINGS (ID, label) VALUES (2, 'second')")
+    finally:
+        conn.close_connection(con)
+    dump_db.dump_database_to_parquet("incremental", previous_dump="full")
+
+    actions = read_actions("incremental")
+    assert actions[("a1", "THINGS")] == "written"
+    assert actions[("main_db", "META_HISTORY")] in ("linked", "copied")
@@ -0,0 +1,34 @@
+"""
+Tests for launcher/ingest.py.
+"""
+import pandas as pd
+
+import conn
+import ingest
+import id_alloc
+
+def ids(con):
+    return [row[0] for row in con.execute("SELECT ID FROM a1.THINGS ORDER BY ID").fetchall()]
+
+def test_ingest_numbers_rows_after_largest_id(db_folder):
+    con = conn.get_connection()
+    try:
+        con.execute("INSERT INTO a1.THINGS (ID, label) VALUES (5, 'first')")
+        assert ingest.ingest(con, "a1.THINGS", pd.DataFrame({"label": ["b", "c"]})) == 2
+        assert ids(con) == [5, 6, 7]
+    finally:
+        conn.close_connection(con)
+
+def test_ingest_takes_ids_from_allocator(db_folder):
+    con = conn.get_connection()
+    try:
+        with id_alloc.IdAllocator(con, block_size=10) as allocator:
+            ingest.ingest(con, "a1.THINGS", pd.DataFrame({"label": ["a", "b"]}), allocator=allocator)
+            taken = ids(con)
+            assert len(taken) == 2 and taken[1] == taken[0] + 1
+            # Without an allocator, the IDs the open allocator still holds are not reused
+            ingest.ingest(con, "a1.THINGS", pd.DataFrame({"label": ["c"]}))
+            assert ids(con)[-1] > taken[0] + 9
+            assert list(allocator.allocate("a1.THINGS")) == [taken[1] + 1]
+    finally:
+        conn.close_connection(con)
@@ -0,0 +1,21 @@
+"""
+Tests for launcher/lazy_attach.py.
+"""
+import conn
+import lazy_attach
+
+def test_referenced_databases():
+    assert lazy_attach.referenced_databases("SELECT * FROM a1.THINGS") == {"a1"}
+    assert lazy_attach.referenced_databases('use "A1"') == {"a1"}
+    assert lazy_attach.referenced_databases("SELECT 'USE a1' -- a1.x") == set()
+
+def test_lazy_database_usable_through_use(db_folder):
+    con = conn.get_connection()
+    try:
+        assert "a1" in lazy_attach.pending_dbs(con)
+        con.execute("USE a1")
+        con.execute("INSERT INTO THINGS (ID, label) VALUES (1, 'first')")
+        assert con.execute("SELECT label FROM THINGS").fetchall() == [("first",)]
+        assert "a1" not in lazy_attach.pending_dbs(con)
+    finally:
+        conn.close_connection(con)
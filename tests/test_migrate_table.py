@@ -0,0 +1,68 @@
+"""
+Tests for migrate_table.py.
+"""
+import pytest
+
+import conn
+import migrate_table
+from conftest import META_ROWS
+
+DB_LIST = """PATH|DB_NAME|PURPOSE|LAZY
+"DBDAT/main.duckdb"|meta|main|
+"DBDAT/annex1.duckdb"|a1|primary|
+"DBDAT/annex2.duckdb"|a2|primary|
+"""
+
+def def_tables(dbname):
+    return "DBNAME,TABLENAME,VARNAME,TYPE,LINKS_TO\n" + META_ROWS + f"{dbname},THINGS,label,VARCHAR,\n"
+
+def start_moved_table(init_folder):
+    # Rows in a1.THINGS, then THINGS is moved to a2 in def_tables.csv
+    init_folder(def_tables("a1"), DB_LIST)
+    con = conn.get_connection()
+    try:
+        con.execute("INSERT INTO a1.THINGS (ID, label) VALUES (1, 'first'), (2, 'second')")
+    finally:
+        conn.close_connection(con)
+    init_folder(def_tables("a2"), DB_LIST)
+    return conn.get_connection()
+
+def table_type(con, db_name):
+    return con.execute("SELECT table_type FROM information_schema.tables WHERE table_catalog = ? "
+                       "AND table_name = 'THINGS'", [db_name]).fetchone()[0]
+
+def test_migrate_catches_up_rows_written_during_copy(init_folder, monkeypatch):
+    con = start_moved_table(init_folder)
+    swap_to_view = migrate_table.swap_to_view
+    calls = []
+    def write_then_swap(con, *args):
+        if not calls:
+            con.execute("INSERT INTO a1.THINGS (ID, label) VALUES (3, 'late')")
+        calls.append(args)
+        return swap_to_view(con, *args)
+    monkeypatch.setattr(migrate_table, "swap_to_view", write_then_swap)
+    try:
+        assert migrate_table.migrate(con, "a2.THINGS", chunk_rows=1) == 3
+        assert len(calls) == 2
+        assert table_type(con, "a1") == "VIEW"
+        assert con.execute("SELECT label FROM a1.THINGS ORDER BY ID").fetchall() == [("first",), ("second",), ("late",)]
+    finally:
+        conn.close_connection(con)
+
+def test_migrate_aborts_and_clears_target_when_source_rows_change(init_folder, monkeypatch):
+    con = start_moved_table(init_folder)
+    copy_chunks = migrate_table.copy_chunks
+    def copy_then_update(con, *args):
+        copied = copy_chunks(con, *args)
+        # An update is not picked up by a catch-up pass, which only copies new IDs
+        con.execute("UPDATE a1.THINGS SET label = 'changed' WHERE ID = 1")
+        return copied
+    monkeypatch.setattr(migrate_table, "copy_chunks", copy_then_update)
+    try:
+        with pytest.raises(RuntimeError, match="source is kept"):
+            migrate_table.migrate(con, "a2.THINGS")
+        assert table_type(con, "a1") == "BASE TABLE"
+        assert con.execute("SELECT COUNT(*) FROM a1.THINGS").fetchone()[0] == 2
+        assert con.execute("SELECT COUNT(*) FROM a2.THINGS").fetchone()[0] == 0
+    finally:
+        conn.close_connection(con)
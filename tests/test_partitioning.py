@@ -0,0 +1,69 @@
+"""
+Tests for launcher/partitioning.py.
+"""
+import os
+import datetime
+
+import pandas as pd
+import pytest
+
+import conn
+import ingest
+import partitioning
+from conftest import META_ROWS
+
+DEF_TABLES = ("DBNAME,TABLENAME,VARNAME,TYPE,LINKS_TO,PARTITION_BY\n" + META_ROWS.replace(",\n", ",,\n")
+              + "a1,ORDERS,order_date,DATE,,order_date:month\n"
+              + "a1,ORDERS,total,INTEGER,,\n")
+
+DB_LIST = """PATH|DB_NAME|PURPOSE|LAZY
+"DBDAT/main.duckdb"|meta|main|
+"DBDAT/annex1.duckdb"|a1|primary|
+"""
+
+JANUARY = partitioning.period_label(datetime.date(2024, 1, 1), "month")
+
+class MiscountingConnection:
+    """Connection whose count of an archive file comes back short."""
+    def __init__(self, con):
+        self.con = con
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT COUNT(*) FROM read_parquet"):
+            sql = "SELECT 0"
+        return self.con.execute(sql) if params is None else self.con.execute(sql, params)
+
+def start_with_orders(init_folder):
+    init_folder(DEF_TABLES, DB_LIST)
+    con = conn.get_connection()
+    ingest.ingest(con, "a1.ORDERS", pd.DataFrame({
+        "order_date": pd.to_datetime(["2024-01-05", "2024-01-20", "2024-02-03"]).date,
+        "total": [10, 20, 30],
+    }))
+    return con, ingest.table_definition("a1.ORDERS")
+
+def partition_exists(con, label):
+    return con.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = 'a1' AND table_name = ?",
+                       [f"ORDERS_P{label}"]).fetchone()[0] == 1
+
+def test_archive_partition_keeps_rows_readable(init_folder):
+    con, table = start_with_orders(init_folder)
+    try:
+        assert partitioning.archive_partition(con, table, "a1", JANUARY) == 2
+        assert not partition_exists(con, JANUARY)
+        folder = partitioning.archive_folder(con, table, "a1")
+        assert os.listdir(folder) == [f"ORDERS_P{JANUARY}.parquet"]
+        assert con.execute("SELECT COUNT(*), SUM(total) FROM a1.ORDERS").fetchone() == (3, 60)
+    finally:
+        conn.close_connection(con)
+
+def test_archive_partition_keeps_partition_when_file_is_short(init_folder):
+    con, table = start_with_orders(init_folder)
+    try:
+        with pytest.raises(RuntimeError, match="partition is kept"):
+            partitioning.archive_partition(MiscountingConnection(con), table, "a1", JANUARY)
+        assert partition_exists(con, JANUARY)
+        assert os.listdir(partitioning.archive_folder(con, table, "a1")) == []
+        assert con.execute("SELECT COUNT(*) FROM a1.ORDERS").fetchone()[0] == 3
+    finally:
+        conn.close_connection(con)
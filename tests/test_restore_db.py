@@ -0,0 +1,47 @@
+"""
+Tests for restore_db.py.
+"""
+import os
+
+import conn
+import dump_db
+import restore_db
+import schema_model
+from conftest import META_ROWS
+
+# The linking table is listed first, so only the links put PARENTS first
+DEF_TABLES = ("DBNAME,TABLENAME,VARNAME,TYPE,LINKS_TO\n" + META_ROWS
+              + "a1,CHILDREN,name,VARCHAR,a1.PARENTS\n"
+              + "a1,PARENTS,name,VARCHAR,\n")
+
+DB_LIST = """PATH|DB_NAME|PURPOSE|LAZY
+"DBDAT/main.duckdb"|meta|main|
+"DBDAT/annex1.duckdb"|a1|primary|
+"""
+
+def test_load_waves_put_referenced_tables_first(init_folder):
+    init_folder(DEF_TABLES, DB_LIST)
+    model = schema_model.load_schema(os.path.join("init_tables", "def_tables.csv"))
+    waves = restore_db.load_waves(model, "main_db")
+    wave_of = {key: i for i, wave in enumerate(waves) for key in wave}
+    assert wave_of[("a1", "PARENTS")] < wave_of[("a1", "CHILDREN")]
+
+def test_restore_replaces_linked_tables(init_folder):
+    init_folder(DEF_TABLES, DB_LIST)
+    con = conn.get_connection()
+    try:
+        con.execute("INSERT INTO a1.PARENTS (ID, name) VALUES (1, 'p1'), (2, 'p2')")
+        con.execute("INSERT INTO a1.CHILDREN (ID, name, PARENTS_ID) VALUES (1, 'c1', 1), (2, 'c2', 2)")
+    finally:
+        conn.close_connection(con)
+    dump_db.dump_database_to_parquet("dump")
+
+    # Clearing and loading must follow the enforced foreign key in both directions
+    assert restore_db.restore_database("dump", replace=True) == []
+
+    con = conn.get_connection()
+    try:
+        assert con.execute("SELECT COUNT(*) FROM a1.PARENTS").fetchone()[0] == 2
+        assert con.execute("SELECT name, PARENTS_ID FROM a1.CHILDREN ORDER BY ID").fetchall() == [("c1", 1), ("c2", 2)]
+    finally:
+        conn.close_connection(con)
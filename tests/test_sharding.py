@@ -0,0 +1,45 @@
+"""
+Tests for launcher/sharding.py.
+"""
+import pandas as pd
+import pytest
+
+import conn
+import ingest
+import sharding
+from conftest import META_ROWS
+
+DEF_TABLES = ("DBNAME,TABLENAME,VARNAME,TYPE,LINKS_TO,SHARD_BY\n" + META_ROWS.replace(",\n", ",,\n")
+              + 'main,EVENTS,kind,VARCHAR,,"kind:a1,a2"\n')
+
+DB_LIST = """PATH|DB_NAME|PURPOSE|LAZY
+"DBDAT/main.duckdb"|meta|main|
+"DBDAT/annex1.duckdb"|a1|primary|
+"DBDAT/annex2.duckdb"|a2|primary|
+"""
+
+def kinds_by_shard(con, count):
+    # A few key values and the shard each one belongs to
+    rows = con.execute(f"SELECT k, {sharding.shard_expr('k', count)} FROM (SELECT 'kind' || i AS k FROM range(20) t(i))")
+    found = {}
+    for kind, shard in rows.fetchall():
+        found.setdefault(shard, kind)
+    return found
+
+def test_failed_shard_insert_deletes_rows_of_earlier_shards(init_folder):
+    init_folder(DEF_TABLES, DB_LIST)
+    con = conn.get_connection()
+    try:
+        kinds = kinds_by_shard(con, 2)
+        # Make the second shard refuse the batch after the first has committed
+        con.execute('CREATE UNIQUE INDEX kind_once ON a2.main.EVENTS_S1 (kind)')
+        data = pd.DataFrame({"kind": [kinds[0], kinds[1], kinds[1]]})
+
+        with pytest.raises(RuntimeError, match="rolled back"):
+            ingest.ingest(con, "main.EVENTS", data)
+
+        assert con.execute("SELECT COUNT(*) FROM a1.EVENTS_S0").fetchone()[0] == 0
+        assert con.execute("SELECT COUNT(*) FROM a2.EVENTS_S1").fetchone()[0] == 0
+        assert con.execute("SELECT current_database()").fetchone()[0] == "main_db"
+    finally:
+        conn.close_connection(con)